@@ -1,47 +1,299 @@
+import asyncio
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from functools import lru_cache
 import logging
+import threading
 from typing import Any, Mapping
 import numpy as np
 import math
 from PIL import Image, ImageColor, ImageDraw, ImageFont
 
 from ...model.configuration_manager import StaticConfigurationManager
+from ...model.time_of_day import TimeOfDay
+from ...task.message_router import MessageRouter
+from ...task.messages import Telemetry
+from ...task.render_service import RenderService
 from ..data_source import DataSource, DataSourceExecutionContext, MediaItemAsync, MediaRenderAsync, MediaRenderResult
 
+# color steps of the gradient lookup table
+GRADIENT_STEPS = 4096
+
+@lru_cache(maxsize=4)
+def _angle_field(width: int, height: int) -> np.ndarray:
+	"""
+	Polar angle of every pixel around the center, in [-pi, pi]; cached per resolution.
+	Shared between renders, so it is read-only.
+	"""
+	x,y = np.ogrid[:height,:width]
+	field = np.arctan2(x - height/2, y - width/2).astype(np.float32)
+	field.flags.writeable = False
+	return field
+
+def _gradient_position(field: np.ndarray, start_angle: float, end_angle: float) -> tuple[np.ndarray, np.ndarray]:
+	"""Mask of the pixels between the (clock face) angles, and their position in [0, 1] along the gradient."""
+	theta = np.remainder(field + np.float32(start_angle), np.float32(2*np.pi))
+	angle_range = (start_angle - end_angle) % (2 * np.pi)
+	if angle_range == 0:
+		angle_range = 2*np.pi  # Special case: full circle gradient
+	mask = theta <= np.float32(angle_range)
+	theta *= np.float32(1 / angle_range)
+	return mask, theta
+
+WORD_CLOCK_GRID = [
+	['I','T','L','I','S','A','S','A','M','P','M'],
+	['A','C','Q','U','A','R','T','E','R','D','C'],
+	['T','W','E','N','T','Y','F','I','V','E','X'],
+	['H','A','L','F','S','T','E','N','F','T','O'],
+	['P','A','S','T','E','R','U','N','I','N','E'],
+	['O','N','E','S','I','X','T','H','R','E','E'],
+	['F','O','U','R','F','I','V','E','T','W','O'],
+	['E','I','G','H','T','E','L','E','V','E','N'],
+	['S','E','V','E','N','T','W','E','L','V','E'],
+	['T','E','N','S','E','O','C','L','O','C','K'],
+]
+
+class WordClockFace:
+	"""
+	Word Clock layers for one (dimensions, font, colors): the dimmed letter grid is drawn once,
+	lit letters are stamped from per-cell tiles rendered on first use.
+	"""
+	# offset of the lit letter shadow
+	SHADOW = 2
+	def __init__(self, dimensions, font, primary_color, secondary_color):
+		w,h = dimensions
+		self.dimensions = dimensions
+		self.font = font
+		self.primary_color = primary_color
+		self.secondary_color = secondary_color
+		border = [40, 40]
+		if w > h:
+			border[0] += (w-h)/2
+		elif h > w:
+			border[1] += (h-w)/2
+		canvas_size = min(w,h) - min(border)*2
+		self.border = border
+		self.step = (canvas_size/(len(WORD_CLOCK_GRID[0])-1), canvas_size/(len(WORD_CLOCK_GRID)-1))
+		# tiles are only exact when every glyph (and its shadow) stays inside its cell
+		self.tiled = all(self._fits(letter) for letter in { letter for row in WORD_CLOCK_GRID for letter in row })
+		self.background = self._compose([])
+		self._tiles: dict[tuple[int, int], tuple[tuple[int, int], Image.Image]] = {}
+	def _fits(self, letter) -> bool:
+		left, top, right, bottom = self.font.getbbox(letter, anchor="mm")
+		margin = 2
+		return max(-left, right + self.SHADOW) + margin <= self.step[0]/2 and max(-top, bottom + self.SHADOW) + margin <= self.step[1]/2
+	def _position(self, y, x):
+		return (x*self.step[0] + self.border[0], y*self.step[1] + self.border[1])
+	def _draw_letter(self, image_draw, y, x, lit, origin=(0, 0)):
+		x_pos, y_pos = self._position(y, x)
+		x_pos -= origin[0]
+		y_pos -= origin[1]
+		letter = WORD_CLOCK_GRID[y][x]
+		fill=self.secondary_color+(50,)
+		if lit:
+			fill=self.secondary_color+(255,)
+			image_draw.text((x_pos+self.SHADOW, y_pos+self.SHADOW), letter, anchor="mm", fill=self.secondary_color+(80,), font=self.font)
+		image_draw.text((x_pos, y_pos), letter, anchor="mm", fill=fill, font=self.font)
+	def _compose(self, letter_positions):
+		"""Draw the whole grid."""
+		bg = Image.new("RGBA", self.dimensions, self.primary_color+(255,))
+		canvas = Image.new("RGBA", self.dimensions, (0, 0, 0, 0))
+		image_draw = ImageDraw.Draw(canvas)
+		for y, row in enumerate(WORD_CLOCK_GRID):
+			for x in range(len(row)):
+				self._draw_letter(image_draw, y, x, [y,x] in letter_positions)
+		return Image.alpha_composite(bg, canvas)
+	def _tile(self, y, x):
+		"""Opaque image of one cell with its letter lit."""
+		tile = self._tiles.get((y, x), None)
+		if tile is None:
+			w,h = self.dimensions
+			x0 = max(math.floor(self.border[0] + (x-0.5)*self.step[0]), 0)
+			y0 = max(math.floor(self.border[1] + (y-0.5)*self.step[1]), 0)
+			x1 = min(math.floor(self.border[0] + (x+0.5)*self.step[0]), w)
+			y1 = min(math.floor(self.border[1] + (y+0.5)*self.step[1]), h)
+			bg = Image.new("RGBA", (x1-x0, y1-y0), self.primary_color+(255,))
+			canvas = Image.new("RGBA", bg.size, (0, 0, 0, 0))
+			self._draw_letter(ImageDraw.Draw(canvas), y, x, True, (x0, y0))
+			tile = ((x0, y0), Image.alpha_composite(bg, canvas))
+			self._tiles[(y, x)] = tile
+		return tile
+	def render(self, letter_positions):
+		if not self.tiled:
+			return self._compose(letter_positions)
+		image = self.background.copy()
+		for y, x in { (y, x) for y, x in letter_positions }:
+			origin, tile = self._tile(y, x)
+			image.paste(tile, origin)
+		return image
+
+class DividedClockFace:
+	"""Divided Clock layers for one (dimensions, colors): background, shadow, face and hour marks are drawn once; hands are drawn each minute."""
+	def __init__(self, dimensions, primary_color, secondary_color):
+		w,h = dimensions
+		self.primary_color = primary_color
+		self.secondary_color = secondary_color
+		bg = Image.new("RGBA", dimensions, primary_color+(255,))
+		bg_draw = ImageDraw.Draw(bg)
+
+		# used to calculate percentages of sizes
+		self.dim = dim = min(w,h)
+
+		corners = [(0, h/2), (w,h)]
+		bg_draw.rectangle(corners, fill=secondary_color +(255,))
+
+		canvas = Image.new("RGBA", dimensions, (0, 0, 0, 0))
+		image_draw = ImageDraw.Draw(canvas)
+
+		shadow_offset = max(int(dim * 0.0075), 1)
+		face_size = int(dim * 0.45)
+
+		# clock shadow
+		image_draw.circle((w/2,h/2 + shadow_offset), face_size+2, fill=(0,0,0,50))
+
+		# clock outline
+		image_draw.circle((w/2,h/2), face_size, fill=primary_color, outline=secondary_color, width=int(dim * 0.03125))
+
+		Clock.draw_hour_marks(canvas, face_size - int(w*0.04375))
+		self.background = Image.alpha_composite(bg, canvas)
+	def render(self, time):
+		# the hands and center are opaque and inside the (opaque) face, so drawing them over the composited face is exact
+		image = self.background.copy()
+		dim = self.dim
+		hour_angle, minute_angle = Clock.calculate_clock_angles(time)
+		hand_width = max(int(dim * 0.009), 1)
+		Clock.draw_clock_hand(image, int(dim*0.3), minute_angle, self.secondary_color, hand_width=hand_width, border_color=self.secondary_color, round_corners=False)
+		Clock.draw_clock_hand(image, int(dim*0.2), hour_angle, self.secondary_color, hand_width=hand_width, border_color=self.secondary_color, round_corners=False)
+
+		Clock.drew_clock_center(image, max(int(dim*0.014), 1), self.primary_color, self.secondary_color, width=max(int(dim* 0.007), 1))
+		return image
+
+@lru_cache(maxsize=8)
+def _word_clock_face(dimensions, font, primary_color, secondary_color) -> WordClockFace:
+	return WordClockFace(dimensions, font, primary_color, secondary_color)
+
+@lru_cache(maxsize=8)
+def _divided_clock_face(dimensions, primary_color, secondary_color) -> DividedClockFace:
+	return DividedClockFace(dimensions, primary_color, secondary_color)
+
+class ClockFrameBuffer:
+	"""
+	Small ring buffer of rendered clock frames keyed by minute.
+	Frames belong to one rendering key (face, colors, dimensions); a different key invalidates the buffer.
+	"""
+	def __init__(self, size: int = 3):
+		self.size = size
+		self._key: tuple|None = None
+		self._frames: OrderedDict[datetime, Image.Image] = OrderedDict()
+		self._lock = threading.Lock()
+	def put(self, key: tuple, minute: datetime, image: Image.Image) -> None:
+		with self._lock:
+			if key != self._key:
+				self._frames.clear()
+				self._key = key
+			self._frames[minute] = image
+			self._frames.move_to_end(minute)
+			while len(self._frames) > self.size:
+				self._frames.popitem(last=False)
+	def take(self, key: tuple, minute: datetime) -> Image.Image|None:
+		"""Remove and return the frame for the minute; earlier frames are discarded."""
+		with self._lock:
+			if key != self._key:
+				self._frames.clear()
+				self._key = key
+				return None
+			for stale in [mx for mx in self._frames if mx < minute]:
+				del self._frames[stale]
+			return self._frames.pop(minute, None)
+	def __contains__(self, minute: datetime) -> bool:
+		with self._lock:
+			return minute in self._frames
+
 class ClockAsync(DataSource, MediaItemAsync, MediaRenderAsync):
 	"""
 	Async version of the Clock data source.
+	In pre-render mode the frame of the next minute is rendered in the background, so it is ready when scheduled.
 	"""
 	def __init__(self, id: str, name: str):
 		super().__init__(id, name)
+		self.frames = ClockFrameBuffer()
+		self._prerender: asyncio.Task|None = None
 		self.logger = logging.getLogger(__name__)
 	async def open_async(self, dsec: DataSourceExecutionContext, params:Mapping[str,Any]) -> Any:
 		clock_face = params.get("clockFace", "Gradient Clock")
 		primary_color = ImageColor.getcolor(params.get('primaryColor') or (255,255,255), "RGB")
 		secondary_color = ImageColor.getcolor(params.get('secondaryColor') or (0,0,0), "RGB")
+		font_sizes = Clock.font_sizes(clock_face, dsec.dimensions)
+		if font_sizes:
+			# first render does not pay for loading the font
+			dsec.provider.required(StaticConfigurationManager).preload_fonts(font_sizes)
 		return {
 			"clock_face": clock_face,
 			"primary_color": primary_color,
 			"secondary_color": secondary_color,
+			"pre_render": params.get("preRender", False) in (True, "true"),
 		}
+	async def _draw(self, dsec: DataSourceExecutionContext, clock_face: str, time: datetime, primary_color, secondary_color) -> Image.Image|None:
+		dimensions = dsec.dimensions
+		if clock_face == "Gradient Clock":
+			rs = dsec.provider.get_service(RenderService)
+			if rs is not None:
+				# NumPy-heavy; keep it off the worker pool's event loop
+				return await rs.run_async(Clock.draw_conic_clock, None, dimensions, time, primary_color, secondary_color)
+			return Clock.draw_conic_clock(dimensions, time, primary_color, secondary_color)
+		elif clock_face == "Digital Clock":
+			stm = dsec.provider.required(StaticConfigurationManager)
+			return Clock.draw_digital_clock(dimensions, time, stm, primary_color, secondary_color)
+		elif clock_face == "Divided Clock":
+			return Clock.draw_divided_clock(dimensions, time, primary_color, secondary_color)
+		elif clock_face == "Word Clock":
+			stm = dsec.provider.required(StaticConfigurationManager)
+			return Clock.draw_word_clock(dimensions, time, stm, primary_color, secondary_color)
+		return None
+	async def _prerender_async(self, dsec: DataSourceExecutionContext, key: tuple, minute: datetime) -> None:
+		try:
+			img = await self._draw(dsec, key[0], minute, key[1], key[2])
+			if img is not None:
+				self.frames.put(key, minute, img)
+		except Exception as e:
+			self.logger.error(f"Failed to pre-render clock image for {minute}: {str(e)}")
+	def _schedule_prerender(self, dsec: DataSourceExecutionContext, key: tuple, minute: datetime) -> None:
+		if self._prerender is not None and not self._prerender.done():
+			return
+		if minute in self.frames:
+			return
+		self._prerender = asyncio.get_running_loop().create_task(self._prerender_async(dsec, key, minute))
+	async def _render_frame(self, dsec: DataSourceExecutionContext, key: tuple) -> Image.Image|None:
+		"""Hand out the pre-rendered frame of the scheduled minute (rendering it now on a miss) and start on the next one."""
+		minute = dsec.timestamp.replace(second=0, microsecond=0)
+		if self._prerender is not None and not self._prerender.done():
+			# the next frame is still being rendered; it is the one we need
+			await asyncio.shield(self._prerender)
+		img = self.frames.take(key, minute)
+		prerendered = img is not None
+		if img is None:
+			img = await self._draw(dsec, key[0], minute, key[1], key[2])
+		tod = dsec.provider.get_service(TimeOfDay)
+		now = tod.current_time() if tod is not None else datetime.now(minute.tzinfo)
+		skew = (now - minute).total_seconds()
+		self.logger.debug(f"clock frame {minute.strftime('%H:%M')} prerendered={prerendered} skew={skew:.3f}s")
+		router = dsec.provider.get_service(MessageRouter)
+		if router is not None:
+			router.send("telemetry", Telemetry(now, "clock", { "displayed": minute.isoformat(), "actual": now.isoformat(), "skew_s": skew, "prerendered": prerendered }))
+		self._schedule_prerender(dsec, key, minute + timedelta(minutes=1))
+		return img
 	async def render_async(self, dsec: DataSourceExecutionContext, params:Mapping[str,Any], state:Any) -> MediaRenderResult | None:
 		img: Image.Image|None = None
 		try:
-			dimensions = dsec.dimensions
 			clock_face = state.get("clock_face", None)
 			primary_color = state.get("primary_color", None)
 			secondary_color = state.get("secondary_color", None)
 			if not clock_face or not primary_color or not secondary_color:
 				raise RuntimeError("Clock parameters not properly initialized.")
-			if clock_face == "Gradient Clock":
-				img = Clock.draw_conic_clock(dimensions, dsec.timestamp, primary_color, secondary_color)
-			elif clock_face == "Digital Clock":
-				stm = dsec.provider.required(StaticConfigurationManager)
-				img = Clock.draw_digital_clock(dimensions, dsec.timestamp, stm, primary_color, secondary_color)
-			elif clock_face == "Divided Clock":
-				img = Clock.draw_divided_clock(dimensions, dsec.timestamp, primary_color, secondary_color)
-			elif clock_face == "Word Clock":
-				stm = dsec.provider.required(StaticConfigurationManager)
-				img = Clock.draw_word_clock(dimensions, dsec.timestamp, stm, primary_color, secondary_color)
+			if state.get("pre_render", False):
+				img = await self._render_frame(dsec, (clock_face, primary_color, secondary_color, tuple(dsec.dimensions)))
+			else:
+				img = await self._draw(dsec, clock_face, dsec.timestamp, primary_color, secondary_color)
 		except Exception as e:
 			self.logger.error(f"Failed to draw clock image: {str(e)}")
 		return None if img is None else MediaRenderResult(image=img, title=f"{dsec.timestamp.strftime('%H:%M:%S')}")
@@ -55,17 +307,8 @@ class Clock:
 		width, height = dimensions
 		hour_angle, minute_angle = Clock.calculate_clock_angles(time)
 
-		# Draw the hour hand gradient
-		image_hour = Clock.draw_gradient_image(
-				width, height, hour_angle, minute_angle, secondary_color, primary_color
-		)
-		# Draw the minute hand gradient
-		image_minute = Clock.draw_gradient_image(
-				width, height, minute_angle, hour_angle, secondary_color, primary_color
-		)
-
-		# Combine the images using alpha blending
-		final_image = Image.alpha_composite(image_hour, image_minute)
+		# both hand gradients, the minute gradient over the hour gradient
+		final_image = Clock.draw_gradient_face(width, height, hour_angle, minute_angle, secondary_color, primary_color)
 
 		dim = min(width, height)
 		minute_length = dim * 0.35
@@ -83,6 +326,20 @@ class Clock:
 
 		return final_image
 	@staticmethod
+	def digital_font_size(dimensions):
+		return dimensions[0] * 0.36
+	@staticmethod
+	def word_font_size(dimensions):
+		return min(dimensions) * 0.05
+	@staticmethod
+	def font_sizes(clock_face, dimensions) -> dict[str, list[float]]:
+		"""Font family -> sizes the clock face renders with."""
+		if clock_face == "Digital Clock":
+			return { "DS-Digital": [Clock.digital_font_size(dimensions)] }
+		if clock_face == "Word Clock":
+			return { "Napoli": [Clock.word_font_size(dimensions)] }
+		return {}
+	@staticmethod
 	def draw_digital_clock(dimensions, time, stm:StaticConfigurationManager, primary_color=(255,255,255), secondary_color=(0,0,0)):
 		w,h = dimensions
 		time_str = Clock.format_time(time.hour, time.minute, zero_pad = True)
@@ -90,8 +347,7 @@ class Clock:
 		image = Image.new("RGBA", dimensions, secondary_color+(255,))
 		text = Image.new("RGBA", dimensions, (0, 0, 0, 0))
 
-		font_size = w * 0.36
-		fnt = stm.get_font("DS-Digital", font_size)
+		fnt = stm.get_font("DS-Digital", Clock.digital_font_size(dimensions))
 		text_draw = ImageDraw.Draw(text)
 
 		# time text
@@ -102,84 +358,13 @@ class Clock:
 		return combined
 	@staticmethod
 	def draw_word_clock(dimensions, time, stm:StaticConfigurationManager, primary_color=(0,0,0), secondary_color=(255,255,255)):
-		w,h = dimensions
-		bg = Image.new("RGBA", dimensions, primary_color+(255,))
-		dim = min(w,h)
-		font_size = dim*0.05
-		fnt = stm.get_font("Napoli", font_size)
-		canvas = Image.new("RGBA", dimensions, (0, 0, 0, 0))
-		image_draw = ImageDraw.Draw(canvas)
-
-		border = [40, 40]
-		if w > h:
-			border[0] += (w-h)/2
-		elif h > w:
-			border[1] += (h-w)/2
-
-		letter_positions = Clock.translate_word_grid_positions(time.hour % 12, time.minute)
-		letter_grid = [
-			['I','T','L','I','S','A','S','A','M','P','M'],
-			['A','C','Q','U','A','R','T','E','R','D','C'],
-			['T','W','E','N','T','Y','F','I','V','E','X'],
-			['H','A','L','F','S','T','E','N','F','T','O'],
-			['P','A','S','T','E','R','U','N','I','N','E'],
-			['O','N','E','S','I','X','T','H','R','E','E'],
-			['F','O','U','R','F','I','V','E','T','W','O'],
-			['E','I','G','H','T','E','L','E','V','E','N'],
-			['S','E','V','E','N','T','W','E','L','V','E'],
-			['T','E','N','S','E','O','C','L','O','C','K'],
-		]
-
-		canvas_size = min(w,h) - min(border)*2
-		for y, row in enumerate(letter_grid):
-			for x, letter in enumerate(row):
-				x_pos = x*(canvas_size/(len(row)-1)) + border[0] 
-				y_pos = y*(canvas_size/(len(letter_grid)-1)) + border[1]
-
-				fill=secondary_color+(50,)
-				if [y,x] in letter_positions:
-					fill=secondary_color+(255,)
-					image_draw.text((x_pos+2, y_pos+2), letter, anchor="mm", fill=secondary_color+(80,), font=fnt)
-				
-				image_draw.text((x_pos, y_pos), letter, anchor="mm", fill=fill, font=fnt)
-
-		combined = Image.alpha_composite(bg, canvas)
-		return combined
+		fnt = stm.get_font("Napoli", Clock.word_font_size(dimensions))
+		face = _word_clock_face(tuple(dimensions), fnt, tuple(primary_color), tuple(secondary_color))
+		return face.render(Clock.translate_word_grid_positions(time.hour % 12, time.minute))
 	@staticmethod
 	def draw_divided_clock(dimensions, time, primary_color=(32,183,174), secondary_color=(255,255,255)):
-		w,h = dimensions
-		bg = Image.new("RGBA", dimensions, primary_color+(255,))
-		bg_draw = ImageDraw.Draw(bg)
-
-		# used to calculate percentages of sizes
-		dim = min(w,h)
-
-		corners = [(0, h/2), (w,h)]
-		bg_draw.rectangle(corners, fill=secondary_color +(255,))
-
-		canvas = Image.new("RGBA", dimensions, (0, 0, 0, 0))
-		image_draw = ImageDraw.Draw(canvas)
-
-		shadow_offset = max(int(dim * 0.0075), 1)
-		face_size = int(dim * 0.45)
-
-		# clock shadow
-		image_draw.circle((w/2,h/2 + shadow_offset), face_size+2, fill=(0,0,0,50))
-
-		# clock outline
-		image_draw.circle((w/2,h/2), face_size, fill=primary_color, outline=secondary_color, width=int(dim * 0.03125))
-		
-		Clock.draw_hour_marks(image_draw._image, face_size - int(w*0.04375))
-
-		hour_angle, minute_angle = Clock.calculate_clock_angles(time)
-		hand_width = max(int(dim * 0.009), 1)
-		Clock.draw_clock_hand(image_draw._image, int(dim*0.3), minute_angle, secondary_color, hand_width=hand_width, border_color=secondary_color, round_corners=False)
-		Clock.draw_clock_hand(image_draw._image, int(dim*0.2), hour_angle, secondary_color, hand_width=hand_width, border_color=secondary_color, round_corners=False)
-
-		Clock.drew_clock_center(image_draw._image, max(int(dim*0.014), 1), primary_color, secondary_color, width=max(int(dim* 0.007), 1))
-
-		combined = Image.alpha_composite(bg, canvas)
-		return combined
+		face = _divided_clock_face(tuple(dimensions), tuple(primary_color), tuple(secondary_color))
+		return face.render(time)
 
 	@staticmethod
 	def draw_gradient_image(w, h, start_angle, end_angle, start_color, end_color):
@@ -187,34 +372,53 @@ class Clock:
 		Draw a gradient that starts at start_angle and ends at end_angle, using RGBA colors.
 		Angles are interpreted for a clock face (0 at 12 o'clock, increasing clockwise).
 		"""
-		x,y = np.ogrid[:h,:w]
-		cx,cy = h/2, w/2
-
-		start_angle = -start_angle
-		end_angle = -end_angle
-
-		theta = (np.arctan2(x-cx,y-cy) - start_angle)  % (2*np.pi)
-
-		angle_range = ((end_angle-start_angle) % (2 * np.pi))
-		if angle_range == 0:
-				angle_range = 2*np.pi  # Special case: full circle gradient
-
-		anglemask = theta <= angle_range
-		theta = theta / angle_range  # Normalize to [0, 1] within range
-
+		mask, theta = _gradient_position(_angle_field(w, h), start_angle, end_angle)
+		start_color = np.array(Clock.pad_color(start_color), dtype=np.float32)
+		end_color = np.array(Clock.pad_color(end_color), dtype=np.float32)
 		# Interpolate colors between start and end within the mask
-		gradient = np.zeros((h, w, 4), dtype=np.uint8)
-		start_color = Clock.pad_color(start_color)
-		end_color = Clock.pad_color(end_color)
-		for c in range(4):  # Iterate through RGBA channels
-				gradient[..., c] = (
-						start_color[c] * (1 - theta) + end_color[c] * (theta)
-				).astype(np.uint8)
-		
+		gradient = (start_color + (end_color - start_color) * theta[..., None]).astype(np.uint8)
 		# Fill with the specified solid color
-		gradient[~anglemask] = (0, 0, 0, 0)
+		gradient[~mask] = (0, 0, 0, 0)
 		return Image.fromarray(gradient, mode="RGBA")
 	@staticmethod
+	def draw_gradient_face(w, h, hour_angle, minute_angle, start_color, end_color):
+		"""
+		Equivalent of alpha compositing the minute gradient (minute_angle to hour_angle) over the hour gradient (hour_angle to minute_angle),
+		in one pass over a cached angle field.
+		"""
+		field = _angle_field(w, h)
+		start_color = np.array(Clock.pad_color(start_color), dtype=np.float32)
+		end_color = np.array(Clock.pad_color(end_color), dtype=np.float32)
+		delta = end_color - start_color
+		if start_color[3] == 255 and end_color[3] == 255:
+			# opaque: the two gradients tile the circle and the minute gradient wins on the shared edge
+			theta = np.remainder(field + np.float32(hour_angle), np.float32(2*np.pi))
+			hour_range = (hour_angle - minute_angle) % (2 * np.pi) or 2*np.pi
+			minute_range = 2*np.pi - hour_range or 2*np.pi
+			minute_part = theta >= np.float32(hour_range)
+			theta = np.where(minute_part, (theta - np.float32(hour_range)) * np.float32(1 / minute_range), theta * np.float32(1 / hour_range))
+			# color lookup instead of interpolating every pixel
+			lut = (start_color + delta * np.linspace(0, 1, GRADIENT_STEPS, dtype=np.float32)[:, None]).astype(np.uint8)
+			index = (theta * np.float32(GRADIENT_STEPS - 1) + np.float32(0.5)).astype(np.uint16)
+			np.minimum(index, GRADIENT_STEPS - 1, out=index)
+			face = lut.view(np.uint32).ravel()[index]
+			return Image.fromarray(face.view(np.uint8).reshape(h, w, 4), mode="RGBA")
+		hour_mask, hour_theta = _gradient_position(field, hour_angle, minute_angle)
+		minute_mask, minute_theta = _gradient_position(field, minute_angle, hour_angle)
+		# translucent: "over" operator with the same per-layer truncation as the separate images
+		def _layer(mask, theta):
+			layer = np.floor(start_color + delta * theta[..., None])
+			layer[~mask] = 0
+			return layer
+		under = _layer(hour_mask, hour_theta)
+		over = _layer(minute_mask, minute_theta)
+		over_alpha = over[..., 3:] / 255
+		under_alpha = under[..., 3:] / 255 * (1 - over_alpha)
+		alpha = over_alpha + under_alpha
+		rgb = np.divide(over[..., :3] * over_alpha + under[..., :3] * under_alpha, alpha, out=np.zeros_like(over[..., :3]), where=alpha > 0)
+		face = np.concatenate([rgb, alpha * 255], axis=2)
+		return Image.fromarray(np.rint(face).astype(np.uint8), mode="RGBA")
+	@staticmethod
 	def pad_color(color):
 		# Add 255, until 4 values (RGBA) are in that array
 		return tuple(list(color) + [255] * (4 - len(color)))
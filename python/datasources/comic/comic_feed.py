@@ -2,7 +2,8 @@ from typing import IO, Any, Mapping
 from PIL import Image, ImageDraw, ImageFont
 
 from ...model.configuration_manager import SettingsConfigurationManager, StaticConfigurationManager
-from ...task.async_http_worker_pool import client_var
+from ...task.async_http_worker_pool import client_var, run_cpu
+from ...task.resilience import resilience_var
 from ...utils.image_utils import stream_to_buffer
 from .comic_parser import get_items_async
 from ..data_source import DataSource, DataSourceExecutionContext, MediaListAsync, MediaRenderAsync, MediaRenderResult
@@ -79,5 +80,6 @@ class ComicFeedAsync(DataSource, MediaListAsync, MediaRenderAsync):
 		return MediaRenderResult(image=img, title=item.get("title", "Comic"))
 	async def _download_and_compose_image(self, item, caption_font, width, height):
 		client = client_var.get()
-		buffer = await stream_to_buffer(client, item["image_url"])
-		return _compose_image(buffer, item, caption_font, width, height)
+		url = item["image_url"]
+		with await resilience_var.get().run(url, lambda: stream_to_buffer(client, url)) as buffer:
+			return await run_cpu(_compose_image, buffer, item, caption_font, width, height)
@@ -1,7 +1,8 @@
 import feedparser
 import re
 
-from ...task.async_http_worker_pool import client_var
+from ...task.async_http_worker_pool import client_var, run_cpu
+from ...task.resilience import resilience_var
 
 COMICS = {
 	"XKCD": {
@@ -90,6 +91,6 @@ def parse_the_feed(comic_name: str, comic: dict, feed: feedparser.FeedParserDict
 async def get_items_async(comic_name):
 	comic = COMICS[comic_name]
 	client = client_var.get()
-	resp = await client.get(comic["feed"], follow_redirects=True)
-	feed = feedparser.parse(resp.text)
-	return parse_the_feed(comic_name, comic, feed)
+	resp = await resilience_var.get().get(client, comic["feed"], follow_redirects=True)
+	# feedparser is pure Python: keep it off the event loop
+	return await run_cpu(lambda: parse_the_feed(comic_name, comic, feedparser.parse(resp.text)))
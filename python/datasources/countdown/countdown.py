@@ -7,10 +7,12 @@ import zoneinfo
 
 from ...model.configuration_manager import SettingsConfigurationManager, StaticConfigurationManager
 from ...plugins.plugin_base import RenderSession
+from ...task.html_render_service import HtmlRenderService
+from ...task.render_cache import RenderCache, RenderValidity
 from ...utils.file_utils import path_to_file_url
 from ...datasources.data_source import DataSource, DataSourceExecutionContext, MediaItemAsync, MediaRenderAsync, MediaRenderResult
 
-def generate_image(schedule_ts:datetime, stm: StaticConfigurationManager, dimensions, settings, display_config) -> MediaRenderResult | None:
+def generate_image(schedule_ts:datetime, stm: StaticConfigurationManager, dimensions, settings, display_config, renderer: HtmlRenderService|None = None, cache: RenderCache|None = None) -> MediaRenderResult | None:
 	#title = settings.get('title')
 	countdown_date_str = settings.get('targetDate')
 
@@ -42,8 +44,9 @@ def generate_image(schedule_ts:datetime, stm: StaticConfigurationManager, dimens
 
 	px = Path(os.path.dirname(__file__)).joinpath("render")
 	css = path_to_file_url(os.path.join(px.resolve(), "countdown.css"))
-	rs = RenderSession(stm, px.resolve(), "countdown.html", css)
-	image = rs.render(dimensions, template_params)
+	rs = RenderSession(stm, px.resolve(), "countdown.html", css, renderer, cache)
+	# the day count changes at midnight
+	image = rs.render(dimensions, template_params, RenderValidity.until_local_midnight(current_time))
 	return None if image is None else MediaRenderResult(image=image, title="Countdown")
 
 class CountdownAsync(DataSource, MediaItemAsync, MediaRenderAsync):
@@ -59,5 +62,5 @@ class CountdownAsync(DataSource, MediaItemAsync, MediaRenderAsync):
 		_, display_config = display_cob.get()
 		if display_config is None:
 			raise ValueError("Display settings is None")
-		return generate_image(dsec.timestamp, stm, dsec.dimensions, params, display_config)
+		return generate_image(dsec.timestamp, stm, dsec.dimensions, params, display_config, dsec.provider.get_service(HtmlRenderService), dsec.provider.get_service(RenderCache))
 	pass
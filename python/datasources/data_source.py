@@ -1,9 +1,11 @@
 from dataclasses import dataclass
 from datetime import datetime
+import logging
 from typing import Any, Mapping, Protocol, runtime_checkable
 from PIL import Image
 
 from ..model.service_container import IServiceProvider
+from ..task.protocols import IRequireShutdown
 
 class DataSource:
 	"""
@@ -82,6 +84,13 @@ class MediaRenderAsync(Protocol):
 	async def render_async(self, dsec: DataSourceExecutionContext, params:Mapping[str,Any], state:Any) -> MediaRenderResult | None:
 		...
 
+@runtime_checkable
+class MediaPrefetch(Protocol):
+	"""Ability to prepare upcoming media (elements of a MediaList) in the background, ahead of render_async."""
+	def prefetch(self, dsec: DataSourceExecutionContext, params:Mapping[str,Any], states:list[Any]) -> None:
+		"""MUST NOT block; errors are the source's to log."""
+		...
+
 class DataSourceManager:
 	"""
 	Maintains and manages multiple data sources.
@@ -91,6 +100,14 @@ class DataSourceManager:
 		self.sources = sources
 	def get_source(self, name: str) -> DataSource|None:
 		return self.sources.get(name, None)
+	def shutdown(self) -> None:
+		"""Shut down the data sources that hold resources (e.g. watchers)."""
+		for source in self.sources.values():
+			if isinstance(source, IRequireShutdown):
+				try:
+					source.shutdown()
+				except Exception as e:
+					logging.getLogger(__name__).error(f"Failed to shut down data source {source.id}: {str(e)}")
 	def accept(self, msg: DataSourceMessage) -> None:
 		source = self.get_source(msg.source_id)
 		if source is not None and isinstance(source, DataSourceAccept):
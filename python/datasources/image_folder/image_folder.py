@@ -1,13 +1,22 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import hashlib
 import logging
 import os
+import threading
 from typing import Any, Mapping
 
 from PIL import Image, ImageOps, ImageFilter
-from ..data_source import DataSource, DataSourceExecutionContext, MediaListAsync, MediaRenderAsync, MediaRenderResult
+from ..data_source import DataSource, DataSourceExecutionContext, MediaListAsync, MediaPrefetch, MediaRenderAsync, MediaRenderResult
+from .image_library import IMAGE_EXTENSIONS, ImageLibrary
+from ...model.configuration_manager import DatasourceConfigurationManager
+from ...task.async_http_worker_pool import run_cpu
+from ...task.render_cache import RenderCache, RenderValidity
+from ...utils.image_utils import DEFAULT_RESAMPLE_QUALITY, ResampleQuality, contain_image, draft_image, exif_oriented_size
 
 def list_files_in_folder(folder_path):
 	"""Return a list of image file paths in the given folder, excluding hidden files."""
-	image_extensions = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp')
+	image_extensions = IMAGE_EXTENSIONS
 	return [
 		os.path.join(folder_path, fx)
 		for fx in os.listdir(folder_path)
@@ -18,12 +27,16 @@ def list_files_in_folder(folder_path):
 		)
 	]
 
-def grab_image(image_path, dimensions, pad_image, logger):
+def grab_image(image_path, dimensions, pad_image, logger, resample_quality: ResampleQuality = DEFAULT_RESAMPLE_QUALITY):
 	"""Load an image from disk, auto-orient it, and resize to fit within the specified dimensions, preserving aspect ratio."""
 	try:
 		img = Image.open(image_path)
+		if resample_quality == "speed":
+			# decode a JPEG at reduced scale instead of full resolution
+			width, height = exif_oriented_size(img)
+			img = draft_image(img, min(dimensions[0] / width, dimensions[1] / height))
 		img = ImageOps.exif_transpose(img)  # Correct orientation using EXIF
-		img = ImageOps.contain(img, dimensions, Image.Resampling.LANCZOS)
+		img = contain_image(img, dimensions, resample_quality)
 
 		if pad_image:
 			bkg = ImageOps.fit(img, dimensions)
@@ -36,16 +49,101 @@ def grab_image(image_path, dimensions, pad_image, logger):
 		logger.error(f"Error loading image from {image_path}: {e}")
 		return None
 
-class ImageFolderAsync(DataSource, MediaListAsync, MediaRenderAsync):
+# disk budget of the display-ready frames
+FRAME_CACHE_BYTES = 256 * 1024 * 1024
+
+def frame_key(image_path: str, dimensions: tuple[int, int], pad_image: bool, resample_quality: str) -> str:
+	"""Cache key of a display-ready frame: the source fingerprint (path, mtime, size) and everything grab_image depends on."""
+	stat = os.stat(image_path)
+	digest = hashlib.sha256()
+	digest.update(f"{os.path.abspath(image_path)}\0{stat.st_mtime_ns}\0{stat.st_size}\0{dimensions[0]}x{dimensions[1]}\0{pad_image}\0{resample_quality}".encode("utf-8"))
+	return digest.hexdigest()
+
+class ImageFolderAsync(DataSource, MediaListAsync, MediaRenderAsync, MediaPrefetch):
 	def __init__(self, id: str, name: str):
 		super().__init__(id, name)
+		self.libraries: dict[str, ImageLibrary] = {}
+		self.frames: RenderCache|None = None
+		self._warming: set[str] = set()
+		self._warmer: ThreadPoolExecutor|None = None
+		self._lock = threading.Lock()
 		self.logger = logging.getLogger(__name__)
+	def frame_cache(self, dsec: DataSourceExecutionContext) -> RenderCache:
+		"""Display-ready frames, kept in the datasource storage."""
+		with self._lock:
+			if self.frames is None:
+				dscm = dsec.provider.get_service(DatasourceConfigurationManager)
+				self.frames = RenderCache(os.path.join(dscm.ROOT_PATH, "frames") if dscm is not None else None, memory_items=2, disk_bytes=FRAME_CACHE_BYTES)
+			return self.frames
+	def render_frame(self, dsec: DataSourceExecutionContext, image_path: str, resample_quality: ResampleQuality) -> Image.Image|None:
+		"""The frame from the cache, or grab_image (storing the result)."""
+		frames = self.frame_cache(dsec)
+		try:
+			key = frame_key(image_path, dsec.dimensions, True, resample_quality)
+		except OSError as e:
+			self.logger.error(f"Error loading image from {image_path}: {e}")
+			return None
+		now = datetime.now()
+		img = frames.get(key, now)
+		if img is None:
+			img = grab_image(image_path, dsec.dimensions, pad_image=True, logger=self.logger, resample_quality=resample_quality)
+			if img is not None:
+				frames.put(key, img, RenderValidity.indefinite(now))
+		return img
+	def library(self, dsec: DataSourceExecutionContext, folder_path: str) -> ImageLibrary:
+		"""The (watched) image library of the folder; its index is kept in the datasource storage."""
+		folder_path = os.path.abspath(folder_path)
+		with self._lock:
+			library = self.libraries.get(folder_path, None)
+			if library is None:
+				dscm = dsec.provider.get_service(DatasourceConfigurationManager)
+				index_path = None
+				if dscm is not None:
+					index_path = os.path.join(dscm.ROOT_PATH, "library", f"{hashlib.sha1(folder_path.encode('utf-8')).hexdigest()}.json")
+				library = ImageLibrary(folder_path, index_path)
+				try:
+					library.start_watching()
+				except Exception as e:
+					self.logger.warning(f"Not watching {folder_path}, scanning on every open: {e}")
+				self.libraries[folder_path] = library
+			return library
 	async def open_async(self, dsec: DataSourceExecutionContext, params: Mapping[str, Any]) -> list:
 		folder_path = params.get('folder')
-		image_files = list_files_in_folder(folder_path)
-		return image_files
+		if folder_path is None:
+			raise ValueError("folder is not specified")
+		library = self.library(dsec, folder_path)
+		# the first index of a large folder walks and probes every file
+		return await run_cpu(library.select, params.get("order", "name"), params.get("filter", None), params.get("orientation", "any"))
+	def prefetch(self, dsec: DataSourceExecutionContext, params: Mapping[str, Any], states: list[Any]) -> None:
+		"""Build the frames of the upcoming images on a background thread, one at a time."""
+		resample_quality = params.get("resample", DEFAULT_RESAMPLE_QUALITY)
+		def _warm(image_path: str) -> None:
+			try:
+				self.render_frame(dsec, image_path, resample_quality)
+			finally:
+				with self._lock:
+					self._warming.discard(image_path)
+		with self._lock:
+			if self._warmer is None:
+				self._warmer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ImageFolderWarmer")
+			for image_path in states:
+				if image_path is None or image_path in self._warming:
+					continue
+				self._warming.add(image_path)
+				self._warmer.submit(_warm, image_path)
+	def shutdown(self) -> None:
+		with self._lock:
+			libraries = list(self.libraries.values())
+			self.libraries.clear()
+			warmer = self._warmer
+			self._warmer = None
+		if warmer is not None:
+			warmer.shutdown(wait=True, cancel_futures=True)
+		for library in libraries:
+			library.stop_watching()
 	async def render_async(self, dsec: DataSourceExecutionContext, params:Mapping[str,Any], state:Any) -> MediaRenderResult | None:
 		if state is None:
 			return None
-		img = grab_image(state, dsec.dimensions, pad_image=True, logger=self.logger)
+		resample_quality = params.get("resample", DEFAULT_RESAMPLE_QUALITY)
+		img = await run_cpu(self.render_frame, dsec, state, resample_quality)
 		return None if img is None else MediaRenderResult(image=img, title="Image Folder")
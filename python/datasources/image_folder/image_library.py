@@ -0,0 +1,201 @@
+from dataclasses import dataclass
+import fnmatch
+import json
+import logging
+import os
+import random
+import threading
+from typing import Literal
+from PIL import Image
+from watchdog.events import FileSystemEvent, FileSystemEventHandler
+from watchdog.observers import Observer
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp')
+INDEX_VERSION = 1
+# EXIF orientation tag
+ORIENTATION_TAG = 0x0112
+
+type LibraryOrder = Literal["name", "date", "shuffle"]
+type LibraryOrientation = Literal["any", "landscape", "portrait"]
+
+def is_image_file(name: str) -> bool:
+	return name.lower().endswith(IMAGE_EXTENSIONS) and not name.startswith('.')
+
+@dataclass(frozen=True, slots=True)
+class ImageEntry:
+	"""One indexed image; path is relative to the library root, width/height are before EXIF orientation."""
+	path: str
+	mtime: float
+	size: int
+	width: int
+	height: int
+	orientation: int
+	@property
+	def oriented_size(self) -> tuple[int, int]:
+		# orientations 5-8 swap width and height
+		return (self.height, self.width) if self.orientation in (5, 6, 7, 8) else (self.width, self.height)
+	def to_row(self) -> list:
+		return [self.path, self.mtime, self.size, self.width, self.height, self.orientation]
+	@staticmethod
+	def from_row(row: list) -> "ImageEntry":
+		return ImageEntry(row[0], row[1], row[2], row[3], row[4], row[5])
+
+def probe_image(path: str, rel_path: str, stat: os.stat_result) -> ImageEntry:
+	"""Read the dimensions and EXIF orientation from the image header (the pixels are not decoded)."""
+	with Image.open(path) as img:
+		orientation = img.getexif().get(ORIENTATION_TAG, 1)
+		return ImageEntry(rel_path, stat.st_mtime, stat.st_size, img.width, img.height, orientation)
+
+class _LibraryEventHandler(FileSystemEventHandler):
+	def __init__(self, library: "ImageLibrary"):
+		super().__init__()
+		self._library = library
+	def on_any_event(self, event: FileSystemEvent):
+		if event.event_type in ("opened", "closed_no_write"):
+			return
+		self._library.mark_dirty(os.fsdecode(event.src_path))
+		if event.dest_path:
+			self._library.mark_dirty(os.fsdecode(event.dest_path))
+
+class ImageLibrary:
+	"""
+	Index of the images under a folder (recursive), persisted as compact JSON.
+	The first open walks the folder and only probes new or changed files; while watching, later opens only revisit the paths reported by watchdog.
+	Thread-safe.
+	"""
+	def __init__(self, root: str, index_path: str|None = None):
+		self.root = os.path.abspath(root)
+		self.index_path = index_path
+		self._entries: dict[str, ImageEntry] = {}
+		self._dirty: set[str] = set()
+		self._loaded = False
+		self._scanned = False
+		self._changed = False
+		self._observer = None
+		self._lock = threading.Lock()
+		self.logger = logging.getLogger(__name__)
+	def _load_index(self) -> None:
+		if self.index_path is None or not os.path.exists(self.index_path):
+			return
+		try:
+			with open(self.index_path, "r", encoding="utf-8") as index_file:
+				index = json.load(index_file)
+			if index.get("version") != INDEX_VERSION or index.get("root") != self.root:
+				return
+			self._entries = { row[0]: ImageEntry.from_row(row) for row in index.get("entries", []) }
+		except Exception as e:
+			self.logger.warning(f"Ignoring image index {self.index_path}: {e}")
+	def _save_index(self) -> None:
+		if self.index_path is None:
+			return
+		try:
+			os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+			temp_path = f"{self.index_path}.tmp"
+			with open(temp_path, "w", encoding="utf-8") as index_file:
+				json.dump({ "version": INDEX_VERSION, "root": self.root, "entries": [entry.to_row() for entry in self._entries.values()] }, index_file, separators=(",", ":"))
+			os.replace(temp_path, self.index_path)
+		except Exception as e:
+			self.logger.warning(f"Failed to save image index {self.index_path}: {e}")
+	def _update_file(self, path: str, rel_path: str, stat: os.stat_result) -> None:
+		entry = self._entries.get(rel_path, None)
+		if entry is not None and entry.mtime == stat.st_mtime and entry.size == stat.st_size:
+			return
+		try:
+			self._entries[rel_path] = probe_image(path, rel_path, stat)
+		except Exception as e:
+			self.logger.warning(f"Skipping {path}: {e}")
+			self._entries.pop(rel_path, None)
+		self._changed = True
+	def _scan(self, folder: str, seen: set[str]) -> None:
+		"""Walk the folder with scandir, updating changed entries."""
+		try:
+			with os.scandir(folder) as it:
+				for dentry in it:
+					if dentry.name.startswith('.'):
+						continue
+					if dentry.is_dir(follow_symlinks=False):
+						self._scan(dentry.path, seen)
+					elif dentry.is_file() and is_image_file(dentry.name):
+						rel_path = os.path.relpath(dentry.path, self.root)
+						seen.add(rel_path)
+						self._update_file(dentry.path, rel_path, dentry.stat())
+		except OSError as e:
+			self.logger.warning(f"Failed to scan {folder}: {e}")
+	def _remove_missing(self, prefix: str, seen: set[str]) -> None:
+		for rel_path in [px for px in self._entries if (prefix == "" or px == prefix or px.startswith(prefix + os.sep)) and px not in seen]:
+			del self._entries[rel_path]
+			self._changed = True
+	def _rescan(self, rel_path: str) -> None:
+		"""Revisit one path reported as changed: a file, a folder, or something that is gone."""
+		path = os.path.join(self.root, rel_path)
+		seen: set[str] = set()
+		if os.path.isdir(path):
+			self._scan(path, seen)
+		elif os.path.isfile(path) and is_image_file(os.path.basename(path)):
+			seen.add(rel_path)
+			self._update_file(path, rel_path, os.stat(path))
+		self._remove_missing(rel_path, seen)
+	def mark_dirty(self, path: str) -> None:
+		rel_path = os.path.relpath(path, self.root)
+		if rel_path.startswith(os.pardir) or any(px.startswith('.') for px in rel_path.split(os.sep)):
+			return
+		with self._lock:
+			self._dirty.add(rel_path)
+	def refresh(self) -> list[ImageEntry]:
+		"""Bring the index up to date and return the entries."""
+		with self._lock:
+			if not self._loaded:
+				self._load_index()
+				self._loaded = True
+			if not self._scanned or self._observer is None:
+				seen: set[str] = set()
+				self._dirty.clear()
+				self._scan(self.root, seen)
+				self._remove_missing("", seen)
+				self._scanned = True
+			else:
+				dirty = sorted(self._dirty)
+				self._dirty.clear()
+				for rel_path in dirty:
+					self._rescan(rel_path)
+			if self._changed:
+				self._save_index()
+				self._changed = False
+			return list(self._entries.values())
+	def select(self, order: LibraryOrder = "name", pattern: str|None = None, orientation: LibraryOrientation = "any", seed: int|None = None) -> list[str]:
+		"""Absolute paths of the (filtered) images in the given order."""
+		entries = self.refresh()
+		if pattern:
+			entries = [ex for ex in entries if fnmatch.fnmatch(ex.path.replace(os.sep, "/"), pattern)]
+		if orientation == "landscape":
+			entries = [ex for ex in entries if ex.oriented_size[0] >= ex.oriented_size[1]]
+		elif orientation == "portrait":
+			entries = [ex for ex in entries if ex.oriented_size[0] < ex.oriented_size[1]]
+		if order == "date":
+			entries.sort(key=lambda ex: (ex.mtime, ex.path))
+		else:
+			entries.sort(key=lambda ex: ex.path)
+			if order == "shuffle":
+				random.Random(seed).shuffle(entries)
+		return [os.path.join(self.root, ex.path) for ex in entries]
+	def entry(self, path: str) -> ImageEntry|None:
+		with self._lock:
+			return self._entries.get(os.path.relpath(path, self.root), None)
+	def start_watching(self) -> None:
+		"""Keep the index current from file system events instead of walking the folder on every open."""
+		with self._lock:
+			if self._observer is not None:
+				return
+			observer = Observer()
+			observer.schedule(_LibraryEventHandler(self), path=self.root, recursive=True)
+			observer.start()
+			self._observer = observer
+			# events before the watch started were not seen
+			self._scanned = False
+	def stop_watching(self) -> None:
+		with self._lock:
+			observer = self._observer
+			self._observer = None
+		if observer is not None:
+			observer.stop()
+			observer.join()
@@ -1,14 +1,45 @@
-from typing import Any, Mapping
+import asyncio
+import os
+import shutil
+from typing import IO, Any, Mapping
 from PIL import Image
-from datetime import timedelta, datetime
+from datetime import date, timedelta, datetime
 import logging
 
-from httpx import HTTPStatusError
+import httpx
 
 from ..data_source import DataSource, DataSourceExecutionContext, MediaListAsync, MediaRenderAsync, MediaRenderResult
-from ...utils.image_utils import get_image_async
+from ...model.configuration_manager import DatasourceConfigurationManager
+from ...task.async_http_worker_pool import client_var, run_cpu
+from ...task.resilience import resilience_var
+from ...utils.image_utils import stream_to_buffer
 
 FREEDOM_FORUM_URL = "https://cdn.freedomforum.org/dfp/jpg{}/lg/{}.jpg"
+# the freshest edition wins: next day, then today, then prior days
+DAY_OFFSETS = [1, 0, -1, -2]
+
+def cover_url(newspaper_slug: str, day: date) -> str:
+	return FREEDOM_FORUM_URL.format(day.day, newspaper_slug)
+
+def is_image_response(response: httpx.Response) -> bool:
+	return response.status_code in (200, 206) and response.headers.get("content-type", "").startswith("image/")
+
+def _expand_cover(buffer: IO[bytes], dimensions) -> Image.Image:
+	image = Image.open(buffer)
+	image.load()
+	# expand height if newspaper is wider than resolution
+	img_width, img_height = image.size
+	desired_width, desired_height = dimensions
+
+	img_ratio = img_width / img_height
+	desired_ratio = desired_width / desired_height
+
+	if img_ratio < desired_ratio:
+		new_height =  int((img_width*desired_width) / desired_height)
+		new_image = Image.new("RGB", (img_width, new_height), (255, 255, 255))
+		new_image.paste(image, (0, 0))
+		image = new_image
+	return image
 class NewspaperAsync(DataSource, MediaListAsync, MediaRenderAsync):
 	def __init__(self, id: str, name: str):
 		super().__init__(id, name)
@@ -22,40 +53,106 @@ class NewspaperAsync(DataSource, MediaListAsync, MediaRenderAsync):
 	async def render_async(self, dsec: DataSourceExecutionContext, params:Mapping[str,Any], state:Any) -> MediaRenderResult | None:
 		if state is None:
 			return None
-		image = await self._generate_image(state, dsec.dimensions, dsec.timestamp)
+		image = await self._generate_image(state, dsec.dimensions, dsec.timestamp, self._cover_folder(dsec))
 		if image is not None:
 			return MediaRenderResult(image=image, title=f"Newspaper {state}")
 		return None
-	async def _generate_image(self, newspaper_slug:str, dimensions, timestamp:datetime) -> Image.Image | None:
-		# Get today's date
-		today = timestamp
-		# check the next day, then today, then prior day
-		days = [today + timedelta(days=diff) for diff in [1,0,-1,-2]]
-
-		image = None
-		for date in days:
-			image_url = FREEDOM_FORUM_URL.format(date.day, newspaper_slug)
+	def _cover_folder(self, dsec: DataSourceExecutionContext) -> str|None:
+		dscm = dsec.provider.get_service(DatasourceConfigurationManager)
+		return os.path.join(dscm.ROOT_PATH, "covers") if dscm is not None else None
+	async def _probe(self, client: httpx.AsyncClient, url: str) -> bool:
+		"""Whether a cover is published at url, without downloading it."""
+		async def _head() -> httpx.Response:
+			response = await client.head(url, follow_redirects=True)
+			if response.status_code == 405:
+				# no HEAD; ask for the first byte
+				response = await client.get(url, headers={ "Range": "bytes=0-0" }, follow_redirects=True)
+			return response
+		try:
+			response = await resilience_var.get().run(url, _head)
+			self.logger.debug(f"Probed {url}: {response.status_code}")
+			return is_image_response(response)
+		except Exception as e:
+			self.logger.debug(f"Failed to probe {url}: {e}")
+			return False
+	async def _download_cover(self, newspaper_slug: str, days: list[date]) -> tuple[date, IO[bytes]]|None:
+		"""Probe the candidate days (freshest first) at once, then download the freshest cover that exists; returns its edition date."""
+		client = client_var.get()
+		found = await asyncio.gather(*[self._probe(client, cover_url(newspaper_slug, day)) for day in days])
+		for day, ok in zip(days, found):
+			if not ok:
+				continue
+			image_url = cover_url(newspaper_slug, day)
 			try:
-				image = await get_image_async(image_url)
-				if image:
-					self.logger.info(f"Found {newspaper_slug} front cover for {date.strftime('%Y-%m-%d')}")
-					break
-			except HTTPStatusError as e:
+				buffer = await resilience_var.get().run(image_url, lambda: stream_to_buffer(client, image_url, ctok=lambda ct: ct.startswith("image/")))
+				self.logger.info(f"Found {newspaper_slug} front cover for {day.strftime('%Y-%m-%d')}")
+				return day, buffer
+			except httpx.HTTPStatusError as e:
 				self.logger.debug(f"Failed to fetch {image_url}: {e.response.status_code}")
-		if image:
-			# expand height if newspaper is wider than resolution
-			img_width, img_height = image.size
-			desired_width, desired_height = dimensions
-
-			img_ratio = img_width / img_height
-			desired_ratio = desired_width / desired_height
-
-			if img_ratio < desired_ratio:
-				new_height =  int((img_width*desired_width) / desired_height)
-				new_image = Image.new("RGB", (img_width, new_height), (255, 255, 255))
-				new_image.paste(image, (0, 0))
-				image = new_image
+		return None
+	def _cached_cover(self, folder: str|None, newspaper_slug: str, oldest: date) -> tuple[date, IO[bytes]]|None:
+		"""The newest cached edition from oldest on, with its date."""
+		if folder is None:
+			return None
+		editions: list[date] = []
+		try:
+			for entry in os.scandir(folder):
+				if entry.name.startswith(f"{newspaper_slug}-") and entry.name.endswith(".jpg"):
+					try:
+						editions.append(date.fromisoformat(entry.name[len(newspaper_slug) + 1:-len(".jpg")]))
+					except ValueError:
+						pass
+		except FileNotFoundError:
+			return None
+		if len(editions) == 0 or max(editions) < oldest:
+			return None
+		edition = max(editions)
+		try:
+			return edition, open(os.path.join(folder, f"{newspaper_slug}-{edition.isoformat()}.jpg"), "rb")
+		except FileNotFoundError:
+			return None
+	def _cache_cover(self, folder: str|None, newspaper_slug: str, edition: date, buffer: IO[bytes]) -> None:
+		if folder is None:
+			return
+		try:
+			os.makedirs(folder, exist_ok=True)
+			name = f"{newspaper_slug}-{edition.isoformat()}.jpg"
+			with open(os.path.join(folder, f"{name}.tmp"), "wb") as cover_file:
+				shutil.copyfileobj(buffer, cover_file)
+			os.replace(os.path.join(folder, f"{name}.tmp"), os.path.join(folder, name))
+			# older editions are not needed again
+			for entry in os.scandir(folder):
+				if entry.name.startswith(f"{newspaper_slug}-") and entry.name != name:
+					os.remove(entry.path)
+		except OSError as e:
+			self.logger.warning(f"Failed to cache {newspaper_slug} front cover: {e}")
+		finally:
+			buffer.seek(0)
+	async def _generate_image(self, newspaper_slug:str, dimensions, timestamp:datetime, folder: str|None = None) -> Image.Image | None:
+		today = timestamp.date()
+		days = [today + timedelta(days=diff) for diff in DAY_OFFSETS]
+		cached = await run_cpu(self._cached_cover, folder, newspaper_slug, min(days))
+		buffer = None
+		if cached is not None and cached[0] >= today:
+			# the current edition, once it was found, for the rest of the day
+			buffer = cached[1]
 		else:
+			# only editions newer than the cached one are worth looking for
+			try:
+				found = await self._download_cover(newspaper_slug, [day for day in days if cached is None or day > cached[0]])
+			except BaseException:
+				if cached is not None:
+					cached[1].close()
+				raise
+			if found is not None:
+				if cached is not None:
+					cached[1].close()
+				edition, buffer = found
+				await run_cpu(self._cache_cover, folder, newspaper_slug, edition, buffer)
+			elif cached is not None:
+				buffer = cached[1]
+		if buffer is None:
 			raise RuntimeError(f"{newspaper_slug}: Newspaper front cover not found.")
-
-		return image
+		with buffer:
+			# decoding and compositing would hold up the event loop
+			return await run_cpu(_expand_cover, buffer, dimensions)
@@ -0,0 +1,79 @@
+from dataclasses import asdict, dataclass
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from PIL import Image
+
+@dataclass(frozen=True, slots=True)
+class GenerationRequest:
+	"""What an image is generated from; images of equal requests are interchangeable."""
+	text_prompt: str
+	image_model: str
+	image_quality: str
+	randomize_prompt: bool
+	orientation: str
+	@property
+	def key(self) -> str:
+		return hashlib.sha256(json.dumps(asdict(self), sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+@dataclass(frozen=True, slots=True)
+class GeneratedImage:
+	"""Metadata kept next to a buffered image."""
+	prompt: str
+	# the prompt sent to the image model (after randomizing)
+	used_prompt: str
+	image_model: str
+	image_quality: str
+	orientation: str
+	created: float
+
+class ImageBuffer:
+	"""
+	Generated images waiting for their slot, in the datasource storage: <key>/<created>.png with a .json of its GeneratedImage.
+	Served oldest first.
+	"""
+	def __init__(self, folder: str):
+		self.folder = folder
+		self._lock = threading.Lock()
+		self.logger = logging.getLogger(__name__)
+	def _entries(self, key: str) -> list[str]:
+		try:
+			return sorted(name[:-len(".json")] for name in os.listdir(os.path.join(self.folder, key)) if name.endswith(".json"))
+		except FileNotFoundError:
+			return []
+	def count(self, key: str) -> int:
+		with self._lock:
+			return len(self._entries(key))
+	def put(self, key: str, image: Image.Image, meta: GeneratedImage) -> None:
+		folder = os.path.join(self.folder, key)
+		stem = f"{time.time_ns():020d}"
+		with self._lock:
+			os.makedirs(folder, exist_ok=True)
+			image.save(os.path.join(folder, f"{stem}.png"), "PNG")
+			# the metadata last: an entry is complete once it exists
+			with open(os.path.join(folder, f"{stem}.json.tmp"), "w", encoding="utf-8") as meta_file:
+				json.dump(asdict(meta), meta_file)
+			os.replace(os.path.join(folder, f"{stem}.json.tmp"), os.path.join(folder, f"{stem}.json"))
+	def pop(self, key: str) -> tuple[Image.Image, GeneratedImage]|None:
+		"""The oldest buffered image (loaded), removed from the buffer; None when empty."""
+		with self._lock:
+			for stem in self._entries(key):
+				path = os.path.join(self.folder, key, stem)
+				try:
+					with open(f"{path}.json", "r", encoding="utf-8") as meta_file:
+						meta = GeneratedImage(**json.load(meta_file))
+					with Image.open(f"{path}.png") as img:
+						image = img.copy()
+					return image, meta
+				except (OSError, ValueError, TypeError) as e:
+					self.logger.warning(f"Dropping buffered image {path}: {e}")
+				finally:
+					for suffix in (".json", ".png"):
+						try:
+							os.remove(f"{path}{suffix}")
+						except FileNotFoundError:
+							pass
+			return None
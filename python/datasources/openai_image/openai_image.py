@@ -1,3 +1,6 @@
+import asyncio
+import os
+import time
 from typing import Any, Mapping
 from PIL import Image
 from openai import BadRequestError
@@ -6,6 +9,8 @@ from io import BytesIO
 import base64
 import openai
 
+from .image_buffer import GeneratedImage, GenerationRequest, ImageBuffer
+from ...task.async_http_worker_pool import run_cpu
 from ...utils.image_utils import get_image_async
 from ...model.configuration_manager import DatasourceConfigurationManager, SettingsConfigurationManager
 from ..data_source import DataSource, DataSourceExecutionContext, MediaListAsync, MediaRenderAsync, MediaRenderResult
@@ -13,11 +18,59 @@ from ..data_source import DataSource, DataSourceExecutionContext, MediaListAsync
 DEFAULT_IMAGE_MODEL = "dall-e-3"
 DEFAULT_IMAGE_QUALITY = "standard"
 IMAGE_MODELS = ["dall-e-3", "dall-e-2", "gpt-image-1"]
+# images generated ahead of their slots, per request; each one is paid for
+DEFAULT_PREGENERATE = 1
+MAX_PREGENERATE = 5
+# seconds shutdown waits for the refills to stop and the clients to close
+SHUTDOWN_SECONDS = 10
 
 class OpenAIAsync(DataSource, MediaListAsync, MediaRenderAsync):
 	def __init__(self, id: str, name: str):
 		super().__init__(id, name)
+		# None: the OpenAI API (or OPENAI_BASE_URL)
+		self.base_url: str|None = None
+		self.buffer: ImageBuffer|None = None
+		self._clients: dict[str, openai.AsyncOpenAI] = {}
+		# one refill at a time per request key
+		self._refills: dict[str, asyncio.Task] = {}
+		# the loop the clients and refills belong to
+		self._loop: asyncio.AbstractEventLoop|None = None
 		self.logger = logging.getLogger(__name__)
+	def _client(self, api_key: str) -> openai.AsyncOpenAI:
+		"""One client (and connection pool) per API key."""
+		client = self._clients.get(api_key, None)
+		if client is None:
+			client = openai.AsyncOpenAI(api_key = api_key, base_url=self.base_url, timeout=60, max_retries=3)
+			self._clients[api_key] = client
+			self._loop = asyncio.get_running_loop()
+		return client
+	async def close_async(self) -> None:
+		"""Stop the refills and close the clients; on the loop they ran on."""
+		refills = list(self._refills.values())
+		for refill in refills:
+			refill.cancel()
+		await asyncio.gather(*refills, return_exceptions=True)
+		self._refills.clear()
+		clients = list(self._clients.values())
+		self._clients.clear()
+		for client in clients:
+			await client.close()
+	def shutdown(self) -> None:
+		"""Run close_async on the loop the clients were created on; it must still be running."""
+		loop = self._loop
+		self._loop = None
+		if loop is None or loop.is_closed() or not loop.is_running():
+			return
+		try:
+			asyncio.run_coroutine_threadsafe(self.close_async(), loop).result(timeout=SHUTDOWN_SECONDS)
+		except Exception as e:
+			self.logger.warning(f"Failed to close the OpenAI clients: {e}")
+	def _image_buffer(self, dsec: DataSourceExecutionContext) -> ImageBuffer|None:
+		if self.buffer is None:
+			dscm = dsec.provider.get_service(DatasourceConfigurationManager)
+			if dscm is not None:
+				self.buffer = ImageBuffer(os.path.join(dscm.ROOT_PATH, "buffer"))
+		return self.buffer
 	async def open_async(self, dsec: DataSourceExecutionContext, params: Mapping[str, Any]) -> list:
 		dscm = dsec.provider.required(DatasourceConfigurationManager)
 		scm = dsec.provider.required(SettingsConfigurationManager)
@@ -39,27 +92,59 @@ class OpenAIAsync(DataSource, MediaListAsync, MediaRenderAsync):
 		if display_settings is None:
 			raise RuntimeError("Display settings not found.")
 		orientation = display_settings.get("orientation", "landscape")
-		return [{ "api_key": api_key, "text_prompt": text_prompt, "image_model": image_model, "image_quality": image_quality, "randomize_prompt": randomize_prompt, "orientation": orientation }]
+		pregenerate = max(0, min(MAX_PREGENERATE, int(params.get("pregenerate", DEFAULT_PREGENERATE))))
+		return [{ "api_key": api_key, "text_prompt": text_prompt, "image_model": image_model, "image_quality": image_quality, "randomize_prompt": randomize_prompt, "orientation": orientation, "pregenerate": pregenerate }]
 	async def render_async(self, dsec: DataSourceExecutionContext, params:Mapping[str,Any], state:Any) -> MediaRenderResult | None:
 		if state is None:
 			return None
-		image = await self._dispatch_image(dsec, state.get('api_key'), state.get('image_model'), state.get('image_quality'), state.get('text_prompt'), state.get('randomize_prompt'), state.get('orientation'))
+		request = GenerationRequest(state.get('text_prompt'), state.get('image_model'), state.get('image_quality'), state.get('randomize_prompt') == True, state.get('orientation'))
+		buffer = self._image_buffer(dsec)
+		buffered = await run_cpu(buffer.pop, request.key) if buffer is not None else None
+		if buffered is not None:
+			image, meta = buffered
+			self.logger.info(f"Serving pre-generated image: {meta.used_prompt}")
+		else:
+			image = await self._dispatch_image(dsec, state.get('api_key'), request.image_model, request.image_quality, request.text_prompt, request.randomize_prompt, request.orientation)
+		if buffer is not None:
+			self._refill(buffer, state.get('api_key'), request, int(state.get('pregenerate', DEFAULT_PREGENERATE)))
 		return None if image is None else MediaRenderResult(image=image, title=f"OpenAI Image: {state.get('text_prompt', 'Untitled')}")
+	def _refill(self, buffer: ImageBuffer, api_key: str, request: GenerationRequest, count: int) -> None:
+		"""Generate images for the request in the background (on the current loop), until count are buffered."""
+		key = request.key
+		refill = self._refills.get(key, None)
+		if count <= 0 or (refill is not None and not refill.done()):
+			return
+		async def _generate() -> None:
+			try:
+				while await run_cpu(buffer.count, key) < count:
+					image, used_prompt = await self._generate(api_key, request)
+					if image is None:
+						return
+					meta = GeneratedImage(request.text_prompt, used_prompt, request.image_model, request.image_quality, request.orientation, time.time())
+					await run_cpu(buffer.put, key, image, meta)
+					self.logger.info(f"Pre-generated image for '{request.text_prompt}'")
+			except Exception as e:
+				self.logger.warning(f"Failed to pre-generate image for '{request.text_prompt}': {e}")
+		self._loop = asyncio.get_running_loop()
+		self._refills[key] = asyncio.ensure_future(_generate())
+	async def _generate(self, api_key: str, request: GenerationRequest) -> tuple[Image.Image|None, str]:
+		"""The image and the prompt it was generated from."""
+		ai_client = self._client(api_key)
+		text_prompt = request.text_prompt
+		if request.randomize_prompt:
+			text_prompt = await OpenAIAsync.fetch_image_prompt(self.logger, ai_client, text_prompt)
+		image = await OpenAIAsync.fetch_image(
+			self.logger,
+			ai_client,
+			text_prompt,
+			model=request.image_model,
+			quality=request.image_quality,
+			orientation=request.orientation
+		)
+		return image, text_prompt
 	async def _dispatch_image(self, context: DataSourceExecutionContext, api_key, image_model, image_quality, text_prompt, randomize_prompt, orientation) -> Image.Image | None:
-		image = None
 		try:
-			ai_client = openai.AsyncOpenAI(api_key = api_key, timeout=60, max_retries=3)
-			if randomize_prompt:
-				text_prompt = await OpenAIAsync.fetch_image_prompt(self.logger, ai_client, text_prompt)
-
-			image = await OpenAIAsync.fetch_image(
-				self.logger,
-				ai_client,
-				text_prompt,
-				model=image_model,
-				quality=image_quality,
-				orientation=orientation
-			)
+			image, _ = await self._generate(api_key, GenerationRequest(text_prompt, image_model, image_quality, randomize_prompt, orientation))
 			return image
 		except BadRequestError as bre:
 			self.logger.error(f"Open AI Bad Request: {bre.body.get("message")}")
@@ -0,0 +1,78 @@
+from dataclasses import asdict, dataclass
+from datetime import date
+import json
+import logging
+import os
+import shutil
+import threading
+from typing import IO
+
+# dates kept; the oldest (by use) are removed first
+POTD_CACHE_KEEP = 32
+
+@dataclass(frozen=True, slots=True)
+class PotdEntry:
+	"""The picture of one date (ISO format), at one thumbnail width; image_src is the rendition at that width."""
+	day: str
+	width: int
+	filename: str
+	image_src: str
+	image_page_url: str
+	@staticmethod
+	def from_dict(data: dict) -> "PotdEntry":
+		return PotdEntry(data["day"], int(data["width"]), data["filename"], data["image_src"], data["image_page_url"])
+
+class PotdCache:
+	"""
+	Per-date WPOTD cache in the datasource storage: the metadata ({date}-{width}.json) and the downloaded rendition ({date}-{width}.img).
+	Keeps the keep most recently used dates.
+	"""
+	def __init__(self, folder: str, keep: int = POTD_CACHE_KEEP):
+		self.folder = folder
+		self.keep = keep
+		self._lock = threading.Lock()
+		self.logger = logging.getLogger(__name__)
+	def _path(self, day: str, width: int, suffix: str) -> str:
+		return os.path.join(self.folder, f"{day}-{width}.{suffix}")
+	def get(self, day: date, width: int) -> PotdEntry|None:
+		path = self._path(day.isoformat(), width, "json")
+		try:
+			with open(path, "r", encoding="utf-8") as meta_file:
+				entry = PotdEntry.from_dict(json.load(meta_file))
+			# most recently used
+			os.utime(path)
+			return entry
+		except FileNotFoundError:
+			return None
+		except (OSError, ValueError, KeyError) as e:
+			self.logger.warning(f"Ignoring cached POTD {day} ({width}): {e}")
+			return None
+	def image_path(self, day: date, width: int) -> str|None:
+		"""The cached rendition, or None."""
+		path = self._path(day.isoformat(), width, "img")
+		return path if os.path.exists(path) else None
+	def _write(self, path: str, write) -> None:
+		with open(f"{path}.tmp", "wb") as out_file:
+			write(out_file)
+		os.replace(f"{path}.tmp", path)
+	def put(self, entry: PotdEntry) -> None:
+		with self._lock:
+			os.makedirs(self.folder, exist_ok=True)
+			self._write(self._path(entry.day, entry.width, "json"), lambda out_file: out_file.write(json.dumps(asdict(entry)).encode("utf-8")))
+			self._prune()
+	def put_image(self, day: date, width: int, image: IO[bytes]) -> str:
+		"""Store the rendition, copied from the current position of image; returns its path."""
+		path = self._path(day.isoformat(), width, "img")
+		with self._lock:
+			os.makedirs(self.folder, exist_ok=True)
+			self._write(path, lambda out_file: shutil.copyfileobj(image, out_file))
+		return path
+	def _prune(self) -> None:
+		metas = sorted((entry for entry in os.scandir(self.folder) if entry.name.endswith(".json")), key=lambda entry: entry.stat().st_mtime, reverse=True)
+		for entry in metas[self.keep:]:
+			stem = entry.name[:-len(".json")]
+			for suffix in ("json", "img"):
+				try:
+					os.remove(os.path.join(self.folder, f"{stem}.{suffix}"))
+				except FileNotFoundError:
+					pass
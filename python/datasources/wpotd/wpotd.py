@@ -9,14 +9,17 @@ https://foundation.wikimedia.org/wiki/Policy:Wikimedia_Foundation_User-Agent_Pol
 
 Flow:
 1. Fetch the date to use for the Picture of the Day (POTD) based on settings. (_determine_date)
-2. Make an API request to fetch the POTD data for that date. (_fetch_potd)
-3. Extract the image filename from the response. (_fetch_potd)
-4. Make another API request to get the image URL. (_fetch_image_src)
-5. Download the image from the URL. (_download_image)
-5a. NOTE: sometimes the "image" is actually a video: raise error
-6. Optionally resize the image to fit the device dimensions. (_shrink_to_fit))
+2. Make one API request for the POTD image of that date and the URL of its rendition at the display width (iiurlwidth). (_fetch_potd)
+2a. The answer is kept per date in the datasource storage (PotdCache); a cached date makes no API request.
+3. Download the rendition, keeping it in the cache for the next time. (_load_image)
+3a. NOTE: sometimes the "image" is actually a video: raise error
+4. Optionally resize the image to fit the device dimensions. (_shrink_to_fit))
+In randomized-date mode, a few dates are fetched ahead in the background (_prewarm).
 """
-from typing import Any, Mapping
+import asyncio
+import contextlib
+import os
+from typing import IO, Any, Mapping
 from PIL import Image, UnidentifiedImageError
 from datetime import date, timedelta
 from datetime import datetime
@@ -24,11 +27,26 @@ import logging
 from random import randint
 
 from ..data_source import DataSource, DataSourceExecutionContext, MediaListAsync, MediaRenderAsync, MediaRenderResult
-from ...task.async_http_worker_pool import client_var
-from ...utils.image_utils import stream_to_buffer
+from .potd_cache import PotdCache, PotdEntry
+from ...model.configuration_manager import DatasourceConfigurationManager
+from ...task.async_http_worker_pool import client_var, run_cpu
+from ...task.resilience import resilience_var
+from ...utils.image_utils import decode_image_async, draft_image, stream_to_buffer
 
 API_URL = "https://en.wikipedia.org/w/api.php"
 HEADERS = { 'User-Agent': 'eInkBillboard/0.0 (https://github.com/escape-llc/eink-billboard/)' }
+# small API answers; a second request races one that has not answered by then
+API_HEDGE_SECONDS = 2.0
+# Wikimedia's standard thumbnail widths; other widths are rendered on demand (and may be throttled)
+THUMB_WIDTHS = (330, 500, 960, 1280, 1920, 3840)
+# randomized dates fetched ahead in the background
+PREWARM_DATES = 3
+
+def _open_rendition(path: str, size: tuple[int, int]) -> Image.Image:
+	image = Image.open(path)
+	image = draft_image(image, min(1.0, max(size[0] / image.width, size[1] / image.height)))
+	image.load()
+	return image
 
 def _determine_date(settings: Mapping[str, Any], schedule_ts) -> date:
 	if settings.get("randomizeDate") == True:
@@ -40,29 +58,92 @@ def _determine_date(settings: Mapping[str, Any], schedule_ts) -> date:
 	else:
 		return schedule_ts.date()
 
+def thumb_width(dimensions: tuple[int, int]) -> int:
+	"""The standard thumbnail width that covers the display in either orientation."""
+	needed = max(dimensions)
+	return next((width for width in THUMB_WIDTHS if width >= needed), THUMB_WIDTHS[-1])
+
 class WpotdAsync(DataSource, MediaListAsync, MediaRenderAsync):
 	def __init__(self, id: str, name: str):
 		super().__init__(id, name)
+		self.cache: PotdCache|None = None
+		# randomized mode: dates fetched ahead, and being fetched
+		self._ahead: list[date] = []
+		self._fetching: set[asyncio.Task] = set()
 		self.logger = logging.getLogger(__name__)
+	def _potd_cache(self, dsec: DataSourceExecutionContext) -> PotdCache|None:
+		if self.cache is None:
+			dscm = dsec.provider.get_service(DatasourceConfigurationManager)
+			if dscm is not None:
+				self.cache = PotdCache(os.path.join(dscm.ROOT_PATH, "potd"))
+		return self.cache
 	async def open_async(self, dsec: DataSourceExecutionContext, params: Mapping[str, Any]) -> list:
-		datetofetch = _determine_date(params, dsec.timestamp)
+		cache = self._potd_cache(dsec)
+		width = thumb_width(dsec.dimensions)
+		randomize = params.get("randomizeDate") == True
+		datetofetch = self._ahead.pop(0) if randomize and len(self._ahead) > 0 else _determine_date(params, dsec.timestamp)
 		self.logger.info(f"'{self.name}' datetofetch: {datetofetch}")
-		data = await self._fetch_potd(datetofetch)
-		picurl = data["image_src"]
-		return [{"url": picurl, "date": datetofetch}]
+		entry = await self._potd_entry(cache, datetofetch, width)
+		if randomize:
+			self._prewarm(cache, params, dsec)
+		return [{"url": entry.image_src, "date": datetofetch}]
 	async def render_async(self, dsec: DataSourceExecutionContext, params:Mapping[str,Any], state:Any) -> MediaRenderResult | None:
 		if state is None:
 			return None
-		image = await self._download_image(state.get("url"))
+		image = await self._load_image(self._potd_cache(dsec), state.get("date"), state.get("url"), dsec.dimensions)
 		if image is None:
 			self.logger.error(f"'{self.name}' Failed to download image.")
 			raise RuntimeError(f"'{self.name}' Failed to download image.")
 		if params.get("shrinkToFit") == True:
 			max_width, max_height = dsec.dimensions
-			image = self._shrink_to_fit(image, max_width, max_height)
+			image = await run_cpu(self._shrink_to_fit, image, max_width, max_height)
 			self.logger.info(f"'{self.name}' Image resized: {max_width},{max_height}")
 		return MediaRenderResult(image=image, title=f"Wikipedia Picture of the Day: {state.get('date', 'Unknown Date')}")
 		pass
+	async def _potd_entry(self, cache: PotdCache|None, cur_date: date, width: int) -> PotdEntry:
+		"""The POTD of the date, from the cache or the API."""
+		entry = await run_cpu(cache.get, cur_date, width) if cache is not None else None
+		if entry is None:
+			data = await self._fetch_potd(cur_date, width)
+			entry = PotdEntry(cur_date.isoformat(), width, data["filename"], data["image_src"], data["image_page_url"])
+			if cache is not None:
+				await run_cpu(cache.put, entry)
+		return entry
+	def _prewarm(self, cache: PotdCache|None, params: Mapping[str, Any], dsec: DataSourceExecutionContext) -> None:
+		"""Fetch random dates ahead (metadata and rendition), up to PREWARM_DATES, on the current loop."""
+		if cache is None:
+			return
+		width = thumb_width(dsec.dimensions)
+		async def _fetch_ahead(day: date) -> None:
+			try:
+				entry = await self._potd_entry(cache, day, width)
+				if cache.image_path(day, width) is None:
+					with await self._download_rendition(entry.image_src) as buffer:
+						await run_cpu(cache.put_image, day, width, buffer)
+				self._ahead.append(day)
+			except Exception as e:
+				self.logger.warning(f"'{self.name}' Failed to prefetch POTD {day}: {e}")
+		while len(self._ahead) + len(self._fetching) < PREWARM_DATES:
+			task = asyncio.ensure_future(_fetch_ahead(_determine_date(params, dsec.timestamp)))
+			self._fetching.add(task)
+			task.add_done_callback(self._fetching.discard)
+	async def _load_image(self, cache: PotdCache|None, cur_date: date|None, url: str, size: tuple[int, int]) -> Image.Image:
+		"""The rendition from the cache, downloading (and storing) it when missing."""
+		if cache is None or cur_date is None:
+			return await self._download_image(url, size)
+		width = thumb_width(size)
+		path = await run_cpu(cache.image_path, cur_date, width)
+		if path is None:
+			with await self._download_rendition(url) as buffer:
+				path = await run_cpu(cache.put_image, cur_date, width, buffer)
+		try:
+			return await run_cpu(_open_rendition, path, size)
+		except Exception as e:
+			self.logger.error(f"'{self.name}' Failed to load WPOTD image from {path}: {str(e)}")
+			# download it again next time
+			with contextlib.suppress(OSError):
+				os.remove(path)
+			raise RuntimeError(f"'{self.name}' Failed to load WPOTD image.") from e
 	def _shrink_to_fit(self, image: Image.Image, max_width: int, max_height: int) -> Image.Image:
 		"""
 		Resize the image to fit within max_width and max_height while maintaining aspect ratio.
@@ -95,64 +176,63 @@ class WpotdAsync(DataSource, MediaListAsync, MediaRenderAsync):
 		else:
 			# If the image is already within bounds, return it as is
 			return image
-	async def _download_image(self, url: str) -> Image.Image:
+	def _check_format(self, url: str) -> None:
+		if url.lower().endswith(".svg"):
+			self.logger.warning("'{self.name}' SVG format is not supported by Pillow. Skipping image download.")
+			raise RuntimeError("'{self.name}' Unsupported image format: SVG.")
+	async def _download_rendition(self, url: str) -> IO[bytes]:
+		self._check_format(url)
 		try:
-			if url.lower().endswith(".svg"):
-				self.logger.warning("'{self.name}' SVG format is not supported by Pillow. Skipping image download.")
-				raise RuntimeError("'{self.name}' Unsupported image format: SVG.")
-
 			client = client_var.get()
-			buffer = await stream_to_buffer(client, url, headers=HEADERS, ctok=lambda ct: ct.startswith("image/"))
-			return Image.open(buffer)
+			return await resilience_var.get().run(url, lambda: stream_to_buffer(client, url, headers=HEADERS, ctok=lambda ct: ct.startswith("image/")))
+		except Exception as e:
+			self.logger.error(f"'{self.name}' Failed to load WPOTD image from {url}: {str(e)}")
+			raise RuntimeError(f"'{self.name}' Failed to load WPOTD image.") from e
+	async def _download_image(self, url: str, size: tuple[int, int]|None = None) -> Image.Image:
+		try:
+			self._check_format(url)
+			client = client_var.get()
+			# originals can be large: spooled to disk and decoded reduced
+			return await resilience_var.get().run(url, lambda: decode_image_async(client, url, headers=HEADERS, ctok=lambda ct: ct.startswith("image/"), size=size))
 		except UnidentifiedImageError as e:
 			self.logger.error(f"'{self.name}' Unsupported image format at {url}: {str(e)}")
 			raise RuntimeError(f"'{self.name}' Unsupported image format.")
 		except Exception as e:
 			self.logger.error(f"'{self.name}' Failed to load WPOTD image from {url}: {str(e)}")
-			raise RuntimeError(f"'{self.name}' Failed to load WPOTD image.")
-	async def _fetch_potd(self, cur_date: date) -> Mapping[str, Any]:
+			raise RuntimeError(f"'{self.name}' Failed to load WPOTD image.") from e
+	async def _fetch_potd(self, cur_date: date, width: int) -> Mapping[str, Any]:
+		"""The image of the POTD template and the URL of its rendition at width, in one request (generator=images)."""
 		title = f"Template:POTD/{cur_date.isoformat()}"
 		params = {
 			"action": "query",
 			"format": "json",
 			"formatversion": "2",
-			"prop": "images",
-			"titles": title
+			"generator": "images",
+			"titles": title,
+			"prop": "imageinfo",
+			"iiprop": "url",
+			"iiurlwidth": str(width)
 		}
 		data = await self._make_request(params)
 		try:
-			filename = data["query"]["pages"][0]["images"][0]["title"]
-		except (KeyError, IndexError) as e:
-			self.logger.error(f"'{self.name}' Failed to retrieve POTD filename for {cur_date}: {e}")
+			# the first image of the template, as prop=images lists them (by title)
+			page = min(data["query"]["pages"], key=lambda page: page["title"])
+			info = page["imageinfo"][0]
+		except (KeyError, IndexError, TypeError, ValueError) as e:
+			self.logger.error(f"'{self.name}' Failed to retrieve POTD image for {cur_date}: {e}")
 			raise RuntimeError(f"'{self.name}' Failed to retrieve POTD filename.")
-		image_src = await self._fetch_image_src(filename)
 		return {
-			"filename": filename,
-			"image_src": image_src,
+			"filename": page["title"],
+			# no thumbnail when the original is not wider than width
+			"image_src": info.get("thumburl", info["url"]),
 			"image_page_url": f"https://en.wikipedia.org/wiki/{title}",
 			"date": cur_date
 		}
 	async def _make_request(self, params: Mapping[str, Any]) -> Mapping[str, Any]:
 		try:
 			client = client_var.get()
-			response = await client.get(API_URL, params=params, headers=HEADERS, timeout=10)
-			response.raise_for_status()
+			response = await resilience_var.get().get(client, API_URL, hedge_after=API_HEDGE_SECONDS, params=params, headers=HEADERS, timeout=10)
 			return response.json()
 		except Exception as e:
 			self.logger.error(f"'{self.name}' Wikipedia API request failed: {params}: {str(e)}")
-			raise RuntimeError(f"'{self.name}' Wikipedia API request failed.")
-	async def _fetch_image_src(self, filename: str) -> str:
-		params = {
-			"action": "query",
-			"format": "json",
-			"prop": "imageinfo",
-			"iiprop": "url",
-			"titles": filename
-		}
-		data = await self._make_request(params)
-		try:
-			page = next(iter(data["query"]["pages"].values()))
-			return page["imageinfo"][0]["url"]
-		except (KeyError, IndexError, StopIteration) as e:
-			self.logger.error(f"'{self.name}' Failed to retrieve image URL for {filename}: {e}")
-			raise RuntimeError(f"'{self.name}' Failed to retrieve image URL.")
+			raise RuntimeError(f"'{self.name}' Wikipedia API request failed.") from e
@@ -6,11 +6,13 @@ from typing import Any, Mapping
 import zoneinfo
 
 from ...plugins.plugin_base import RenderSession
+from ...task.html_render_service import HtmlRenderService
+from ...task.render_cache import RenderCache, RenderValidity
 from ...utils.file_utils import path_to_file_url
 from ...model.configuration_manager import SettingsConfigurationManager, StaticConfigurationManager
 from ...datasources.data_source import DataSource, DataSourceExecutionContext, MediaItemAsync, MediaRenderAsync, MediaRenderResult
 
-def generate_image(schedule_ts:datetime, stm: StaticConfigurationManager, dimensions, settings, display_config):
+def generate_image(schedule_ts:datetime, stm: StaticConfigurationManager, dimensions, settings, display_config, renderer: HtmlRenderService|None = None, cache: RenderCache|None = None):
 	if display_config.get("orientation") == "portrait":
 		dimensions = dimensions[::-1]
 
@@ -22,20 +24,22 @@ def generate_image(schedule_ts:datetime, stm: StaticConfigurationManager, dimens
 	start_of_next_year = datetime(current_time.year + 1, 1, 1, tzinfo=tz)
 
 	total_days = (start_of_next_year - start_of_year).days
-	days_left = (start_of_next_year - current_time).total_seconds() / (24 * 3600)
-	elapsed_days = (current_time - start_of_year).total_seconds() / (24 * 3600)
+	# whole days, so the figures only change at midnight
+	elapsed_days = (current_time.date() - start_of_year.date()).days
+	days_left = total_days - elapsed_days
 
 	template_params = {
 		"year": current_time.year,
 		"year_percent": round((elapsed_days / total_days) * 100),
-		"days_left": round(days_left),
+		"days_left": days_left,
 		"theme_name": "split-complementary",
 		"settings": settings
 	}
 	px = Path(os.path.dirname(__file__)).joinpath("render")
 	css = path_to_file_url(os.path.join(px.resolve(), "year_progress.css"))
-	rs = RenderSession(stm, px.resolve(), "year_progress.html", css)
-	image = rs.render(dimensions, template_params)
+	rs = RenderSession(stm, px.resolve(), "year_progress.html", css, renderer, cache)
+	# the percentage and days left change at midnight
+	image = rs.render(dimensions, template_params, RenderValidity.until_local_midnight(current_time))
 	return image
 
 
@@ -52,5 +56,5 @@ class YearProgressAsync(DataSource, MediaItemAsync, MediaRenderAsync):
 		_, display_config = display_cob.get()
 		if display_config is None:
 			raise ValueError("Display settings is None")
-		img = generate_image(dsec.timestamp, stm, dsec.dimensions, params, display_config)
+		img = generate_image(dsec.timestamp, stm, dsec.dimensions, params, display_config, dsec.provider.get_service(HtmlRenderService), dsec.provider.get_service(RenderCache))
 		return None if img is None else MediaRenderResult(image=img, title=f"Year Progress: {dsec.timestamp.year}")
@@ -14,6 +14,10 @@ from .model.configuration_manager import ConfigurationManager
 
 from .blueprints.root import root_bp
 from .blueprints.api import api_bp
+from .task.html_render_service import HtmlRenderService
+from .task.http_cache import HttpCache
+from .task.render_cache import RenderCache
+from .task.render_service import RenderService
 from .task.telemetry_sink import TelemetrySink
 from .task.application import Application, StartEvent
 from .task.messages import QuitMessage, StartOptions
@@ -127,6 +131,10 @@ def run_application():
 	app.register_blueprint(api_bp)
 	# start the application layer
 	sink = TelemetrySink()
+	render_service = RenderService()
+	html_render_service = HtmlRenderService()
+	render_cache = RenderCache(os.path.join(cm.STORAGE_PATH, "cache", "render"))
+	http_cache = HttpCache(os.path.join(cm.STORAGE_PATH, "cache", "http"))
 	xapp: Application = Application(APPNAME, sink)
 	try:
 		xapp.start()
@@ -144,6 +152,10 @@ def run_application():
 		root.add_service(TimeOfDay, time_base)
 		root.add_service(TelemetrySink, sink)
 		root.add_service(Application, xapp)
+		root.add_service(RenderService, render_service)
+		root.add_service(HtmlRenderService, html_render_service)
+		root.add_service(RenderCache, render_cache)
+		root.add_service(HttpCache, http_cache)
 		xapp.accept(StartEvent(time_base.current_time(), options, root))
 		started = xapp.app_started.wait(timeout=5)
 		if not started:
@@ -179,6 +191,8 @@ def run_application():
 		try:
 			xapp.accept(QuitMessage(time_base.current_time()))
 			xapp.join(timeout=5)
+			render_service.shutdown()
+			html_render_service.shutdown()
 			if config_watcher is not None:
 				config_watcher.stop()
 		except Exception as ee:
@@ -1,3 +1,4 @@
+from functools import lru_cache
 import hashlib
 import importlib
 import os
@@ -6,7 +7,7 @@ import logging
 import shutil
 import threading
 from pathlib import Path
-from typing import Any, Callable, Mapping, Protocol, ReadOnly, TypedDict, cast
+from typing import Any, Callable, Iterable, Mapping, Protocol, ReadOnly, TypedDict, cast
 from PIL import ImageFont
 
 from ..datasources.data_source import DataSource
@@ -167,6 +168,46 @@ class FileDeletableConfiguration(FileConfiguration):
 			self._content = None
 			self._hash = None
 
+class CoalescingWriter:
+	"""
+	Merges frequent top-level key updates of a ConfigurationObject into one save per delay (seconds).
+	Call flush() to save the pending updates immediately, e.g. before shutting down.
+	"""
+	def __init__(self, cob: ConfigurationObject, delay: float = 10.0):
+		if cob == None:
+			raise ValueError("cob cannot be None")
+		self.cob = cob
+		self.delay = delay
+		self._pending: dict[str, Any] = {}
+		self._timer: threading.Timer|None = None
+		# held while saving, so saves happen in update order
+		self._lock = threading.RLock()
+	def update(self, key: str, value: Any) -> None:
+		with self._lock:
+			self._pending[key] = value
+			if self._timer is None:
+				self._timer = threading.Timer(self.delay, self.flush)
+				self._timer.daemon = True
+				self._timer.start()
+	def flush(self) -> None:
+		with self._lock:
+			if self._timer is not None:
+				self._timer.cancel()
+				self._timer = None
+			if len(self._pending) == 0:
+				return
+			pending = self._pending
+			self._pending = {}
+			# the hash check fails when someone else saved in between; merge again
+			for _ in range(3):
+				hash, content = self.cob.get()
+				content = content if content is not None else {}
+				content.update(pending)
+				ok, _ = self.cob.save(hash, content)
+				if ok:
+					return
+			logger.warning(f"Failed to save '{self.cob.moniker}': concurrent updates")
+
 class ConfigurationObjectFactory(Protocol):
 	def obtain(self, moniker: str, ctor: type[FileConfiguration]) -> tuple[bool, ConfigurationObject]:
 		...
@@ -293,6 +334,14 @@ FONT_FAMILIES = {
 		"file": os.path.join("DS-DIGI", "DS-DIGI.TTF")
 	}]
 }
+# upper bound of loaded font objects shared by all StaticConfigurationManager instances
+FONT_CACHE_SIZE = 64
+
+@lru_cache(maxsize=FONT_CACHE_SIZE)
+def _load_font(font_path: str, font_size: float) -> ImageFont.FreeTypeFont:
+	"""Shared font objects; callers MUST NOT modify them (e.g. set_variation_by_name)."""
+	return ImageFont.truetype(font_path, font_size)
+
 class StaticConfigurationManager:
 	"""
 	Rooted at the "static" folder; manages static resources like fonts and render assets.
@@ -303,6 +352,11 @@ class StaticConfigurationManager:
 		if not os.path.exists(root_path):
 			raise ValueError(f"root_path {root_path} does not exist.")
 		self.ROOT_PATH = root_path
+		# (family, weight) -> absolute path; the first variant is the family's default
+		self._font_paths: dict[tuple[str, str], str] = {}
+		for font_family, variants in FONT_FAMILIES.items():
+			for variant in variants:
+				self._font_paths[(font_family, variant["font-weight"])] = os.path.join(self.ROOT_PATH, "fonts", variant["file"])
 #		logger.debug(f"ROOT_PATH: {self.ROOT_PATH}")
 	def enum_fonts(self):
 		fonts_list = []
@@ -315,18 +369,22 @@ class StaticConfigurationManager:
 					"font_style": variant.get("font-style", "normal"),
 				})
 		return fonts_list
-	def get_font(self, font_name: str, font_size=50, font_weight="normal"):
-		if font_name in FONT_FAMILIES:
-			font_variants = FONT_FAMILIES[font_name]
-
-			font_entry = next((entry for entry in font_variants if entry["font-weight"] == font_weight), None)
-			if font_entry is None:
-				font_entry = font_variants[0]  # Default to first available variant
-
-			if font_entry:
-				font_path = os.path.join(self.ROOT_PATH, "fonts", font_entry["file"])
-				return ImageFont.truetype(font_path, font_size)
-		raise ValueError(f"Font not found: font_name={font_name}, font_weight={font_weight}")
+	def font_path(self, font_name: str, font_weight="normal") -> str:
+		font_path = self._font_paths.get((font_name, font_weight), None)
+		if font_path is None and font_name in FONT_FAMILIES:
+			# Default to first available variant
+			font_path = self._font_paths[(font_name, FONT_FAMILIES[font_name][0]["font-weight"])]
+		if font_path is None:
+			raise ValueError(f"Font not found: font_name={font_name}, font_weight={font_weight}")
+		return font_path
+	def get_font(self, font_name: str, font_size=50, font_weight="normal") -> ImageFont.FreeTypeFont:
+		"""The returned font is shared (cached) and MUST be treated as read-only."""
+		return _load_font(self.font_path(font_name, font_weight), font_size)
+	def preload_fonts(self, font_sizes: Mapping[str, Iterable[float]], font_weight="normal") -> None:
+		"""Load the given font family -> sizes ahead of the first render."""
+		for font_name, sizes in font_sizes.items():
+			for font_size in sizes:
+				self.get_font(font_name, font_size, font_weight)
 
 class ConfigurationManager(ConfigurationObjectFactory):
 	"""
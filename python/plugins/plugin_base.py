@@ -1,16 +1,20 @@
 from datetime import datetime
+import logging
 import os
 import threading
+import time
 from typing import Protocol, runtime_checkable
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, select_autoescape
 
 from ..datasources.data_source import DataSource, DataSourceExecutionContext
 from ..model.service_container import IServiceProvider, ServiceContainer, ServiceContainer
 from ..model.configuration_manager import ConfigurationManager, DatasourceConfigurationManager, StaticConfigurationManager
 from ..model.schedule import ScheduleItemBase, TimerTaskTask
+from ..task.html_render_service import HtmlRenderService
+from ..task.render_cache import RenderCache, RenderValidity, render_key
 from ..task.messages import BasicMessage
 from ..utils.image_utils import render_html_arglist
-from ..utils.file_utils import path_to_file_url
+from ..utils.file_utils import file_url_to_path, path_to_file_url
 
 class PluginExecutionContext:
 	def __init__(self, isp: IServiceProvider, dimensions: tuple[int, int], timestamp: datetime):
@@ -48,8 +52,59 @@ class PluginExecutionContext:
 		)
 		return dsec
 
+class RenderEnvironment:
+	"""
+	Jinja environment and precomputed render inputs, shared by all RenderSessions of one render directory.
+	Templates are compiled once; auto_reload only recompiles a template when its file's mtime changes.
+	"""
+	_registry: dict[tuple[str, str], "RenderEnvironment"] = {}
+	_registry_lock = threading.Lock()
+	# compiled templates survive restarts (default folder is in the temp directory)
+	_bytecode_cache = FileSystemBytecodeCache()
+	def __init__(self, stm: StaticConfigurationManager, render_dir: str):
+		base_dir = os.path.join(stm.ROOT_PATH, "render")
+		self.env = Environment(
+			loader=FileSystemLoader([render_dir, base_dir]),
+			autoescape=select_autoescape(['html', 'xml']),
+			auto_reload=True,
+			bytecode_cache=RenderEnvironment._bytecode_cache
+		)
+		# NOTE CSS files MUST use absolute paths because HTML is saved to a temporary file
+		# the base plugin and theme css files
+		self.base_css_files = [
+			path_to_file_url(os.path.join(base_dir, "plugin.css")),
+			path_to_file_url(os.path.join(base_dir, "themes.css"))
+		]
+		self.font_faces = stm.enum_fonts()
+		self._css_lock = threading.Lock()
+		self._css: dict[str, tuple[float, bytes]] = {}
+	@staticmethod
+	def get(stm: StaticConfigurationManager, render_dir: str) -> "RenderEnvironment":
+		key = (stm.ROOT_PATH, str(render_dir))
+		with RenderEnvironment._registry_lock:
+			renv = RenderEnvironment._registry.get(key, None)
+			if renv is None:
+				renv = RenderEnvironment(stm, render_dir)
+				RenderEnvironment._registry[key] = renv
+			return renv
+	def css_contents(self, css_files: list[str]) -> list[bytes]:
+		"""Contents of the CSS files (file URLs); re-read only when a file's mtime changes."""
+		contents = []
+		for css_url in css_files:
+			path = file_url_to_path(css_url)
+			mtime = os.path.getmtime(path)
+			with self._css_lock:
+				entry = self._css.get(path, None)
+			if entry is None or entry[0] != mtime:
+				with open(path, "rb") as css_file:
+					entry = (mtime, css_file.read())
+				with self._css_lock:
+					self._css[path] = entry
+			contents.append(entry[1])
+		return contents
+
 class RenderSession:
-	def __init__(self, stm: StaticConfigurationManager, render_dir:str, html_file:str, css_file:str|None = None):
+	def __init__(self, stm: StaticConfigurationManager, render_dir:str, html_file:str, css_file:str|None = None, renderer: HtmlRenderService|None = None, cache: RenderCache|None = None):
 		if stm is None:
 			raise ValueError("stm is None")
 		if render_dir is None:
@@ -57,32 +112,52 @@ class RenderSession:
 		if html_file is None:
 			raise ValueError("html_file is None")
 		self.html_file = html_file
-		# NOTE CSS files MUST use absolute paths because HTML is saved to a temporary file
-		# load the base plugin and current plugin css files
-		self.css_files = [
-			path_to_file_url(os.path.join(stm.ROOT_PATH, "render", "plugin.css")),
-			path_to_file_url(os.path.join(stm.ROOT_PATH, "render", "themes.css"))
-		]
+		# without a renderer service, every render starts a browser process
+		self.renderer = renderer
+		self.cache = cache
+		self.renv = RenderEnvironment.get(stm, render_dir)
+		self.css_files = list(self.renv.base_css_files)
 		if css_file:
 			self.css_files.append(css_file)
-		self.env = self._create_render_environment(stm, render_dir)
-		self.font_faces = stm.enum_fonts()
-	def _create_render_environment(self, stm: StaticConfigurationManager, render_dir:str):
-		loader = FileSystemLoader([render_dir, os.path.join(stm.ROOT_PATH, "render")])
-		return Environment(
-			loader=loader,
-			autoescape=select_autoescape(['html', 'xml'])
-		)
-	def render(self, dimensions, template_params={}):
+		self.env = self.renv.env
+		self.font_faces = self.renv.font_faces
+		# timings of the last render
+		self.template_ms: float|None = None
+		self.browser_ms: float|None = None
+		self.logger = logging.getLogger(__name__)
+	def render(self, dimensions, template_params={}, validity: RenderValidity|None = None):
+		"""
+		Render the template through the browser.
+		If the caller declares a validity and there is a cache, the image is reused until it expires.
+		"""
 		template_params["style_sheets"] = self.css_files
 		template_params["width"] = dimensions[0]
 		template_params["height"] = dimensions[1]
 		template_params["font_faces"] = self.font_faces
 
 		# load and render the given html template
+		started = time.perf_counter()
 		template = self.env.get_template(self.html_file)
 		rendered_html = template.render(template_params)
-		return render_html_arglist(rendered_html, [f"--window-size={dimensions[0]},{dimensions[1]}"])
+		self.template_ms = (time.perf_counter() - started) * 1000
+		self.browser_ms = None
+		key = None
+		if self.cache is not None and validity is not None:
+			key = render_key(rendered_html, self.renv.css_contents(self.css_files), (dimensions[0], dimensions[1]))
+			image = self.cache.get(key, validity.now)
+			if image is not None:
+				self.logger.debug(f"'{self.html_file}' template {self.template_ms:.1f}ms, cached")
+				return image
+		started = time.perf_counter()
+		if self.renderer is not None:
+			image = self.renderer.render(rendered_html, dimensions)
+		else:
+			image = render_html_arglist(rendered_html, [f"--window-size={dimensions[0]},{dimensions[1]}"])
+		self.browser_ms = (time.perf_counter() - started) * 1000
+		self.logger.debug(f"'{self.html_file}' template {self.template_ms:.1f}ms, browser {self.browser_ms:.1f}ms")
+		if image is not None and key is not None and self.cache is not None and validity is not None:
+			self.cache.put(key, image, validity)
+		return image
 	pass
 
 type TrackType = ScheduleItemBase | TimerTaskTask
@@ -0,0 +1,58 @@
+import hashlib
+import random
+from typing import Any, Mapping
+
+def list_fingerprint(items: list[Any]) -> str:
+	"""Identifies the media list a saved position belongs to."""
+	digest = hashlib.sha1(str(len(items)).encode())
+	for item in items:
+		digest.update(b"\0")
+		digest.update(repr(item).encode())
+	return digest.hexdigest()
+
+class SlideCursor:
+	"""
+	Index-based iteration over a slideshow's media list, optionally in a seeded shuffled order.
+	The position and seed are all that is needed to resume; the fingerprint tells whether the list changed.
+	"""
+	def __init__(self, items: list[Any], shuffle: bool = False, seed: int|None = None, position: int = 0, fingerprint: str|None = None):
+		self.items = items
+		self.shuffle = shuffle
+		self.seed = seed if seed is not None or not shuffle else random.randrange(2**32)
+		self.fingerprint = fingerprint if fingerprint is not None else list_fingerprint(items)
+		self._order: list[int]|None = None
+		if shuffle:
+			self._order = list(range(len(items)))
+			random.Random(self.seed).shuffle(self._order)
+		self.position = min(max(0, position), len(items))
+	@property
+	def remaining(self) -> int:
+		return len(self.items) - self.position
+	def item(self, position: int) -> Any:
+		return self.items[position if self._order is None else self._order[position]]
+	def next(self) -> Any:
+		if self.position >= len(self.items):
+			raise StopIteration()
+		item = self.item(self.position)
+		self.position += 1
+		return item
+	def peek(self, count: int) -> list[Any]:
+		"""The next items, without moving."""
+		return [self.item(px) for px in range(self.position, min(self.position + count, len(self.items)))]
+	def state(self, position: int|None = None) -> dict[str, Any]:
+		"""What resume() needs; position defaults to the cursor's."""
+		return {
+			"fingerprint": self.fingerprint,
+			"shuffle": self.shuffle,
+			"seed": self.seed,
+			"position": self.position if position is None else position
+		}
+	@staticmethod
+	def resume(items: list[Any], state: Mapping[str, Any]|None, shuffle: bool = False) -> "SlideCursor":
+		"""Continue from a saved state, or start over when the list or order changed, or it was played to the end."""
+		fingerprint = list_fingerprint(items)
+		if state is not None and state.get("fingerprint", None) == fingerprint and state.get("shuffle", False) == shuffle:
+			position = int(state.get("position", 0))
+			if position < len(items):
+				return SlideCursor(items, shuffle, state.get("seed", None), position, fingerprint)
+		return SlideCursor(items, shuffle, fingerprint=fingerprint)
@@ -1,27 +1,52 @@
 import asyncio
+from collections import deque
 import logging
 import threading
 from datetime import timedelta
 from typing import Any, Mapping, TypedDict, cast
 
+from .slide_cursor import SlideCursor
 from ..plugin_base import PluginAsync, PluginExecutionContext, TrackType
-from ...datasources.data_source import DataSourceManager, MediaListAsync, MediaRenderAsync
+from ...datasources.data_source import DataSourceManager, MediaListAsync, MediaPrefetch, MediaRenderAsync, MediaRenderResult
+from ...model.configuration_manager import CoalescingWriter, ConfigurationManager
 from ...model.schedule import PlaylistSchedule
 from ...task.messages import BasicMessage
 from ...task.display import DisplayImage
 from ...task.message_router import MessageRouter
+from ...task.resilience import deadline
 from ...task.timer import IProvideTimer
 
 class SettingsDict(TypedDict):
 	dataSource: str
 	slideMinutes: int
 	slideMax: int
+	prefetchDepth: int
+	shuffle: bool
+	resume: bool
+
+# upcoming items a MediaPrefetch source prepares while the current one shows
+PREFETCH_ITEMS = 2
+# slides rendered ahead of the one showing
+DEFAULT_PREFETCH_DEPTH = 1
+# no further renders are started while the finished, not yet shown, frames hold this much
+PREFETCH_MAX_BYTES = 64 * 1024 * 1024
+# seconds the position writes are held back (and merged)
+POSITION_SAVE_DELAY = 10.0
+
+type RenderTask = asyncio.Task[MediaRenderResult|None]
+
+def _frame_bytes(task: RenderTask) -> int:
+	if not task.done() or task.cancelled() or task.exception() is not None:
+		return 0
+	mrr = task.result()
+	return 0 if mrr is None else mrr.image.width * mrr.image.height * len(mrr.image.getbands())
 
 class SlideShowAsync(PluginAsync):
 	def __init__(self, id, name):
 		self._id = id
 		self._name = name
 		self.timer_info = None
+		self._writer: CoalescingWriter|None = None
 		self.logger = logging.getLogger(__name__)
 	@property
 	def id(self) -> str:
@@ -29,6 +54,11 @@ class SlideShowAsync(PluginAsync):
 	@property
 	def name(self) -> str:
 		return self._name
+	def _position_writer(self, context: PluginExecutionContext) -> CoalescingWriter:
+		if self._writer is None:
+			cm = context.provider.required(ConfigurationManager)
+			self._writer = CoalescingWriter(cm.plugin_manager(self.id).open_state(), POSITION_SAVE_DELAY)
+		return self._writer
 	async def _run_slideshow(self, context: PluginExecutionContext, track: PlaylistSchedule) -> None:
 		settings: SettingsDict = cast(SettingsDict, track.content.data)
 		# assert required services are available
@@ -44,28 +74,66 @@ class SlideShowAsync(PluginAsync):
 			raise RuntimeError(f"dataSource '{dataSourceName}' is not available")
 		if isinstance(dataSource, MediaListAsync) and isinstance(dataSource, MediaRenderAsync):
 			dsec = context.create_datasource_context(dataSource)
-			# TODO check for existing state to resume from?
-			state = await dataSource.open_async(dsec, cast(Mapping[str,Any], settings))
-			if len(state) == 0:
+			items = await dataSource.open_async(dsec, cast(Mapping[str,Any], settings))
+			if len(items) == 0:
 				raise RuntimeError(f"{dataSourceName}: No media items found for slide show")
 			slideMinutes = settings.get("slideMinutes", 15)
 			slideMax = settings.get("slideMax", 0)
+			depth = max(0, int(settings.get("prefetchDepth", DEFAULT_PREFETCH_DEPTH)))
+			shuffle = bool(settings.get("shuffle", False))
+			writer = self._position_writer(context) if settings.get("resume", False) else None
+			if writer is not None:
+				_, saved = writer.cob.get()
+				cursor = SlideCursor.resume(items, saved.get(track.id, None) if saved is not None else None, shuffle)
+				if cursor.position > 0:
+					self.logger.info(f"{self.id} resuming '{track.title}' at {cursor.position + 1}/{len(items)}")
+			else:
+				cursor = SlideCursor(items, shuffle)
 			count = 0
-			startlen = len(state) if slideMax == 0 else slideMax
+			startlen = cursor.remaining if slideMax == 0 else slideMax
+			# renders in slide order, with their cursor positions; the first is the next slide to show, the rest are rendered ahead
+			pending: deque[tuple[int, RenderTask]] = deque()
+			async def _render(item: Any) -> MediaRenderResult|None:
+				# the fetches of one slide get at most one slide's time
+				with deadline(timedelta(minutes=slideMinutes).total_seconds()):
+					return await dataSource.render_async(dsec, cast(Mapping[str,Any], settings), item)
+			def _fill(window: int):
+				while cursor.remaining > 0 and len(pending) < window and (slideMax == 0 or count + len(pending) < slideMax):
+					if len(pending) > 0 and sum(_frame_bytes(tx) for _, tx in pending) >= PREFETCH_MAX_BYTES:
+						break
+					position = cursor.position
+					item = cursor.next()
+					pending.append((position, asyncio.create_task(_render(item))))
+				if isinstance(dataSource, MediaPrefetch) and cursor.remaining > 0:
+					dataSource.prefetch(dsec, cast(Mapping[str,Any], settings), cursor.peek(PREFETCH_ITEMS))
 			try:
-				while len(state) > 0 and (slideMax == 0 or count < slideMax):
+				# the first slide and those ahead of it
+				_fill(depth + 1)
+				while len(pending) > 0:
 					self.logger.info(f"{self.id} playing '{track.title}' {count + 1}/{startlen}")
-					item = state[0]
-					mrr = await dataSource.render_async(dsec, cast(Mapping[str,Any], settings), item)
+					position, task = pending.popleft()
+					mrr = await task
 					count += 1
-					state.pop(0)
+					if writer is not None:
+						# next time, continue after the slide that showed
+						writer.update(track.id, cursor.state(position + 1))
+					# start on the following slides before this one shows
+					_fill(depth)
 					if mrr is not None:
 						router.send("display", DisplayImage(context.timestamp, mrr.title if mrr.title is not None else track.title, mrr.image))
 						await timer.sleep(timedelta(minutes=slideMinutes))
+					# the next slide is due (renders that finished during the sleep may also have made room)
+					_fill(depth + 1)
 			except asyncio.CancelledError as e:
-				self.logger.info(f"{self.id} cancelled {len(state)} remaining")
-				# TODO save state for next time?
+				self.logger.info(f"{self.id} cancelled {cursor.remaining + len(pending)} remaining")
 				raise
+			finally:
+				# renders ahead are abandoned with the slideshow
+				for _, task in pending:
+					task.cancel()
+				await asyncio.gather(*[tx for _, tx in pending], return_exceptions=True)
+				if writer is not None:
+					writer.flush()
 		pass
 	async def task_async(self, context: PluginExecutionContext, track: TrackType, done: threading.Event) -> BasicMessage|None:
 		self.logger.info(f"{self.id} start '{track.title}'")
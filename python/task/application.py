@@ -5,6 +5,10 @@ from .messages import StartEvent, StartOptions, StopEvent, QuitMessage
 from .configure_event import ConfigureEvent, ConfigureOptions, ConfigureNotify
 from .protocols import MessageSink, IProvideTimer
 from .display import Display
+from .html_render_service import HtmlRenderService
+from .http_cache import HttpCache
+from .render_cache import RenderCache
+from .render_service import RenderService
 from .basic_task import DispatcherTask, QuitMessage
 from .message_router import MessageRouter, Route
 from ..model.configuration_manager import ConfigurationManager
@@ -60,6 +64,22 @@ class Application(DispatcherTask):
 		if ipt:
 			plcontainer.add_service(IProvideTimer, ipt)
 			tlcontainer.add_service(IProvideTimer, ipt)
+		rs = self.root_container.get_service(RenderService)
+		if rs:
+			plcontainer.add_service(RenderService, rs)
+			tlcontainer.add_service(RenderService, rs)
+		hrs = self.root_container.get_service(HtmlRenderService)
+		if hrs:
+			plcontainer.add_service(HtmlRenderService, hrs)
+			tlcontainer.add_service(HtmlRenderService, hrs)
+		rc = self.root_container.get_service(RenderCache)
+		if rc:
+			plcontainer.add_service(RenderCache, rc)
+			tlcontainer.add_service(RenderCache, rc)
+		hc = self.root_container.get_service(HttpCache)
+		if hc:
+			plcontainer.add_service(HttpCache, hc)
+			tlcontainer.add_service(HttpCache, hc)
 		configs = ConfigureEvent(msg.timestamp, ConfigureOptions(cm=self.cm, isp=plcontainer), "playlist-layer", self)
 		self.playlist_layer.accept(configs)
 		configt = ConfigureEvent(msg.timestamp, ConfigureOptions(cm=self.cm, isp=tlcontainer), "timer-layer", self)
@@ -129,6 +149,9 @@ class Application(DispatcherTask):
 		ipt = self.root_container.get_service(IProvideTimer)
 		if ipt:
 			dpcontainer.add_service(IProvideTimer, ipt)
+		rs = self.root_container.get_service(RenderService)
+		if rs:
+			dpcontainer.add_service(RenderService, rs)
 		configd = ConfigureEvent(timestamp_ts, ConfigureOptions(cm=self.cm, isp=dpcontainer), "display", self)
 		self.display.accept(configd)
 		# start tasks
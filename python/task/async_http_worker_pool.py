@@ -1,21 +1,45 @@
 import asyncio
 from contextvars import ContextVar
+import functools
 import threading
 from typing import Any, Callable
 import httpx
 import logging
-from concurrent.futures import Future
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
 
+from ..task.http_cache import CachingTransport, HttpCache
+from ..task.http_transport import HostLimitTransport, HttpPoolSettings, create_transport
+from ..task.loop_monitor import SLOW_CALLBACK_SECONDS, SlowCallbackMonitor
 from ..task.protocols import IRequireShutdown
+from ..task.resilience import Resilience, resilience_var
 
 # 1. Define a ContextVar to hold the resource
 # Think of this as a global variable that is unique to each "Task chain"
 client_var: ContextVar[httpx.AsyncClient] = ContextVar("http_client")
 # use one context var for each resource
+cpu_executor_var: ContextVar[Executor|None] = ContextVar("cpu_executor", default=None)
+
+async def run_cpu[T](fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+	"""
+	Run CPU-bound work (parsing, decoding, resizing) off the event loop, so it does not hold up the other fetches and timers.
+	Uses the executor of the worker pool running the task, or the loop's default executor.
+	"""
+	executor = cpu_executor_var.get()
+	return await asyncio.get_running_loop().run_in_executor(executor, functools.partial(fn, *args, **kwargs))
+
+# CPU-bound steps of the tasks at once; each can hold a decoded image
+CPU_WORKERS = 2
 
 class AsyncHttpWorkerPool(IRequireShutdown):
-	def __init__(self):
+	def __init__(self, cache: HttpCache|None = None, settings: HttpPoolSettings|None = None, slow_callback_seconds: float = SLOW_CALLBACK_SECONDS):
+		self.cache = cache
+		self.settings = settings if settings is not None else HttpPoolSettings()
+		self.transport: HostLimitTransport|None = None
+		# breakers are per host, across the tasks of this pool
+		self.resilience = Resilience()
 		self.loop = asyncio.new_event_loop()
+		self.cpu_executor = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="AsyncHttpWorkerPool-cpu")
+		self.monitor = SlowCallbackMonitor(self.loop, slow_callback_seconds)
 		self._loop_ready = threading.Event()
 		self._is_active = False # Tracks if we are accepting work
 		self.thread = threading.Thread(target=self._run_loop, daemon=True)
@@ -24,14 +48,29 @@ class AsyncHttpWorkerPool(IRequireShutdown):
 
 	def _run_loop(self):
 		asyncio.set_event_loop(self.loop)
-		self.client = httpx.AsyncClient(max_redirects=5)
+		transport = create_transport(self.settings)
+		if isinstance(transport, HostLimitTransport):
+			self.transport = transport
+		# GET responses are shared through the (optional) on-disk cache
+		if self.cache is not None:
+			transport = CachingTransport(transport, self.cache)
+		self.client = httpx.AsyncClient(max_redirects=5, transport=transport, timeout=self.settings.timeout())
 		self.loop.call_soon(self._loop_ready.set)
 		self.loop.run_forever()
 
+	def stats(self) -> dict[str, Any]:
+		"""Connection reuse and per-host queueing counters."""
+		return self.transport.stats() if self.transport is not None else {}
+
+	def loop_stats(self) -> dict[str, Any]:
+		"""Callbacks that held the event loop past the threshold."""
+		return self.monitor.stats()
+
 	def start(self):
 		"""Initializes the background loop."""
 		self.thread.start()
 		self._loop_ready.wait()
+		self.monitor.start()
 		self._is_active = True # Now safe to submit
 		self.logger.info("[Pool] Ready.")
 
@@ -46,10 +85,14 @@ class AsyncHttpWorkerPool(IRequireShutdown):
 				raise RuntimeError("HTTP client is not initialized.")
 			# This 'sets' the client for this specific Task and its children
 			token = client_var.set(self.client)
+			rtoken = resilience_var.set(self.resilience)
+			etoken = cpu_executor_var.set(self.cpu_executor)
 			try:
 				return await coro_func(*args)
 			finally:
 				# reset tokens in reverse order
+				cpu_executor_var.reset(etoken)
+				resilience_var.reset(rtoken)
 				client_var.reset(token)
 
 		fut = asyncio.run_coroutine_threadsafe(task_wrapper(), self.loop)
@@ -64,6 +107,7 @@ class AsyncHttpWorkerPool(IRequireShutdown):
 			return
 		self._is_active = False # Immediately block further submits
 		self.logger.info("[Shutdown] Closing pool...")
+		self.monitor.stop()
 		# 1. Close client and stop loop via the loop's own thread
 		async def cleanup():
 			if self.client:
@@ -81,6 +125,7 @@ class AsyncHttpWorkerPool(IRequireShutdown):
 				asyncio.gather(*pending, return_exceptions=True)
 			)
 		self.loop.close()
+		self.cpu_executor.shutdown(wait=True, cancel_futures=True)
 		self.logger.info("[Shutdown] Complete.")
 
 # --- ROBUST WORKER ---
@@ -4,7 +4,9 @@ import logging
 import threading
 from typing import Any, Mapping, cast
 
-from .display_messages import ComputedImage, DisplayImage, DisplaySettings, PriorityImage
+from .display_messages import DisplayImage, DisplaySettings, PriorityImage
+from .image_preparation import ImagePreparation, PreparationSettings
+from .render_service import RenderService
 from ..display.mock_display import MockDisplay
 from ..display.tkinter_window import TkinterWindow
 from ..display.display_base import DisplayBase
@@ -19,7 +21,8 @@ from ..task.timer import TimerThreadService
 from ..task.async_worker_pool import AsyncWorkerPool
 from .message_router import MessageRouter
 from ..utils.image_compositor import ImageCompositor
-from ..utils.image_utils import apply_image_enhancement, change_orientation, resize_image
+
+type PendingPriority = tuple[PriorityImage, asyncio.Future[DisplayImage|None]]
 
 class Display(DispatcherTask):
 	def __init__(self, name, router:MessageRouter):
@@ -36,12 +39,17 @@ class Display(DispatcherTask):
 		self.refresh_timer: CreateTimerResult | None = None
 		self.compsitor = ImageCompositor()
 		self.task_pool: AsyncWorkerPool | None = None
+		self.preparation: ImagePreparation | None = None
+		self.render_service: RenderService | None = None
+		# sequence numbers keep a slow preparation from overwriting a newer background
+		self.background_submitted = 0
+		self.background_applied = 0
 		self.resolution = (800, 480)
 		self.commitq: asyncio.Queue[BasicMessage] | None = None
-		self.priorityq: asyncio.Queue[PriorityImage] | None = None
+		self.priorityq: asyncio.Queue[PendingPriority] | None = None
 		self.task_commit: tuple[Future, threading.Event] | None = None
 		self.task_priority: tuple[Future, threading.Event] | None = None
-		self.fut_render: tuple[Future, threading.Event] | None = None
+		self.task_render: tuple[Future, threading.Event] | None = None
 		self.logger = logging.getLogger(__name__)
 
 	def _stop_task(self, task:tuple[Future, threading.Event]):
@@ -69,6 +77,9 @@ class Display(DispatcherTask):
 				self.task_pool = None
 				self.commitq = None
 				self.priorityq = None
+			if self.preparation is not None:
+				self.preparation.shutdown()
+				self.preparation = None
 			if self.display is not None:
 				self.display.shutdown()
 		except Exception as e:
@@ -95,6 +106,8 @@ class Display(DispatcherTask):
 				raise ValueError(f"Unrecognized display type: '{display_type}'")
 			ts = msg.content.isp.get_service(IProvideTimer)
 			self.timer = ts if ts is not None else TimerThreadService(self.timebase)
+			# optional; without it images are prepared in this process
+			self.render_service = msg.content.isp.get_service(RenderService)
 			self.resolution = self.display.initialize(self.cm)
 			self.logger.info(f"Loading display {display_type} {self.resolution[0]}x{self.resolution[1]}")
 			self._start_tasks(self.display, self.compsitor, self.timebase, display_settings)
@@ -104,6 +117,7 @@ class Display(DispatcherTask):
 			self.logger.error(f"configure.unhandled: {str(e)}")
 			msg.notify(True, e)
 	def _start_tasks(self, display: DisplayBase, compositor: ImageCompositor, timebase: TimeOfDay, display_settings: Mapping[str,Any]) -> None:
+		self.preparation = ImagePreparation(render_service=self.render_service)
 		self.task_pool = AsyncWorkerPool()
 		self.task_pool.start()
 		task_future = self.task_pool.submit(self._task_create_queues(), None)
@@ -118,23 +132,35 @@ class Display(DispatcherTask):
 		def priority_callback(fut):
 			if not self.is_stopped():
 				self.accept(AsyncTaskCompleted(timebase.current_time(), "priority_task", fut, donev2))
-		self.task_priority = (self.task_pool.submit(self._task_priority_image(cast(asyncio.Queue[PriorityImage], self.priorityq), cast(asyncio.Queue[BasicMessage], self.commitq), self.resolution, display_settings, donev2), callback=priority_callback), donev2)
+		self.task_priority = (self.task_pool.submit(self._task_priority_image(cast(asyncio.Queue[PendingPriority], self.priorityq), cast(asyncio.Queue[BasicMessage], self.commitq), donev2), callback=priority_callback), donev2)
 		donev3 = threading.Event()
 		def render_callback(fut):
 			if not self.is_stopped():
 				self.accept(AsyncTaskCompleted(timebase.current_time(), "render_task", fut, donev3))
 		self.task_render = (self.task_pool.submit(self._task_render_and_display(renderq, compositor, display, display_settings, donev3), callback=render_callback), donev3)
 		pass
-	async def _task_create_queues(self) -> tuple[asyncio.Queue[BasicMessage], asyncio.Queue[BasicMessage], asyncio.Queue[PriorityImage]]:
+	async def _task_create_queues(self) -> tuple[asyncio.Queue[BasicMessage], asyncio.Queue[BasicMessage], asyncio.Queue[PendingPriority]]:
 		commitq: asyncio.Queue[BasicMessage] = asyncio.Queue()
 		renderq: asyncio.Queue[BasicMessage] = asyncio.Queue()
-		priorityq: asyncio.Queue[PriorityImage] = asyncio.Queue()
+		priorityq: asyncio.Queue[PendingPriority] = asyncio.Queue()
 		return (commitq, renderq, priorityq)
-	async def _task_background_layer(self, commitq: asyncio.Queue[BasicMessage], compositor: ImageCompositor, msg: DisplayImage):
-		compositor.set_layer_background(msg)
-		await commitq.put(BasicMessage(msg.timestamp))
-	async def _task_priority_layer(self, priorityq: asyncio.Queue[PriorityImage], msg: PriorityImage):
-		await priorityq.put(msg)
+	async def _task_background_layer(self, commitq: asyncio.Queue[BasicMessage], compositor: ImageCompositor, preparation: ImagePreparation, msg: DisplayImage, settings: PreparationSettings, seq: int):
+		try:
+			# skip the work entirely if a newer background arrived while this one was queued
+			di = await preparation.prepare_async(msg, settings, lambda: seq < self.background_submitted)
+			# runs on the loop thread; a newer background may have completed first
+			if di is None or seq < self.background_applied:
+				self.logger.debug(f"Discard stale background '{msg.title}' ({seq})")
+				return
+			self.background_applied = seq
+			compositor.set_layer_background(di)
+			self.logger.debug(f"Layers v:{compositor.current_version} {compositor.current_footprint} bytes")
+			await commitq.put(BasicMessage(msg.timestamp))
+		except Exception as e:
+			self.logger.error(f"background_layer.unhandled '{msg.title}': {str(e)}")
+	async def _task_priority_layer(self, priorityq: asyncio.Queue[PendingPriority], preparation: ImagePreparation, msg: PriorityImage, settings: PreparationSettings):
+		# start preparing now; the queue keeps arrival order
+		await priorityq.put((msg, preparation.prepare_async(msg, settings)))
 	async def _task_commit_timer(self, commitq: asyncio.Queue[BasicMessage], renderq: asyncio.Queue[BasicMessage], timebase: TimeOfDay, donev: threading.Event):
 		try:
 			while True:
@@ -170,9 +196,9 @@ class Display(DispatcherTask):
 					if package is None:
 						self.logger.debug(f"Compositor no changes detected")
 						continue
+					# layers are already enhanced by the preparation stage
 					the_image, the_title = package.render()
 					if rotate: the_image = the_image.rotate(180)
-					the_image = apply_image_enhancement(the_image, display_settings)
 
 					displayImageCount += 1
 					self.logger.info(f"Compositor v:{package.version} '{the_title}' ({displayImageCount})")
@@ -188,18 +214,16 @@ class Display(DispatcherTask):
 			raise
 		finally:
 			donev.set()
-	async def _task_priority_image(self, taskq: asyncio.Queue[PriorityImage], commitq: asyncio.Queue[BasicMessage], resolution: tuple[int, int], display_settings: Mapping[str, Any]|None, donev: threading.Event):
+	async def _task_priority_image(self, taskq: asyncio.Queue[PendingPriority], commitq: asyncio.Queue[BasicMessage], donev: threading.Event):
 		try:
-			ori:str = display_settings.get("orientation", "landscape") if display_settings is not None else "landscape"
 			while True:
 				try:
-					msg = await taskq.get()
-					# Resize and adjust orientation
-					image = change_orientation(msg.img, ori)
-					image = resize_image(image, resolution)
-					di = msg if image == msg.img else ComputedImage(msg.timestamp, msg.title, image, msg)
-					self.compsitor.set_layer_priority(di)
+					msg, pending = await taskq.get()
+					di = await pending
 					taskq.task_done()
+					if di is None:
+						continue
+					self.compsitor.set_layer_priority(di)
 					await commitq.put(BasicMessage(msg.timestamp))
 					# TODO await the callback from the display task that the image was rendered before starting timer for the priority image
 					await asyncio.sleep(msg.duration.total_seconds())
@@ -226,13 +250,17 @@ class Display(DispatcherTask):
 			if self.priorityq is None:
 				self.logger.error("No priority queue available")
 				return
+			if self.preparation is None:
+				self.logger.error("No image preparation available")
+				return
 
 			display_cob = self.cm.settings_manager().open("display")
 			_, display_settings = display_cob.get()
 			self.logger.info(f"Priority '{msg.title}' ({msg.duration})")
 
-			fut  = self.task_pool.submit(self._task_priority_layer(self.priorityq, msg), None)
-			fut.result();
+			# do not wait; the preparation stage posts the layer when it is ready
+			settings = PreparationSettings.from_display_settings(display_settings, self.resolution)
+			self.task_pool.submit(self._task_priority_layer(self.priorityq, self.preparation, msg, settings), None)
 		except Exception as e:
 			self.logger.error("priorityimage.unhandled", e)
 			pass
@@ -250,20 +278,17 @@ class Display(DispatcherTask):
 			if self.commitq is None:
 				self.logger.error("No commit queue available")
 				return
+			if self.preparation is None:
+				self.logger.error("No image preparation available")
+				return
 			display_cob = self.cm.settings_manager().open("display")
 			_, display_settings = display_cob.get()
 			self.logger.info(f"Display '{msg.title}'")
 
-			if display_settings is not None:
-			# Resize and adjust orientation
-				image = change_orientation(msg.img, display_settings.get("orientation", "landscape"))
-				image = resize_image(image, self.resolution)
-				di = msg if image == msg.img else ComputedImage(msg.timestamp, msg.title, image, msg)
-				fut  = self.task_pool.submit(self._task_background_layer(self.commitq, self.compsitor, di), None)
-				fut.result();
-			else:
-				fut  = self.task_pool.submit(self._task_background_layer(self.commitq, self.compsitor, msg), None)
-				fut.result();
+			# do not wait; the preparation stage posts the layer when it is ready
+			settings = PreparationSettings.from_display_settings(display_settings, self.resolution)
+			self.background_submitted += 1
+			self.task_pool.submit(self._task_background_layer(self.commitq, self.compsitor, self.preparation, msg, settings, self.background_submitted), None)
 		except Exception as e:
 			self.logger.error("displayimage.unhandled", e)
 			pass
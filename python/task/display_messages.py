@@ -1,5 +1,6 @@
 from dataclasses import dataclass
 from datetime import timedelta
+import hashlib
 from PIL import Image
 
 from .messages import BasicMessage
@@ -13,9 +14,31 @@ class DisplayImage(BasicMessage):
 class PriorityImage(DisplayImage):
 	duration: timedelta
 
+@dataclass(frozen=True, slots=True)
+class ImageProvenance:
+	"""
+	Lightweight description of the image a ComputedImage was derived from.
+	Holds no pixels, so the source image is released once it is processed.
+	"""
+	title: str
+	size: tuple[int, int]
+	mode: str
+	digest: str
+	@staticmethod
+	def from_image(title: str, img: Image.Image) -> "ImageProvenance":
+		"""
+		Describe the given image.
+		The digest is computed over a 16x16 nearest-neighbor sample, so it is cheap for very large images.
+		"""
+		sample = img.resize((16, 16), Image.Resampling.NEAREST)
+		hx = hashlib.sha256()
+		hx.update(f"{img.mode}:{img.width}x{img.height}:".encode("utf-8"))
+		hx.update(sample.tobytes())
+		return ImageProvenance(title, img.size, img.mode, hx.hexdigest())
+
 @dataclass(frozen=True, slots=True)
 class ComputedImage(DisplayImage):
-	source: DisplayImage | PriorityImage
+	provenance: ImageProvenance
 
 @dataclass(frozen=True, slots=True)
 class OverlayDefinition:
@@ -0,0 +1,228 @@
+import base64
+import io
+import json
+import logging
+import os
+import queue
+import select
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Callable, Protocol, runtime_checkable
+from PIL import Image
+
+from .protocols import IRequireShutdown
+from ..utils.file_utils import path_to_file_url
+from ..utils.image_utils import CHROME_HEADLESS_ARGS, OutputTail, chrome_headless_executable, html_document, render_chrome_headless_png
+
+@runtime_checkable
+class HtmlRenderBackend(Protocol):
+	"""
+	One renderer instance (e.g. a browser process).
+	Not thread-safe; HtmlRenderService hands it to one render at a time.
+	"""
+	def render(self, html_path: str, dimensions: tuple[int, int]) -> bytes:
+		"""Render the HTML file at the given viewport size, returning PNG bytes."""
+		...
+	def close(self) -> None:
+		...
+
+type HtmlRenderBackendFactory = Callable[[], HtmlRenderBackend]
+
+class DevToolsError(Exception):
+	pass
+
+def _dup_above(fd: int, minimum: int) -> int:
+	"""Move fd to a number above minimum (closing the original)."""
+	import fcntl # POSIX only, like the DevTools pipe itself
+	if fd > minimum:
+		return fd
+	moved = fcntl.fcntl(fd, fcntl.F_DUPFD_CLOEXEC, minimum + 1)
+	os.close(fd)
+	return moved
+
+class DevToolsPipeBackend:
+	"""
+	Long-lived headless browser driven over the DevTools pipe (--remote-debugging-pipe).
+	Messages are NUL-terminated JSON; the browser reads from fd 3 and writes to fd 4.
+	"""
+	def __init__(self, executable: str|None = None, timeout: float = 30.0):
+		self.timeout = timeout
+		self.logger = logging.getLogger(__name__)
+		self._next_id = 0
+		self._buffer = b""
+		self._events: list[dict] = []
+		self._session: str|None = None
+		# (child reads, parent writes) and (parent reads, child writes)
+		cmd_r, self._cmd_w = os.pipe()
+		self._resp_r, resp_w = os.pipe()
+		# the child ends MUST NOT be 3 or 4, or moving them to 3/4 clobbers them
+		cmd_r, resp_w = _dup_above(cmd_r, 4), _dup_above(resp_w, 4)
+		command = [executable or chrome_headless_executable(), "--remote-debugging-pipe", *CHROME_HEADLESS_ARGS, "about:blank"]
+		# a small trampoline moves the pipe ends to fd 3/4 for the browser (/bin/sh cannot redirect fds above 9)
+		trampoline = "import os,sys; r,w=int(sys.argv[1]),int(sys.argv[2]); os.dup2(r,3); os.dup2(w,4); os.close(r); os.close(w); os.execvp(sys.argv[3],sys.argv[3:])"
+		try:
+			self._process = subprocess.Popen([sys.executable, "-c", trampoline, str(cmd_r), str(resp_w), *command], pass_fds=(cmd_r, resp_w), stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+		finally:
+			os.close(cmd_r)
+			os.close(resp_w)
+		if self._process.stderr is None:
+			raise DevToolsError("stderr is not available")
+		# the browser logs continuously; only the tail is kept for error reports
+		self.stderr = OutputTail(self._process.stderr)
+	def _send(self, method: str, params: dict[str, Any]|None = None, session: str|None = None) -> int:
+		self._next_id += 1
+		message: dict[str, Any] = { "id": self._next_id, "method": method, "params": params or {} }
+		if session is not None:
+			message["sessionId"] = session
+		data = json.dumps(message).encode("utf-8") + b"\0"
+		while data:
+			written = os.write(self._cmd_w, data)
+			data = data[written:]
+		return self._next_id
+	def _receive(self, deadline: float) -> dict:
+		while b"\0" not in self._buffer:
+			remaining = deadline - time.monotonic()
+			if remaining <= 0:
+				raise TimeoutError("DevTools response timed out")
+			ready, _, _ = select.select([self._resp_r], [], [], remaining)
+			if not ready:
+				continue
+			chunk = os.read(self._resp_r, 65536)
+			if not chunk:
+				raise DevToolsError(f"DevTools pipe closed: {self.stderr.text()[-1024:]}")
+			self._buffer += chunk
+		message, self._buffer = self._buffer.split(b"\0", 1)
+		return json.loads(message)
+	def _call(self, method: str, params: dict[str, Any]|None = None, session: str|None = None) -> dict:
+		id = self._send(method, params, session)
+		deadline = time.monotonic() + self.timeout
+		while True:
+			message = self._receive(deadline)
+			if message.get("id") == id:
+				if "error" in message:
+					raise DevToolsError(f"{method}: {message['error']}")
+				return message.get("result", {})
+			if "method" in message:
+				self._events.append(message)
+	def _wait_event(self, method: str, session: str|None) -> dict:
+		deadline = time.monotonic() + self.timeout
+		while True:
+			for ix, event in enumerate(self._events):
+				if event.get("method") == method and event.get("sessionId") == session:
+					del self._events[ix]
+					return event
+			message = self._receive(deadline)
+			if "method" in message:
+				self._events.append(message)
+	def _attach(self) -> str:
+		target = self._call("Target.createTarget", { "url": "about:blank" })
+		attached = self._call("Target.attachToTarget", { "targetId": target["targetId"], "flatten": True })
+		session = attached["sessionId"]
+		self._call("Page.enable", session=session)
+		return session
+	def render(self, html_path: str, dimensions: tuple[int, int]) -> bytes:
+		if self._process.poll() is not None:
+			raise DevToolsError(f"browser exited with {self._process.returncode}: {self.stderr.text()[-1024:]}")
+		if self._session is None:
+			self._session = self._attach()
+		session = self._session
+		self._events.clear()
+		self._call("Emulation.setDeviceMetricsOverride", { "width": dimensions[0], "height": dimensions[1], "deviceScaleFactor": 1, "mobile": False }, session)
+		self._call("Page.navigate", { "url": path_to_file_url(html_path) }, session)
+		self._wait_event("Page.loadEventFired", session)
+		self._call("Runtime.evaluate", { "expression": "document.fonts.ready.then(() => true)", "awaitPromise": True }, session)
+		shot = self._call("Page.captureScreenshot", { "format": "png" }, session)
+		return base64.b64decode(shot["data"])
+	def close(self) -> None:
+		try:
+			if self._process.poll() is None:
+				self._send("Browser.close")
+				self._process.wait(timeout=5)
+		except Exception:
+			self._process.kill()
+			self._process.wait()
+		finally:
+			os.close(self._cmd_w)
+			os.close(self._resp_r)
+
+class ProcessPerRenderBackend:
+	"""Starts a browser process for each render (the original behavior); used where the DevTools pipe is not available."""
+	def render(self, html_path: str, dimensions: tuple[int, int]) -> bytes:
+		png = render_chrome_headless_png(html_path, [f"--window-size={dimensions[0]},{dimensions[1]}"])
+		if png is None:
+			raise RuntimeError("Failed to render")
+		return png
+	def close(self) -> None:
+		pass
+
+def default_backend_factory() -> HtmlRenderBackend:
+	return DevToolsPipeBackend() if os.name == "posix" else ProcessPerRenderBackend()
+
+class HtmlRenderService(IRequireShutdown):
+	"""
+	Pool of warm renderers shared by all RenderSessions.
+	Renderers are started on first use; a renderer that fails is closed and replaced on the next render.
+	"""
+	def __init__(self, backend_factory: HtmlRenderBackendFactory = default_backend_factory, pool_size: int = 1):
+		if pool_size < 1:
+			raise ValueError("pool_size must be at least 1")
+		self._factory = backend_factory
+		self._idle: queue.LifoQueue[HtmlRenderBackend|None] = queue.LifoQueue()
+		# None is a slot without a started renderer
+		for _ in range(pool_size):
+			self._idle.put(None)
+		self._lock = threading.Lock()
+		self._backends: list[HtmlRenderBackend] = []
+		self._shutdown = False
+		self.logger = logging.getLogger(__name__)
+	def render_png(self, html: str, dimensions: tuple[int, int], timeout: float|None = None) -> bytes:
+		"""Render the HTML string, returning PNG bytes. Blocks until a renderer is available."""
+		if self._shutdown:
+			raise RuntimeError("HtmlRenderService has been shutdown")
+		backend = self._idle.get(timeout=timeout)
+		try:
+			if backend is None:
+				backend = self._factory()
+				with self._lock:
+					self._backends.append(backend)
+			with html_document(html) as html_file_path:
+				return backend.render(html_file_path, dimensions)
+		except Exception:
+			if backend is not None:
+				self._discard(backend)
+			backend = None
+			raise
+		finally:
+			self._idle.put(backend)
+	def render(self, html: str, dimensions: tuple[int, int]) -> Image.Image|None:
+		try:
+			with Image.open(io.BytesIO(self.render_png(html, dimensions))) as img:
+				img.load()
+				return img.copy()
+		except Exception as e:
+			self.logger.error(f"Failed to render: {str(e)}")
+			return None
+	def _discard(self, backend: HtmlRenderBackend) -> None:
+		with self._lock:
+			if backend in self._backends:
+				self._backends.remove(backend)
+		try:
+			backend.close()
+		except Exception as e:
+			self.logger.warning(f"Failed to close renderer: {str(e)}")
+	def shutdown(self) -> None:
+		if self._shutdown:
+			return
+		self._shutdown = True
+		self.logger.info("[Shutdown] Start.")
+		with self._lock:
+			backends = list(self._backends)
+			self._backends.clear()
+		for backend in backends:
+			try:
+				backend.close()
+			except Exception as e:
+				self.logger.warning(f"Failed to close renderer: {str(e)}")
+		self.logger.info("[Shutdown] Complete.")
@@ -0,0 +1,298 @@
+import asyncio
+from dataclasses import asdict, dataclass, field
+from email.utils import parsedate_to_datetime
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, AsyncIterator
+import httpx
+
+# disk budget of the cache folder
+CACHE_BYTES = 64 * 1024 * 1024
+# responses larger than this share of the budget stream through uncached
+MAX_ENTRY_SHARE = 8
+# a stored response may be served this long past its freshness when the origin fails (unless it says otherwise)
+MAX_STALE_SECONDS = 7 * 24 * 3600
+# describe one transfer, not the stored representation
+HOP_HEADERS = frozenset(["connection", "keep-alive", "transfer-encoding", "te", "trailer", "upgrade", "proxy-authenticate", "proxy-authorization", "content-length"])
+
+def parse_cache_control(value: str|None) -> dict[str, str|None]:
+	"""Directives of a Cache-Control header, lower-cased; valueless directives map to None."""
+	directives: dict[str, str|None] = {}
+	if not value:
+		return directives
+	for part in value.split(","):
+		name, sep, arg = part.strip().partition("=")
+		if name:
+			directives[name.lower()] = arg.strip().strip('"') if sep else None
+	return directives
+
+def _seconds(value: str|None) -> int|None:
+	try:
+		return max(0, int(value)) if value is not None else None
+	except ValueError:
+		return None
+
+def freshness_lifetime(headers: httpx.Headers) -> float:
+	"""Seconds a response stays fresh after it was received; zero means revalidate before every use."""
+	cc = parse_cache_control(headers.get("cache-control"))
+	if "no-cache" in cc:
+		return 0
+	age = _seconds(headers.get("age")) or 0
+	max_age = _seconds(cc.get("max-age"))
+	if max_age is not None:
+		return max(0, max_age - age)
+	expires = headers.get("expires")
+	if expires is not None:
+		try:
+			date = headers.get("date")
+			origin_now = parsedate_to_datetime(date).timestamp() if date is not None else time.time()
+			return max(0, parsedate_to_datetime(expires).timestamp() - origin_now)
+		except (TypeError, ValueError):
+			# invalid Expires means already expired
+			return 0
+	# no heuristic freshness; the validators are used instead
+	return 0
+
+@dataclass(slots=True)
+class HttpCacheEntry:
+	"""Metadata of one stored response; the body is stored next to it."""
+	url: str
+	status: int
+	headers: list[tuple[str, str]]
+	stored: float
+	expires: float
+	size: int
+	vary: dict[str, str|None] = field(default_factory=dict)
+	def header(self, name: str) -> str|None:
+		return httpx.Headers(self.headers).get(name)
+	@property
+	def etag(self) -> str|None:
+		return self.header("etag")
+	@property
+	def last_modified(self) -> str|None:
+		return self.header("last-modified")
+	def stale_limit(self) -> float:
+		"""Until when the entry may be used after an origin failure."""
+		cc = parse_cache_control(self.header("cache-control"))
+		if "must-revalidate" in cc or "proxy-revalidate" in cc:
+			return self.expires
+		stale = _seconds(cc.get("stale-if-error"))
+		return self.expires + (stale if stale is not None else MAX_STALE_SECONDS)
+	def matches(self, request: httpx.Request) -> bool:
+		"""The request selects this representation (Vary)."""
+		return all(request.headers.get(name) == value for name, value in self.vary.items())
+
+class HttpCache:
+	"""
+	On-disk HTTP response cache with a size budget, used by CachingTransport.
+	Each entry is a JSON metadata file and a body file named by the hash of the URL; least recently used entries are evicted first.
+	Thread-safe.
+	"""
+	def __init__(self, folder: str, max_bytes: int = CACHE_BYTES):
+		self.folder = folder
+		self.max_bytes = max_bytes
+		self.max_entry_bytes = max_bytes // MAX_ENTRY_SHARE
+		self._lock = threading.Lock()
+		self._stats = { "requests": 0, "hits": 0, "revalidated": 0, "misses": 0, "stale": 0, "bytes_saved": 0, "bytes_fetched": 0 }
+		self.logger = logging.getLogger(__name__)
+	def _paths(self, url: str) -> tuple[str, str]:
+		key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+		return (os.path.join(self.folder, f"{key}.json"), os.path.join(self.folder, f"{key}.body"))
+	def get(self, url: str) -> tuple[HttpCacheEntry, bytes]|None:
+		meta_path, body_path = self._paths(url)
+		try:
+			with open(meta_path, "r", encoding="utf-8") as meta_file:
+				meta = json.load(meta_file)
+			with open(body_path, "rb") as body_file:
+				body = body_file.read()
+			entry = HttpCacheEntry(**meta)
+			entry.headers = [(name, value) for name, value in entry.headers]
+			if entry.url != url or entry.size != len(body):
+				raise ValueError("entry does not match")
+			# mtime is the LRU order
+			os.utime(body_path)
+			return (entry, body)
+		except FileNotFoundError:
+			return None
+		except Exception as e:
+			self.logger.warning(f"Discarding cached response for {url}: {e}")
+			self.remove(url)
+			return None
+	def put(self, entry: HttpCacheEntry, body: bytes|None = None) -> None:
+		"""Store an entry; without a body only the metadata is replaced (after a revalidation)."""
+		meta_path, body_path = self._paths(entry.url)
+		try:
+			# the folder may be removed by a storage reset
+			os.makedirs(self.folder, exist_ok=True)
+			if body is not None:
+				with open(f"{body_path}.tmp", "wb") as body_file:
+					body_file.write(body)
+				os.replace(f"{body_path}.tmp", body_path)
+			with open(f"{meta_path}.tmp", "w", encoding="utf-8") as meta_file:
+				json.dump(asdict(entry), meta_file, separators=(",", ":"))
+			os.replace(f"{meta_path}.tmp", meta_path)
+			if body is not None:
+				self._evict()
+		except Exception as e:
+			self.logger.warning(f"Failed to cache response for {entry.url}: {e}")
+	def remove(self, url: str) -> None:
+		for path in self._paths(url):
+			try:
+				os.remove(path)
+			except OSError:
+				pass
+	def clear(self) -> None:
+		if os.path.isdir(self.folder):
+			for entry in os.scandir(self.folder):
+				if entry.name.endswith((".json", ".body")):
+					os.remove(entry.path)
+	def _evict(self) -> None:
+		"""Delete least recently used entries until the folder is within its budget."""
+		with self._lock:
+			entries = []
+			for dentry in os.scandir(self.folder):
+				if dentry.name.endswith(".body"):
+					stat = dentry.stat()
+					entries.append((stat.st_mtime, stat.st_size, dentry.path))
+			total = sum(ex[1] for ex in entries)
+			for _, size, path in sorted(entries):
+				if total <= self.max_bytes:
+					break
+				for px in (path, f"{path[:-len('.body')]}.json"):
+					try:
+						os.remove(px)
+					except OSError:
+						pass
+				total -= size
+	def count(self, outcome: str, saved: int = 0, fetched: int = 0) -> None:
+		with self._lock:
+			self._stats["requests"] += 1
+			self._stats[outcome] += 1
+			self._stats["bytes_saved"] += saved
+			self._stats["bytes_fetched"] += fetched
+	def stats(self) -> dict[str, Any]:
+		"""Counters since start; hit_ratio counts revalidated and stale responses as hits."""
+		with self._lock:
+			stats: dict[str, Any] = dict(self._stats)
+		served = stats["hits"] + stats["revalidated"] + stats["stale"]
+		stats["hit_ratio"] = round(served / stats["requests"], 3) if stats["requests"] > 0 else 0.0
+		return stats
+
+class _ReplayStream(httpx.AsyncByteStream):
+	"""The chunks already read, then the rest of the original stream."""
+	def __init__(self, chunks: list[bytes], rest: AsyncIterator[bytes], original: httpx.AsyncByteStream):
+		self._chunks = chunks
+		self._rest = rest
+		self._original = original
+	async def __aiter__(self) -> AsyncIterator[bytes]:
+		for chunk in self._chunks:
+			yield chunk
+		async for chunk in self._rest:
+			yield chunk
+	async def aclose(self) -> None:
+		await self._original.aclose()
+
+class CachingTransport(httpx.AsyncBaseTransport):
+	"""
+	Serves GET requests from an HttpCache while fresh, revalidates stale entries with If-None-Match/If-Modified-Since,
+	and falls back to the stored response when the origin fails.
+	"""
+	def __init__(self, transport: httpx.AsyncBaseTransport, cache: HttpCache):
+		self.transport = transport
+		self.cache = cache
+		self.logger = logging.getLogger(__name__)
+	def _response(self, request: httpx.Request, entry: HttpCacheEntry, body: bytes) -> httpx.Response:
+		headers = httpx.Headers(entry.headers)
+		headers["content-length"] = str(len(body))
+		headers["age"] = str(max(0, int(time.time() - entry.stored)))
+		return httpx.Response(entry.status, headers=headers, stream=httpx.ByteStream(body), request=request, extensions={ "from_cache": True })
+	async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+		if request.method != "GET":
+			return await self.transport.handle_async_request(request)
+		request_cc = parse_cache_control(request.headers.get("cache-control"))
+		if "no-store" in request_cc:
+			return await self.transport.handle_async_request(request)
+		url = str(request.url)
+		cached = await asyncio.to_thread(self.cache.get, url)
+		if cached is not None and not cached[0].matches(request):
+			cached = None
+		now = time.time()
+		if cached is not None and "no-cache" not in request_cc and cached[0].expires > now:
+			self.cache.count("hits", saved=cached[0].size)
+			return self._response(request, cached[0], cached[1])
+		# the caller's own conditional request is passed through
+		conditional = cached is not None and "if-none-match" not in request.headers and "if-modified-since" not in request.headers
+		if conditional and cached is not None:
+			if cached[0].etag is not None:
+				request.headers["if-none-match"] = cached[0].etag
+			if cached[0].last_modified is not None:
+				request.headers["if-modified-since"] = cached[0].last_modified
+		try:
+			response = await self.transport.handle_async_request(request)
+		except httpx.TransportError as e:
+			if cached is not None and cached[0].stale_limit() > now:
+				self.logger.warning(f"Serving stale {url}: {e}")
+				self.cache.count("stale", saved=cached[0].size)
+				return self._response(request, cached[0], cached[1])
+			raise
+		if conditional and cached is not None and response.status_code == 304:
+			await response.aclose()
+			entry = cached[0]
+			# the 304 carries the updated metadata (RFC 9111 4.3.4)
+			headers = httpx.Headers(entry.headers)
+			for name, value in response.headers.multi_items():
+				if name.lower() not in HOP_HEADERS:
+					headers[name] = value
+			entry.headers = list(headers.multi_items())
+			entry.stored = time.time()
+			entry.expires = entry.stored + freshness_lifetime(headers)
+			await asyncio.to_thread(self.cache.put, entry)
+			self.cache.count("revalidated", saved=entry.size)
+			return self._response(request, entry, cached[1])
+		if cached is not None and response.status_code >= 500 and cached[0].stale_limit() > now:
+			await response.aclose()
+			self.logger.warning(f"Serving stale {url}: status {response.status_code}")
+			self.cache.count("stale", saved=cached[0].size)
+			return self._response(request, cached[0], cached[1])
+		if response.status_code == 200 and self._storable(response):
+			return await self._store(request, response)
+		self.cache.count("misses")
+		return response
+	def _storable(self, response: httpx.Response) -> bool:
+		cc = parse_cache_control(response.headers.get("cache-control"))
+		if "no-store" in cc or response.headers.get("vary", "").strip() == "*":
+			return False
+		length = _seconds(response.headers.get("content-length"))
+		if length is not None and length > self.cache.max_entry_bytes:
+			return False
+		return freshness_lifetime(response.headers) > 0 or "etag" in response.headers or "last-modified" in response.headers
+	async def _store(self, request: httpx.Request, response: httpx.Response) -> httpx.Response:
+		stream = response.stream
+		if not isinstance(stream, httpx.AsyncByteStream):
+			self.cache.count("misses")
+			return response
+		chunks: list[bytes] = []
+		size = 0
+		rest = stream.__aiter__()
+		async for chunk in rest:
+			chunks.append(chunk)
+			size += len(chunk)
+			if size > self.cache.max_entry_bytes:
+				# too large after all; hand over what was read and the rest
+				self.cache.count("misses", fetched=size)
+				return httpx.Response(response.status_code, headers=response.headers, stream=_ReplayStream(chunks, rest, stream), request=request, extensions=response.extensions)
+		await response.aclose()
+		body = b"".join(chunks)
+		headers = [(name, value) for name, value in response.headers.multi_items() if name.lower() not in HOP_HEADERS]
+		vary = [name.strip().lower() for name in response.headers.get("vary", "").split(",") if name.strip()]
+		stored = time.time()
+		entry = HttpCacheEntry(str(request.url), response.status_code, headers, stored, stored + freshness_lifetime(response.headers), len(body), { name: request.headers.get(name) for name in vary })
+		await asyncio.to_thread(self.cache.put, entry, body)
+		self.cache.count("misses", fetched=len(body))
+		return self._response(request, entry, body)
+	async def aclose(self) -> None:
+		await self.transport.aclose()
@@ -0,0 +1,133 @@
+import asyncio
+from dataclasses import dataclass
+import importlib.util
+import logging
+import threading
+import time
+from typing import Any, AsyncIterator, Mapping
+import httpx
+
+# system settings (settings/system.json) of the HTTP client
+MAX_CONNECTIONS_SETTING = "http-maxConnections"
+MAX_KEEPALIVE_SETTING = "http-maxKeepalive"
+KEEPALIVE_SECONDS_SETTING = "http-keepaliveSeconds"
+HTTP2_SETTING = "http-http2"
+TIMEOUT_SECONDS_SETTING = "http-timeoutSeconds"
+PER_HOST_SETTING = "http-perHost"
+
+@dataclass(frozen=True, slots=True)
+class HttpPoolSettings:
+	"""Connection pool of the shared HTTP client."""
+	max_connections: int = 20
+	max_keepalive: int = 10
+	keepalive_seconds: float = 30.0
+	http2: bool = False
+	timeout_seconds: float = 10.0
+	# concurrent requests to one host; the rest wait their turn
+	per_host: int = 4
+	@staticmethod
+	def from_settings(settings: Mapping[str, Any]|None) -> "HttpPoolSettings":
+		if settings is None:
+			return HttpPoolSettings()
+		default = HttpPoolSettings()
+		return HttpPoolSettings(
+			max_connections=max(1, int(settings.get(MAX_CONNECTIONS_SETTING, default.max_connections))),
+			max_keepalive=max(0, int(settings.get(MAX_KEEPALIVE_SETTING, default.max_keepalive))),
+			keepalive_seconds=max(0.0, float(settings.get(KEEPALIVE_SECONDS_SETTING, default.keepalive_seconds))),
+			http2=bool(settings.get(HTTP2_SETTING, default.http2)),
+			timeout_seconds=max(0.1, float(settings.get(TIMEOUT_SECONDS_SETTING, default.timeout_seconds))),
+			per_host=max(1, int(settings.get(PER_HOST_SETTING, default.per_host)))
+		)
+	def limits(self) -> httpx.Limits:
+		return httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_keepalive, keepalive_expiry=self.keepalive_seconds)
+	def timeout(self) -> httpx.Timeout:
+		return httpx.Timeout(self.timeout_seconds)
+
+def create_transport(settings: HttpPoolSettings) -> httpx.AsyncBaseTransport:
+	"""The network transport: pooled connections behind per-host limits. HTTP/2 needs the optional h2 package."""
+	http2 = settings.http2
+	if http2 and importlib.util.find_spec("h2") is None:
+		logging.getLogger(__name__).warning("HTTP/2 is enabled but the h2 package is not installed; using HTTP/1.1")
+		http2 = False
+	return HostLimitTransport(httpx.AsyncHTTPTransport(limits=settings.limits(), http2=http2), settings.per_host)
+
+class _ReleasingStream(httpx.AsyncByteStream):
+	"""Response body that frees the host slot when it is closed."""
+	def __init__(self, stream: httpx.AsyncByteStream, release):
+		self._stream = stream
+		self._release = release
+	async def __aiter__(self) -> AsyncIterator[bytes]:
+		async for chunk in self._stream:
+			yield chunk
+	async def aclose(self) -> None:
+		try:
+			await self._stream.aclose()
+		finally:
+			self._release()
+
+class HostLimitTransport(httpx.AsyncBaseTransport):
+	"""
+	Limits the requests in flight per host, so one slow host cannot hold every pooled connection.
+	A slot is held until the response body is closed. Counts queueing and new connections for telemetry.
+	"""
+	def __init__(self, transport: httpx.AsyncBaseTransport, per_host: int):
+		self.transport = transport
+		self.per_host = per_host
+		self._slots: dict[str, asyncio.Semaphore] = {}
+		self._lock = threading.Lock()
+		self._stats = { "requests": 0, "connections": 0, "queued": 0, "queue_wait_ms": 0.0, "queue_wait_ms_max": 0.0 }
+	def _slot(self, host: str) -> asyncio.Semaphore:
+		slot = self._slots.get(host, None)
+		if slot is None:
+			slot = asyncio.Semaphore(self.per_host)
+			self._slots[host] = slot
+		return slot
+	async def _trace(self, name: str, info: dict[str, Any]) -> None:
+		if name in ("connection.connect_tcp.complete", "connection.connect_unix_socket.complete"):
+			with self._lock:
+				self._stats["connections"] += 1
+	async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+		slot = self._slot(request.url.netloc.decode("ascii"))
+		queued = slot.locked()
+		started = time.perf_counter()
+		await slot.acquire()
+		waited = (time.perf_counter() - started) * 1000
+		with self._lock:
+			self._stats["requests"] += 1
+			if queued:
+				self._stats["queued"] += 1
+				self._stats["queue_wait_ms"] += waited
+				self._stats["queue_wait_ms_max"] = max(self._stats["queue_wait_ms_max"], waited)
+		released = False
+		def _release():
+			nonlocal released
+			if not released:
+				released = True
+				slot.release()
+		try:
+			trace = request.extensions.get("trace", None)
+			async def _traced(name: str, info: dict[str, Any]) -> None:
+				await self._trace(name, info)
+				if trace is not None:
+					await trace(name, info)
+			request.extensions = { **request.extensions, "trace": _traced }
+			response = await self.transport.handle_async_request(request)
+		except BaseException:
+			_release()
+			raise
+		if response.is_closed or not isinstance(response.stream, httpx.AsyncByteStream):
+			# the body is already in memory
+			_release()
+			return response
+		response.stream = _ReleasingStream(response.stream, _release)
+		return response
+	def stats(self) -> dict[str, Any]:
+		"""Counters since start; reuse_ratio is the share of requests that did not open a connection."""
+		with self._lock:
+			stats: dict[str, Any] = dict(self._stats)
+		stats["queue_wait_ms"] = round(stats["queue_wait_ms"], 3)
+		stats["queue_wait_ms_max"] = round(stats["queue_wait_ms_max"], 3)
+		stats["reuse_ratio"] = round(1 - min(stats["connections"], stats["requests"]) / stats["requests"], 3) if stats["requests"] > 0 else 0.0
+		return stats
+	async def aclose(self) -> None:
+		await self.transport.aclose()
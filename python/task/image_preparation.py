@@ -0,0 +1,87 @@
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Mapping
+from PIL import Image
+
+from .display_messages import ComputedImage, DisplayImage, ImageProvenance
+from .protocols import IRequireShutdown
+from .render_service import RenderService
+from ..utils.image_utils import DEFAULT_RESAMPLE_QUALITY, RESAMPLE_QUALITY_SETTING, ResampleQuality, apply_image_enhancement, change_orientation, draft_image, resize_image
+
+@dataclass(frozen=True, slots=True)
+class PreparationSettings:
+	"""Snapshot of the display settings used to prepare one image."""
+	orientation: str
+	resolution: tuple[int, int]
+	enhancement: Mapping[str, Any]|None = None
+	@property
+	def resample_quality(self) -> ResampleQuality:
+		return self.enhancement.get(RESAMPLE_QUALITY_SETTING, DEFAULT_RESAMPLE_QUALITY) if self.enhancement is not None else DEFAULT_RESAMPLE_QUALITY
+	@staticmethod
+	def from_display_settings(display_settings: Mapping[str, Any]|None, resolution: tuple[int, int]) -> "PreparationSettings":
+		orientation = display_settings.get("orientation", "landscape") if display_settings is not None else "landscape"
+		return PreparationSettings(orientation, resolution, display_settings)
+
+def prepare_pixels(img: Image.Image, settings: PreparationSettings) -> Image.Image:
+	"""Adjust orientation, resize to the display resolution and apply the image enhancements."""
+	quality = settings.resample_quality
+	if quality == "speed":
+		# before the rotation decodes the image
+		width, height = img.size if settings.orientation == "landscape" else (img.height, img.width)
+		img = draft_image(img, max(settings.resolution[0] / width, settings.resolution[1] / height))
+	image = change_orientation(img, settings.orientation)
+	image = resize_image(image, settings.resolution, resample_quality=quality)
+	return apply_image_enhancement(image, settings.enhancement)
+
+def _as_layer(msg: DisplayImage, image: Image.Image) -> DisplayImage:
+	# when the image changes, only its provenance is kept, so the (possibly very large) source image can be released
+	if image is msg.img:
+		return msg
+	return ComputedImage(msg.timestamp, msg.title, image, ImageProvenance.from_image(msg.title, msg.img))
+
+def prepare_image(msg: DisplayImage, settings: PreparationSettings) -> DisplayImage:
+	"""Prepare the image of the message as a display-ready layer."""
+	return _as_layer(msg, prepare_pixels(msg.img, settings))
+
+class ImagePreparation(IRequireShutdown):
+	"""
+	Pipeline stage that turns DisplayImage/PriorityImage into display-ready layers.
+	The work runs on a worker pool (Pillow releases the GIL), so the Display dispatcher never waits on it.
+	If a RenderService is given, the pixel work is offloaded to its process pool.
+	"""
+	def __init__(self, max_workers: int|None = None, render_service: RenderService|None = None):
+		workers = max_workers if max_workers is not None else min(4, os.cpu_count() or 1)
+		self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ImagePreparation")
+		self._render = render_service
+		self._shutdown = False
+		self.logger = logging.getLogger(__name__)
+	def prepare(self, msg: DisplayImage, settings: PreparationSettings) -> DisplayImage:
+		"""Prepare on the calling thread."""
+		return prepare_image(msg, settings)
+	def prepare_async(self, msg: DisplayImage, settings: PreparationSettings, superseded: Callable[[], bool]|None = None) -> asyncio.Future[DisplayImage|None]:
+		"""
+		Prepare on the worker pool.
+		MUST be called from a running event loop; the returned future completes on that loop.
+		If superseded returns True when a worker picks up the job, the job is skipped and the result is None.
+		"""
+		if self._shutdown:
+			raise RuntimeError("ImagePreparation has been shutdown")
+		def _prepare() -> DisplayImage|None:
+			if superseded is not None and superseded():
+				return None
+			if self._render is not None:
+				# the worker thread only waits; the pixels are processed in another process
+				return _as_layer(msg, self._render.submit(prepare_pixels, msg.img, settings).result())
+			return prepare_image(msg, settings)
+		loop = asyncio.get_running_loop()
+		return loop.run_in_executor(self._executor, _prepare)
+	def shutdown(self) -> None:
+		if self._shutdown:
+			return
+		self._shutdown = True
+		self.logger.info("[Shutdown] Start.")
+		self._executor.shutdown(wait=True, cancel_futures=True)
+		self.logger.info("[Shutdown] Complete.")
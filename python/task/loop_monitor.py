@@ -0,0 +1,74 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Any
+
+# the loop is late by more than this: a callback held it
+SLOW_CALLBACK_SECONDS = 0.1
+
+class SlowCallbackMonitor:
+	"""
+	Detects callbacks that hold an event loop longer than threshold seconds, without asyncio debug mode.
+	A heartbeat on the loop measures how late it runs (what every other task and timer waited);
+	a watchdog thread logs the loop thread's stack while it is still blocked, to show the culprit.
+	"""
+	def __init__(self, loop: asyncio.AbstractEventLoop, threshold: float = SLOW_CALLBACK_SECONDS, interval: float|None = None):
+		self.loop = loop
+		self.threshold = threshold
+		self.interval = interval if interval is not None else threshold / 2
+		self._expected = 0.0
+		self._beat_at = 0.0
+		self._loop_thread: int|None = None
+		self._handle: asyncio.TimerHandle|None = None
+		self._stop = threading.Event()
+		self._watchdog: threading.Thread|None = None
+		self._lock = threading.Lock()
+		self._stats = { "slow_callbacks": 0, "slow_ms_total": 0.0, "slow_ms_max": 0.0 }
+		self.logger = logging.getLogger(__name__)
+	def _beat(self) -> None:
+		now = time.monotonic()
+		lag = now - self._expected
+		if self._expected > 0 and lag > self.threshold:
+			with self._lock:
+				self._stats["slow_callbacks"] += 1
+				self._stats["slow_ms_total"] += lag * 1000
+				self._stats["slow_ms_max"] = max(self._stats["slow_ms_max"], lag * 1000)
+			self.logger.warning(f"Event loop blocked for {lag * 1000:.0f}ms")
+		self._loop_thread = threading.get_ident()
+		self._beat_at = now
+		self._expected = now + self.interval
+		if not self._stop.is_set():
+			self._handle = self.loop.call_later(self.interval, self._beat)
+	def _watch(self) -> None:
+		reported = 0.0
+		while not self._stop.wait(self.interval):
+			beat_at = self._beat_at
+			if beat_at == 0 or beat_at == reported or time.monotonic() - beat_at < self.interval + self.threshold:
+				continue
+			reported = beat_at
+			frame = sys._current_frames().get(self._loop_thread) if self._loop_thread is not None else None
+			if frame is not None:
+				self.logger.warning("Event loop is blocked in:\n" + "".join(traceback.format_stack(frame)))
+	def start(self) -> None:
+		"""Start watching; may be called from any thread."""
+		self._stop.clear()
+		self.loop.call_soon_threadsafe(self._beat)
+		self._watchdog = threading.Thread(target=self._watch, daemon=True, name="SlowCallbackMonitor")
+		self._watchdog.start()
+	def stop(self) -> None:
+		self._stop.set()
+		if self._handle is not None and not self.loop.is_closed():
+			self.loop.call_soon_threadsafe(self._handle.cancel)
+		if self._watchdog is not None:
+			self._watchdog.join()
+			self._watchdog = None
+	def stats(self) -> dict[str, Any]:
+		"""Stalls since start: how many, and how long the loop was held (ms)."""
+		with self._lock:
+			stats: dict[str, Any] = dict(self._stats)
+		stats["slow_ms_total"] = round(stats["slow_ms_total"], 3)
+		stats["slow_ms_max"] = round(stats["slow_ms_max"], 3)
+		return stats
@@ -20,7 +20,13 @@ from ..model.service_container import IServiceProvider, ServiceContainer
 from ..model.configuration_manager import ConfigurationManager, SettingsConfigurationManager, StaticConfigurationManager
 from ..plugins.plugin_base import PluginAsync, PluginExecutionContext
 from ..task.async_http_worker_pool import AsyncHttpWorkerPool
+from ..task.html_render_service import HtmlRenderService
+from ..task.http_cache import HttpCache
+from ..task.http_transport import HttpPoolSettings
+from ..task.render_cache import RenderCache
+from ..task.render_service import RenderService
 from ..task.timer import IProvideTimer, TimerThreadService
+from ..utils.image_utils import download_stats
 from ..task.protocols import IRequireShutdown
 
 @dataclass(frozen=True, slots=True)
@@ -71,6 +77,9 @@ class PlaylistLayer(DispatcherTask):
 		self.timer: IProvideTimer|None = None
 		self.dimensions:tuple[int,int] = (800,480)
 		self.task_pool: AsyncHttpWorkerPool|None = None
+		self.render_service: RenderService|None = None
+		self.html_render_service: HtmlRenderService|None = None
+		self.render_cache: RenderCache|None = None
 		self.layer_task: tuple[Future, threading.Event] | None = None
 		self.timebase: TimeOfDay|None = None
 		self.shutdownlist: list[IRequireShutdown] = []
@@ -117,6 +126,12 @@ class PlaylistLayer(DispatcherTask):
 		root.add_service(IProvideTimer, self.timer)
 		root.add_service(TimeOfDay, self.timebase)
 		root.add_service(MessageSink, self)
+		if self.render_service is not None:
+			root.add_service(RenderService, self.render_service)
+		if self.html_render_service is not None:
+			root.add_service(HtmlRenderService, self.html_render_service)
+		if self.render_cache is not None:
+			root.add_service(RenderCache, self.render_cache)
 		return root
 	def _error_with_telemetry(self, emsg:str, msg_ts:datetime):
 		self.logger.error(emsg, exc_info=True)
@@ -166,6 +181,12 @@ class PlaylistLayer(DispatcherTask):
 							'current_track': track,
 						}
 						self.router.send("telemetry", Telemetry(tod.current_time(), "playlist_layer", cast(Mapping[str,Any], telemetry)))
+						if self.task_pool is not None:
+							self.router.send("telemetry", Telemetry(tod.current_time(), "http_pool", self.task_pool.stats()))
+							self.router.send("telemetry", Telemetry(tod.current_time(), "event_loop", self.task_pool.loop_stats()))
+							if self.task_pool.cache is not None:
+								self.router.send("telemetry", Telemetry(tod.current_time(), "http_cache", self.task_pool.cache.stats()))
+							self.router.send("telemetry", Telemetry(tod.current_time(), "downloads", download_stats.stats()))
 					except Exception as e:
 						self.state = "error"
 						self._error_with_telemetry(f"Error invoke start with plugin '{plugin.name}' track '{track.title}': {e}", tod.current_time())
@@ -266,10 +287,18 @@ class PlaylistLayer(DispatcherTask):
 				self.shutdownlist.append(self.datasources)
 
 			ahwp = msg.content.isp.get_service(AsyncHttpWorkerPool)
-			self.task_pool = ahwp if ahwp is not None else AsyncHttpWorkerPool()
-			if ahwp is None and isinstance(self.task_pool, IRequireShutdown):
+			if ahwp is None:
+				_, system_settings = self.cm.settings_manager().open("system").get()
+				self.task_pool = AsyncHttpWorkerPool(msg.content.isp.get_service(HttpCache), HttpPoolSettings.from_settings(system_settings))
 				self.shutdownlist.append(self.task_pool)
 				self.task_pool.start()
+			else:
+				self.task_pool = ahwp
+
+			# optional; plugins and datasources render in-process without it
+			self.render_service = msg.content.isp.get_service(RenderService)
+			self.html_render_service = msg.content.isp.get_service(HtmlRenderService)
+			self.render_cache = msg.content.isp.get_service(RenderCache)
 
 			self.logger.info(f"schedule loaded")
 			self.state = 'loaded'
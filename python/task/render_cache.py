@@ -0,0 +1,159 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+import hashlib
+import io
+import logging
+import os
+import threading
+from PIL import Image
+from PIL.PngImagePlugin import PngInfo
+
+# PNG text chunk holding the expiration of a disk entry
+EXPIRES_KEY = "expires"
+
+@dataclass(frozen=True, slots=True)
+class RenderValidity:
+	"""Declared by a data source: the render stays valid from now until the given time."""
+	now: datetime
+	until: datetime
+	@staticmethod
+	def until_local_midnight(now: datetime) -> "RenderValidity":
+		"""Valid for the rest of the day of now (in its timezone)."""
+		midnight = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+		return RenderValidity(now, midnight)
+	@staticmethod
+	def indefinite(now: datetime) -> "RenderValidity":
+		"""Valid until evicted; for entries whose key already changes with their inputs."""
+		return RenderValidity(now, datetime.max.replace(tzinfo=now.tzinfo))
+
+def render_key(html: str, css_contents: list[bytes], dimensions: tuple[int, int]) -> str:
+	"""
+	Cache key of one render.
+	The rendered HTML already reflects the template source (including base templates), the template parameters and the theme.
+	"""
+	digest = hashlib.sha256()
+	digest.update(f"{dimensions[0]}x{dimensions[1]}\0".encode("utf-8"))
+	digest.update(html.encode("utf-8"))
+	for css in css_contents:
+		digest.update(b"\0")
+		digest.update(css)
+	return digest.hexdigest()
+
+class RenderCache:
+	"""
+	Two-tier cache of rendered images: a bounded in-memory LRU in front of a folder with a size budget.
+	Entries are PNG bytes and expire at the time declared by the RenderValidity they were stored with.
+	Thread-safe.
+	"""
+	def __init__(self, folder: str|None, memory_items: int = 16, disk_bytes: int = 32 * 1024 * 1024):
+		self.folder = folder
+		self.memory_items = memory_items
+		self.disk_bytes = disk_bytes
+		self._memory: OrderedDict[str, tuple[bytes, datetime]] = OrderedDict()
+		self._lock = threading.Lock()
+		self.hits = 0
+		self.misses = 0
+		self.logger = logging.getLogger(__name__)
+	def _path(self, key: str) -> str:
+		if self.folder is None:
+			raise ValueError("folder is None")
+		return os.path.join(self.folder, f"{key}.png")
+	def get(self, key: str, now: datetime) -> Image.Image|None:
+		with self._lock:
+			entry = self._memory.get(key, None)
+			if entry is not None and entry[1] <= now:
+				del self._memory[key]
+				entry = None
+			if entry is not None:
+				self._memory.move_to_end(key)
+				self.hits += 1
+		if entry is not None:
+			return self._decode(entry[0])
+		data = self._get_disk(key, now)
+		with self._lock:
+			if data is None:
+				self.misses += 1
+				return None
+			self.hits += 1
+			self._remember(key, data[0], data[1])
+		return self._decode(data[0])
+	def put(self, key: str, img: Image.Image, validity: RenderValidity) -> None:
+		if validity.until <= validity.now:
+			return
+		info = PngInfo()
+		info.add_text(EXPIRES_KEY, validity.until.isoformat())
+		buffer = io.BytesIO()
+		img.save(buffer, "PNG", pnginfo=info)
+		data = buffer.getvalue()
+		with self._lock:
+			self._remember(key, data, validity.until)
+		self._put_disk(key, data)
+	def clear(self) -> None:
+		with self._lock:
+			self._memory.clear()
+		if self.folder is not None and os.path.isdir(self.folder):
+			for entry in os.scandir(self.folder):
+				if entry.name.endswith(".png"):
+					os.remove(entry.path)
+	def _decode(self, data: bytes) -> Image.Image:
+		with Image.open(io.BytesIO(data)) as img:
+			img.load()
+			return img.copy()
+	def _remember(self, key: str, data: bytes, expires: datetime) -> None:
+		self._memory[key] = (data, expires)
+		self._memory.move_to_end(key)
+		while len(self._memory) > self.memory_items:
+			self._memory.popitem(last=False)
+	def _get_disk(self, key: str, now: datetime) -> tuple[bytes, datetime]|None:
+		if self.folder is None:
+			return None
+		path = self._path(key)
+		try:
+			with open(path, "rb") as png_file:
+				data = png_file.read()
+			with Image.open(io.BytesIO(data)) as img:
+				expires = datetime.fromisoformat(getattr(img, "text", {})[EXPIRES_KEY])
+			if expires <= now:
+				os.remove(path)
+				return None
+			# mtime is the LRU order of the disk tier
+			os.utime(path)
+			return (data, expires)
+		except FileNotFoundError:
+			return None
+		except Exception as e:
+			self.logger.warning(f"Discarding cache entry {key}: {e}")
+			try:
+				os.remove(path)
+			except OSError:
+				pass
+			return None
+	def _put_disk(self, key: str, data: bytes) -> None:
+		if self.folder is None:
+			return
+		try:
+			# the folder may be removed by a storage reset
+			os.makedirs(self.folder, exist_ok=True)
+			path = self._path(key)
+			temp_path = f"{path}.tmp"
+			with open(temp_path, "wb") as png_file:
+				png_file.write(data)
+			os.replace(temp_path, path)
+			self._evict_disk()
+		except Exception as e:
+			self.logger.warning(f"Failed to store cache entry {key}: {e}")
+	def _evict_disk(self) -> None:
+		"""Delete least recently used entries until the folder is within its budget."""
+		if self.folder is None:
+			return
+		entries = [(entry.stat().st_mtime, entry.stat().st_size, entry.path) for entry in os.scandir(self.folder) if entry.name.endswith(".png")]
+		total = sum(size for _, size, _ in entries)
+		for _, size, path in sorted(entries):
+			if total <= self.disk_bytes:
+				break
+			try:
+				os.remove(path)
+			except FileNotFoundError:
+				pass
+			total -= size
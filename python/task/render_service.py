@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable
+from PIL import Image
+
+from .protocols import IRequireShutdown
+
+# modes whose raw bytes round-trip through shared memory without extra information (e.g. a palette)
+SHAREABLE_MODES = ("L", "RGB", "RGBA")
+
+type RenderFunction = Callable[..., Image.Image]
+
+@dataclass(frozen=True, slots=True)
+class SharedImage:
+	"""
+	Picklable descriptor of an image whose pixels live in a shared memory block.
+	Only the descriptor crosses the process boundary; the pixels are not pickled.
+	"""
+	name: str
+	mode: str
+	size: tuple[int, int]
+	@staticmethod
+	def create(img: Image.Image, track: bool = True) -> tuple[SharedMemory, "SharedImage"]:
+		"""
+		Copy the pixels into a new shared memory block.
+		The caller owns the block and MUST close (and unlink) it.
+		"""
+		if img.mode not in SHAREABLE_MODES:
+			img = img.convert("RGBA" if img.has_transparency_data else "RGB")
+		data = img.tobytes()
+		shm = SharedMemory(create=True, size=max(len(data), 1), track=track)
+		shm.buf[:len(data)] = data
+		return (shm, SharedImage(shm.name, img.mode, img.size))
+	def load(self) -> Image.Image:
+		"""Attach to the block and copy the pixels into a process-local image."""
+		shm = SharedMemory(name=self.name, track=False)
+		try:
+			view = Image.frombuffer(self.mode, self.size, shm.buf, "raw", self.mode, 0, 1)
+			img = view.copy()
+			del view
+			return img
+		finally:
+			shm.close()
+	def release(self) -> None:
+		"""Remove a block created by another process."""
+		shm = SharedMemory(name=self.name, track=False)
+		shm.close()
+		shm.unlink()
+
+def _run_job(fn: RenderFunction, source: SharedImage|None, args: tuple, kwargs: dict) -> SharedImage:
+	"""Worker side: load the input, run the job, and hand the output back through shared memory."""
+	if source is not None:
+		result = fn(source.load(), *args, **kwargs)
+	else:
+		result = fn(*args, **kwargs)
+	# the parent unlinks the output block after it loads it
+	shm, shared = SharedImage.create(result, track=False)
+	shm.close()
+	return shared
+
+class RenderService(IRequireShutdown):
+	"""
+	Process pool for CPU-heavy image work (resampling, enhancement, NumPy rendering).
+	Jobs run outside this process, so they do not compete for the GIL with the web server and the event loops.
+
+	A job is a picklable module-level function plus picklable arguments.
+	If an input image is given, it is passed as the first argument; images travel through shared memory.
+	The function MUST return a PIL image.
+	"""
+	def __init__(self, max_workers: int|None = None, start_method: str = "spawn"):
+		workers = max_workers if max_workers is not None else max(1, min(4, (os.cpu_count() or 1) - 1))
+		# spawn: forking a process that already runs threads is unsafe
+		self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(start_method))
+		self._shutdown = False
+		self.max_workers = workers
+		self.logger = logging.getLogger(__name__)
+	def submit(self, fn: RenderFunction, img: Image.Image|None, *args: Any, **kwargs: Any) -> Future[Image.Image]:
+		"""Submit a job from any thread. The future completes with a process-local image."""
+		if self._shutdown:
+			raise RuntimeError("RenderService has been shutdown")
+		shm: SharedMemory|None = None
+		source: SharedImage|None = None
+		if img is not None:
+			shm, source = SharedImage.create(img)
+		result: Future[Image.Image] = Future()
+		try:
+			job = self._executor.submit(_run_job, fn, source, args, kwargs)
+		except Exception:
+			if shm is not None:
+				shm.close()
+				shm.unlink()
+			raise
+		def _job_done(fx: Future[SharedImage]):
+			if shm is not None:
+				shm.close()
+				shm.unlink()
+			try:
+				if fx.cancelled():
+					result.cancel()
+					return
+				shared = fx.result()
+				try:
+					image = shared.load()
+				finally:
+					shared.release()
+				result.set_result(image)
+			except Exception as e:
+				if not result.done():
+					result.set_exception(e)
+		job.add_done_callback(_job_done)
+		return result
+	async def run_async(self, fn: RenderFunction, img: Image.Image|None, *args: Any, **kwargs: Any) -> Image.Image:
+		"""Run a job from a coroutine without blocking the event loop."""
+		return await asyncio.wrap_future(self.submit(fn, img, *args, **kwargs))
+	def shutdown(self) -> None:
+		if self._shutdown:
+			return
+		self._shutdown = True
+		self.logger.info("[Shutdown] Start.")
+		self._executor.shutdown(wait=True, cancel_futures=True)
+		self.logger.info("[Shutdown] Complete.")
@@ -0,0 +1,221 @@
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+import logging
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Iterator, Literal
+import httpx
+
+# worth another attempt; other statuses are the answer
+RETRY_STATUS = frozenset([408, 425, 429, 500, 502, 503, 504])
+
+type BreakerState = Literal["closed", "open", "half-open"]
+
+class CircuitOpenError(RuntimeError):
+	"""The host failed repeatedly; requests fail fast until the breaker lets a probe through."""
+	def __init__(self, host: str, retry_in: float):
+		super().__init__(f"Circuit open for {host}, retry in {retry_in:.1f}s")
+		self.host = host
+		self.retry_in = retry_in
+
+class DeadlineExceeded(TimeoutError):
+	"""The schedule slot the request belongs to is over."""
+	pass
+
+# loop time by which the current work must finish; see deadline()
+deadline_var: ContextVar[float|None] = ContextVar("deadline", default=None)
+
+@contextmanager
+def deadline(seconds: float) -> Iterator[float]:
+	"""Bound the requests made inside (this task and the tasks it creates) to the next seconds; nested deadlines only shorten it."""
+	until = asyncio.get_running_loop().time() + seconds
+	current = deadline_var.get()
+	if current is not None:
+		until = min(until, current)
+	token = deadline_var.set(until)
+	try:
+		yield until
+	finally:
+		deadline_var.reset(token)
+
+def remaining_time() -> float|None:
+	"""Seconds left before the deadline; None without one."""
+	until = deadline_var.get()
+	return None if until is None else until - asyncio.get_running_loop().time()
+
+def is_transient(e: BaseException) -> bool:
+	"""Network failures and statuses that may succeed on another attempt."""
+	if isinstance(e, httpx.HTTPStatusError):
+		return e.response.status_code in RETRY_STATUS
+	return isinstance(e, (httpx.TransportError, asyncio.TimeoutError)) and not isinstance(e, DeadlineExceeded)
+
+def _retry_after(e: BaseException) -> float|None:
+	if isinstance(e, httpx.HTTPStatusError):
+		try:
+			return max(0.0, float(e.response.headers.get("retry-after", "")))
+		except ValueError:
+			return None
+	return None
+
+@dataclass(frozen=True, slots=True)
+class RetryPolicy:
+	"""Exponential backoff with full jitter: attempt n waits a random time up to min(max_delay, base_delay * multiplier**n)."""
+	attempts: int = 3
+	base_delay: float = 0.5
+	multiplier: float = 2.0
+	max_delay: float = 8.0
+	def delay(self, attempt: int, rng: random.Random) -> float:
+		return rng.uniform(0, min(self.max_delay, self.base_delay * self.multiplier ** attempt))
+
+class CircuitBreaker:
+	"""
+	Per-host breaker: opens after threshold consecutive failures, and after reset_seconds lets one probe through (half-open).
+	A successful probe closes it; a failed one opens it again.
+	"""
+	def __init__(self, host: str, threshold: int = 5, reset_seconds: float = 30.0, clock: Callable[[], float] = time.monotonic):
+		self.host = host
+		self.threshold = threshold
+		self.reset_seconds = reset_seconds
+		self.clock = clock
+		self.failures = 0
+		self.opened_at = 0.0
+		self._state: BreakerState = "closed"
+		self._probing = False
+		self._lock = threading.Lock()
+	@property
+	def state(self) -> BreakerState:
+		with self._lock:
+			if self._state == "open" and self.clock() - self.opened_at >= self.reset_seconds:
+				self._state = "half-open"
+			return self._state
+	def acquire(self) -> None:
+		"""Raise CircuitOpenError unless a request may go out now."""
+		state = self.state
+		with self._lock:
+			if state == "closed":
+				return
+			if state == "half-open" and not self._probing:
+				self._probing = True
+				return
+			retry_in = max(0.0, self.reset_seconds - (self.clock() - self.opened_at))
+		raise CircuitOpenError(self.host, retry_in)
+	def success(self) -> None:
+		with self._lock:
+			self.failures = 0
+			self._state = "closed"
+			self._probing = False
+	def failure(self) -> None:
+		with self._lock:
+			self.failures += 1
+			if self._state == "half-open" or self.failures >= self.threshold:
+				self._state = "open"
+				self.opened_at = self.clock()
+			self._probing = False
+	def release(self) -> None:
+		"""The request ended without telling anything about the host (e.g. cancelled)."""
+		with self._lock:
+			self._probing = False
+
+class Resilience:
+	"""
+	Retries, hedging and per-host circuit breakers for data source fetches; shared through resilience_var.
+	Requests end by the deadline of the current schedule slot (deadline()), if there is one.
+	"""
+	def __init__(self, policy: RetryPolicy|None = None, threshold: int = 5, reset_seconds: float = 30.0, clock: Callable[[], float] = time.monotonic, rng: random.Random|None = None):
+		self.policy = policy if policy is not None else RetryPolicy()
+		self.threshold = threshold
+		self.reset_seconds = reset_seconds
+		self.clock = clock
+		self.rng = rng if rng is not None else random.Random()
+		self._breakers: dict[str, CircuitBreaker] = {}
+		self._lock = threading.Lock()
+		self.logger = logging.getLogger(__name__)
+	def breaker(self, host: str) -> CircuitBreaker:
+		with self._lock:
+			breaker = self._breakers.get(host, None)
+			if breaker is None:
+				breaker = CircuitBreaker(host, self.threshold, self.reset_seconds, self.clock)
+				self._breakers[host] = breaker
+			return breaker
+	async def _attempt[T](self, breaker: CircuitBreaker, fetch: Callable[[], Awaitable[T]]) -> T:
+		breaker.acquire()
+		left = remaining_time()
+		if left is not None and left <= 0:
+			breaker.release()
+			raise DeadlineExceeded(f"Deadline passed before requesting {breaker.host}")
+		try:
+			if left is None:
+				result = await fetch()
+			else:
+				try:
+					async with asyncio.timeout(left):
+						result = await fetch()
+				except TimeoutError as e:
+					raise DeadlineExceeded(f"Deadline passed while requesting {breaker.host}") from e
+		except BaseException as e:
+			if is_transient(e):
+				breaker.failure()
+			else:
+				# an answer (e.g. 404), or cancelled
+				breaker.release()
+			raise
+		breaker.success()
+		return result
+	async def _hedged[T](self, breaker: CircuitBreaker, fetch: Callable[[], Awaitable[T]], hedge_after: float) -> T:
+		"""Start a second request when the first has not answered after hedge_after seconds; the first success wins."""
+		tasks = [asyncio.ensure_future(self._attempt(breaker, fetch))]
+		try:
+			done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+			if len(done) == 0 and breaker.state == "closed":
+				tasks.append(asyncio.ensure_future(self._attempt(breaker, fetch)))
+			error: BaseException|None = None
+			for next_done in asyncio.as_completed(tasks):
+				try:
+					return await next_done
+				except Exception as e:
+					error = e
+			assert error is not None
+			raise error
+		finally:
+			for task in tasks:
+				task.cancel()
+			await asyncio.gather(*tasks, return_exceptions=True)
+	async def run[T](self, url: str|httpx.URL, fetch: Callable[[], Awaitable[T]], hedge_after: float|None = None) -> T:
+		"""
+		Call fetch (a complete request) until it succeeds, retrying transient failures with backoff.
+		hedge_after: for latency-critical, idempotent requests, seconds after which a second request races the first.
+		"""
+		host = httpx.URL(url).host
+		breaker = self.breaker(host)
+		attempt = 0
+		while True:
+			try:
+				if hedge_after is not None:
+					return await self._hedged(breaker, fetch, hedge_after)
+				return await self._attempt(breaker, fetch)
+			except Exception as e:
+				attempt += 1
+				if not is_transient(e) or attempt >= self.policy.attempts:
+					raise
+				delay = self.policy.delay(attempt - 1, self.rng)
+				retry_after = _retry_after(e)
+				if retry_after is not None:
+					delay = max(delay, min(retry_after, self.policy.max_delay))
+				left = remaining_time()
+				if left is not None and delay >= left:
+					raise
+				self.logger.info(f"Retrying {url} in {delay:.2f}s ({attempt}/{self.policy.attempts - 1}): {e}")
+				await asyncio.sleep(delay)
+	async def get(self, client: httpx.AsyncClient, url: str, hedge_after: float|None = None, **kwargs: Any) -> httpx.Response:
+		"""GET that raises for error statuses, with the retry policy."""
+		async def _get() -> httpx.Response:
+			response = await client.get(url, **kwargs)
+			response.raise_for_status()
+			return response
+		return await self.run(url, _get, hedge_after)
+
+# the data sources' policy; the worker pool sets its own for the tasks it runs
+resilience_var: ContextVar[Resilience] = ContextVar("resilience", default=Resilience())
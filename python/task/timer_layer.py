@@ -12,6 +12,11 @@ from ..model.service_container import IServiceProvider, ServiceContainer
 from ..model.time_of_day import SystemTimeOfDay, TimeOfDay
 from ..plugins.plugin_base import PluginAsync, PluginExecutionContext
 from ..task.async_http_worker_pool import AsyncHttpWorkerPool
+from ..task.html_render_service import HtmlRenderService
+from ..task.http_cache import HttpCache
+from ..task.http_transport import HttpPoolSettings
+from ..task.render_cache import RenderCache
+from ..task.render_service import RenderService
 from ..task.basic_task import DispatcherTask
 from ..task.display_messages import DisplaySettings
 from ..task.messages import AsyncTaskCompleted, AsyncTaskCompleted, BasicMessage, QuitMessage, Telemetry
@@ -52,6 +57,9 @@ class TimerLayer(DispatcherTask):
 		self.timer: IProvideTimer|None = None
 		self.dimensions:tuple[int,int] = (800,480)
 		self.task_pool: AsyncHttpWorkerPool|None = None
+		self.render_service: RenderService|None = None
+		self.html_render_service: HtmlRenderService|None = None
+		self.render_cache: RenderCache|None = None
 		self.layer_task: tuple[Future, threading.Event] | None = None
 		self.shutdownlist: list[IRequireShutdown] = []
 		self.timebase: TimeOfDay|None = None
@@ -99,6 +107,12 @@ class TimerLayer(DispatcherTask):
 		root.add_service(IProvideTimer, self.timer)
 		root.add_service(TimeOfDay, self.timebase)
 		root.add_service(MessageSink, self)
+		if self.render_service is not None:
+			root.add_service(RenderService, self.render_service)
+		if self.html_render_service is not None:
+			root.add_service(HtmlRenderService, self.html_render_service)
+		if self.render_cache is not None:
+			root.add_service(RenderCache, self.render_cache)
 		return root
 	def _configure_event(self, msg: ConfigureEvent):
 		self.cm = msg.content.cm
@@ -132,10 +146,18 @@ class TimerLayer(DispatcherTask):
 				self.shutdownlist.append(self.datasources)
 
 			ahwp = msg.content.isp.get_service(AsyncHttpWorkerPool)
-			self.task_pool = ahwp if ahwp is not None else AsyncHttpWorkerPool()
-			if ahwp is None and isinstance(self.task_pool, IRequireShutdown):
+			if ahwp is None:
+				_, system_settings = self.cm.settings_manager().open("system").get()
+				self.task_pool = AsyncHttpWorkerPool(msg.content.isp.get_service(HttpCache), HttpPoolSettings.from_settings(system_settings))
 				self.shutdownlist.append(self.task_pool)
 				self.task_pool.start()
+			else:
+				self.task_pool = ahwp
+
+			# optional; plugins and datasources render in-process without it
+			self.render_service = msg.content.isp.get_service(RenderService)
+			self.html_render_service = msg.content.isp.get_service(HtmlRenderService)
+			self.render_cache = msg.content.isp.get_service(RenderCache)
 
 			self.logger.info(f"schedule loaded")
 			self.state = 'loaded'
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Stand-in for chromium-headless-shell in tests; standard library only.
+One-shot: screenshots the page given on the command line to --screenshot (/dev/stdout or a file).
+With --remote-debugging-pipe: answers the DevTools commands used by the renderer on fd 3/4.
+Pages are solid images of the window size; the stub fails if the page file does not exist.
+"""
+import base64
+import json
+import os
+import struct
+import sys
+import zlib
+from urllib.parse import unquote, urlparse
+
+def png(size: tuple[int, int], color=(1, 2, 3)) -> bytes:
+	def chunk(kind: bytes, data: bytes) -> bytes:
+		return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+	row = b"\0" + bytes(color) * size[0]
+	header = struct.pack(">IIBBBBB", size[0], size[1], 8, 2, 0, 0, 0)
+	return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(row * size[1])) + chunk(b"IEND", b"")
+
+def page_path(url: str) -> str:
+	return unquote(urlparse(url).path) if url.startswith("file:") else url
+
+def one_shot(args: list[str]) -> int:
+	options = dict(arg[2:].split("=", 1) for arg in args if arg.startswith("--") and "=" in arg)
+	pages = [arg for arg in args if not arg.startswith("--")]
+	# noisy, like the real browser
+	sys.stderr.write("stub: starting\n" * 2000)
+	if not pages or not os.path.exists(page_path(pages[0])):
+		sys.stderr.write(f"stub: page not found {pages}\n")
+		return 1
+	width, height = (int(value) for value in options.get("window-size", "800,600").split(","))
+	with open(options["screenshot"], "wb") as output:
+		output.write(png((width, height)))
+	return 0
+
+def devtools() -> int:
+	commands = os.fdopen(3, "rb", buffering=0)
+	responses = os.fdopen(4, "wb", buffering=0)
+	def send(message: dict) -> None:
+		responses.write(json.dumps(message).encode("utf-8") + b"\0")
+	buffer = b""
+	size = (800, 600)
+	while True:
+		while b"\0" not in buffer:
+			data = commands.read(65536)
+			if not data:
+				return 0
+			buffer += data
+		raw, buffer = buffer.split(b"\0", 1)
+		message = json.loads(raw)
+		id, method, params, session = message["id"], message["method"], message.get("params", {}), message.get("sessionId")
+		result: dict = {}
+		if method == "Target.createTarget":
+			result = { "targetId": "target" }
+		elif method == "Target.attachToTarget":
+			result = { "sessionId": "session" }
+		elif method == "Emulation.setDeviceMetricsOverride":
+			size = (params["width"], params["height"])
+		elif method == "Page.navigate":
+			if not os.path.exists(page_path(params["url"])):
+				send({ "id": id, "error": { "message": "page not found" }, "sessionId": session })
+				continue
+			send({ "method": "Page.frameStartedLoading", "params": {}, "sessionId": session })
+			send({ "id": id, "result": { "frameId": "frame" }, "sessionId": session })
+			send({ "method": "Page.loadEventFired", "params": {}, "sessionId": session })
+			continue
+		elif method == "Page.captureScreenshot":
+			result = { "data": base64.b64encode(png(size)).decode("ascii") }
+		elif method == "Browser.close":
+			send({ "id": id, "result": {} })
+			return 0
+		response = { "id": id, "result": result }
+		if session is not None:
+			response["sessionId"] = session
+		send(response)
+
+if __name__ == "__main__":
+	sys.exit(devtools() if "--remote-debugging-pipe" in sys.argv else one_shot(sys.argv[1:]))
@@ -0,0 +1,256 @@
+import asyncio
+from datetime import datetime, timedelta
+import time
+import unittest
+import numpy as np
+from PIL import Image, ImageDraw
+
+from ..datasources.clock.clock import Clock, ClockAsync, WordClockFace
+from ..datasources.data_source import DataSourceExecutionContext
+from ..model.configuration_manager import ConfigurationManager, StaticConfigurationManager
+from ..model.service_container import ServiceContainer
+from ..model.time_of_day import TimeOfDay
+from ..task.message_router import MessageRouter, Route
+from ..task.messages import Telemetry
+from .utils import ConstantTimeOfDay, MessageCollectSink, benchmark_enabled, save_benchmark_report
+
+NOW = datetime(2025, 3, 14, 15, 9, 26)
+
+def reference_gradient_image(w, h, start_angle, end_angle, start_color, end_color) -> Image.Image:
+	"""The original float64, per-channel gradient."""
+	x,y = np.ogrid[:h,:w]
+	cx,cy = h/2, w/2
+	start_angle = -start_angle
+	end_angle = -end_angle
+	theta = (np.arctan2(x-cx,y-cy) - start_angle) % (2*np.pi)
+	angle_range = ((end_angle-start_angle) % (2 * np.pi))
+	if angle_range == 0:
+		angle_range = 2*np.pi
+	anglemask = theta <= angle_range
+	theta = theta / angle_range
+	gradient = np.zeros((h, w, 4), dtype=np.uint8)
+	start_color = Clock.pad_color(start_color)
+	end_color = Clock.pad_color(end_color)
+	for c in range(4):
+		gradient[..., c] = (start_color[c] * (1 - theta) + end_color[c] * (theta)).astype(np.uint8)
+	gradient[~anglemask] = (0, 0, 0, 0)
+	return Image.fromarray(gradient, mode="RGBA")
+
+def reference_gradient_face(w, h, hour_angle, minute_angle, start_color, end_color) -> Image.Image:
+	image_hour = reference_gradient_image(w, h, hour_angle, minute_angle, start_color, end_color)
+	image_minute = reference_gradient_image(w, h, minute_angle, hour_angle, start_color, end_color)
+	return Image.alpha_composite(image_hour, image_minute)
+
+def reference_word_clock(dimensions, time, stm, primary_color=(0,0,0), secondary_color=(255,255,255)) -> Image.Image:
+	"""The original Word Clock, drawing the whole grid."""
+	w,h = dimensions
+	bg = Image.new("RGBA", dimensions, primary_color+(255,))
+	fnt = stm.get_font("Napoli", Clock.word_font_size(dimensions))
+	canvas = Image.new("RGBA", dimensions, (0, 0, 0, 0))
+	image_draw = ImageDraw.Draw(canvas)
+
+	border = [40, 40]
+	if w > h:
+		border[0] += (w-h)/2
+	elif h > w:
+		border[1] += (h-w)/2
+
+	letter_positions = Clock.translate_word_grid_positions(time.hour % 12, time.minute)
+	letter_grid = [
+		['I','T','L','I','S','A','S','A','M','P','M'],
+		['A','C','Q','U','A','R','T','E','R','D','C'],
+		['T','W','E','N','T','Y','F','I','V','E','X'],
+		['H','A','L','F','S','T','E','N','F','T','O'],
+		['P','A','S','T','E','R','U','N','I','N','E'],
+		['O','N','E','S','I','X','T','H','R','E','E'],
+		['F','O','U','R','F','I','V','E','T','W','O'],
+		['E','I','G','H','T','E','L','E','V','E','N'],
+		['S','E','V','E','N','T','W','E','L','V','E'],
+		['T','E','N','S','E','O','C','L','O','C','K'],
+	]
+
+	canvas_size = min(w,h) - min(border)*2
+	for y, row in enumerate(letter_grid):
+		for x, letter in enumerate(row):
+			x_pos = x*(canvas_size/(len(row)-1)) + border[0]
+			y_pos = y*(canvas_size/(len(letter_grid)-1)) + border[1]
+
+			fill=secondary_color+(50,)
+			if [y,x] in letter_positions:
+				fill=secondary_color+(255,)
+				image_draw.text((x_pos+2, y_pos+2), letter, anchor="mm", fill=secondary_color+(80,), font=fnt)
+			image_draw.text((x_pos, y_pos), letter, anchor="mm", fill=fill, font=fnt)
+
+	combined = Image.alpha_composite(bg, canvas)
+	return combined
+
+def reference_divided_clock(dimensions, time, primary_color=(32,183,174), secondary_color=(255,255,255)) -> Image.Image:
+	"""The original Divided Clock, drawing every layer."""
+	w,h = dimensions
+	bg = Image.new("RGBA", dimensions, primary_color+(255,))
+	bg_draw = ImageDraw.Draw(bg)
+
+	# used to calculate percentages of sizes
+	dim = min(w,h)
+
+	corners = [(0, h/2), (w,h)]
+	bg_draw.rectangle(corners, fill=secondary_color +(255,))
+
+	canvas = Image.new("RGBA", dimensions, (0, 0, 0, 0))
+	image_draw = ImageDraw.Draw(canvas)
+
+	shadow_offset = max(int(dim * 0.0075), 1)
+	face_size = int(dim * 0.45)
+
+	# clock shadow
+	image_draw.circle((w/2,h/2 + shadow_offset), face_size+2, fill=(0,0,0,50))
+
+	# clock outline
+	image_draw.circle((w/2,h/2), face_size, fill=primary_color, outline=secondary_color, width=int(dim * 0.03125))
+	Clock.draw_hour_marks(image_draw._image, face_size - int(w*0.04375))
+
+	hour_angle, minute_angle = Clock.calculate_clock_angles(time)
+	hand_width = max(int(dim * 0.009), 1)
+	Clock.draw_clock_hand(image_draw._image, int(dim*0.3), minute_angle, secondary_color, hand_width=hand_width, border_color=secondary_color, round_corners=False)
+	Clock.draw_clock_hand(image_draw._image, int(dim*0.2), hour_angle, secondary_color, hand_width=hand_width, border_color=secondary_color, round_corners=False)
+
+	Clock.drew_clock_center(image_draw._image, max(int(dim*0.014), 1), primary_color, secondary_color, width=max(int(dim* 0.007), 1))
+
+	combined = Image.alpha_composite(bg, canvas)
+	return combined
+
+class TestGradientClock(unittest.TestCase):
+	def assertClose(self, actual: Image.Image, expected: Image.Image):
+		self.assertEqual(actual.size, expected.size)
+		diff = np.abs(np.asarray(actual, dtype=np.int16) - np.asarray(expected, dtype=np.int16)).max(axis=2)
+		# float32 rounding; only pixels on the gradient edges may flip
+		self.assertLessEqual(float(np.mean(diff > 1)), 0.001)
+	def test_matches_composited_gradients(self):
+		for dimensions in [(800, 480), (480, 800), (201, 117)]:
+			for when in [NOW, datetime(2025, 3, 14, 12, 0), datetime(2025, 3, 14, 6, 30)]:
+				hour_angle, minute_angle = Clock.calculate_clock_angles(when)
+				with self.subTest(dimensions=dimensions, when=when):
+					self.assertClose(
+						Clock.draw_gradient_face(*dimensions, hour_angle, minute_angle, (0, 0, 0), (219, 50, 70)),
+						reference_gradient_face(*dimensions, hour_angle, minute_angle, (0, 0, 0), (219, 50, 70))
+					)
+	def test_translucent_colors(self):
+		hour_angle, minute_angle = Clock.calculate_clock_angles(NOW)
+		self.assertClose(
+			Clock.draw_gradient_face(320, 200, hour_angle, minute_angle, (0, 0, 0, 40), (219, 50, 70, 200)),
+			reference_gradient_face(320, 200, hour_angle, minute_angle, (0, 0, 0, 40), (219, 50, 70, 200))
+		)
+	def test_gradient_image(self):
+		hour_angle, minute_angle = Clock.calculate_clock_angles(NOW)
+		self.assertClose(
+			Clock.draw_gradient_image(320, 200, hour_angle, minute_angle, (0, 0, 0), (219, 50, 70)),
+			reference_gradient_image(320, 200, hour_angle, minute_angle, (0, 0, 0), (219, 50, 70))
+		)
+
+class TestLayeredClocks(unittest.TestCase):
+	def assertSame(self, actual: Image.Image, expected: Image.Image):
+		self.assertEqual(actual.size, expected.size)
+		diff = np.abs(np.asarray(actual, dtype=np.int16) - np.asarray(expected, dtype=np.int16))
+		self.assertEqual(int(diff.max()), 0)
+	def test_word_clock(self):
+		stm = ConfigurationManager().static_manager()
+		for dimensions in [(800, 480), (480, 800), (1600, 1200)]:
+			for minute in range(0, 60, 7):
+				when = NOW.replace(minute=minute)
+				with self.subTest(dimensions=dimensions, when=when):
+					self.assertSame(
+						Clock.draw_word_clock(dimensions, when, stm, (0, 0, 0), (255, 255, 255)),
+						reference_word_clock(dimensions, when, stm, (0, 0, 0), (255, 255, 255))
+					)
+	def test_word_clock_does_not_fit(self):
+		stm = ConfigurationManager().static_manager()
+		# the fixed border leaves cells smaller than the glyphs
+		self.assertFalse(WordClockFace((200, 120), stm.get_font("Napoli", Clock.word_font_size((200, 120))), (0, 0, 0), (255, 255, 255)).tiled)
+		self.assertSame(Clock.draw_word_clock((200, 120), NOW, stm), reference_word_clock((200, 120), NOW, stm))
+	def test_divided_clock(self):
+		for dimensions in [(800, 480), (480, 800)]:
+			for minute in range(0, 60, 7):
+				when = NOW.replace(minute=minute)
+				with self.subTest(dimensions=dimensions, when=when):
+					self.assertSame(Clock.draw_divided_clock(dimensions, when), reference_divided_clock(dimensions, when))
+	def test_layers_are_not_modified(self):
+		first = Clock.draw_divided_clock((800, 480), NOW)
+		Clock.draw_divided_clock((800, 480), NOW.replace(hour=3))
+		self.assertSame(Clock.draw_divided_clock((800, 480), NOW), first)
+
+class TestClockPreRender(unittest.TestCase):
+	def test_next_minute_is_prerendered(self):
+		stm = ConfigurationManager().static_manager()
+		router = MessageRouter()
+		sink = MessageCollectSink()
+		router.addRoute(Route("telemetry", [sink]))
+		params = { "clockFace": "Word Clock", "primaryColor": "#000000", "secondaryColor": "#ffffff", "preRender": True }
+		def _dsec(when: datetime, dimensions=(800, 480)) -> DataSourceExecutionContext:
+			root = ServiceContainer()
+			root.add_service(StaticConfigurationManager, stm)
+			root.add_service(MessageRouter, router)
+			root.add_service(TimeOfDay, ConstantTimeOfDay(when + timedelta(milliseconds=250)))
+			return DataSourceExecutionContext(root, dimensions, when)
+		async def _run():
+			ds = ClockAsync("clock", "clock")
+			state = await ds.open_async(_dsec(NOW), params)
+			results = []
+			for minute, dimensions in [(0, (800, 480)), (1, (800, 480)), (2, (800, 480)), (3, (480, 800))]:
+				when = NOW.replace(minute=minute, second=0)
+				mrr = await ds.render_async(_dsec(when, dimensions), params, state)
+				results.append(mrr)
+			state = await ds.open_async(_dsec(NOW), params | { "primaryColor": "#202020" })
+			await ds.render_async(_dsec(NOW.replace(minute=5, second=0), (480, 800)), params, state)
+			return results
+		results = asyncio.run(_run())
+		telemetry = [msg.values for msg in sink.messages if isinstance(msg, Telemetry) and msg.name == "clock"]
+		# dimensions and colors changes invalidate the buffer
+		self.assertEqual([tx["prerendered"] for tx in telemetry], [False, True, True, False, False])
+		self.assertTrue(all(tx["skew_s"] == 0.25 for tx in telemetry))
+		image = results[1].image if results[1] is not None else None
+		self.assertIsNotNone(image)
+		if image is not None:
+			self.assertEqual(image.tobytes(), Clock.draw_word_clock((800, 480), NOW.replace(minute=1, second=0), stm, (0, 0, 0), (255, 255, 255)).tobytes())
+
+@unittest.skipUnless(benchmark_enabled(), "benchmarks are disabled")
+class ClockBenchmark(unittest.TestCase):
+	def test_gradient_clock(self):
+		rounds = 10
+		def _fps(draw, dimensions) -> float:
+			hour_angle, minute_angle = Clock.calculate_clock_angles(NOW)
+			started = time.perf_counter()
+			for _ in range(rounds):
+				draw(*dimensions, hour_angle, minute_angle, (0, 0, 0), (219, 50, 70))
+			return round(rounds / (time.perf_counter() - started), 2)
+		report: dict = { "rounds": rounds }
+		for dimensions in [(800, 480), (1600, 1200)]:
+			report[f"{dimensions[0]}x{dimensions[1]}"] = {
+				"composited_fps": _fps(reference_gradient_face, dimensions),
+				"single_pass_fps": _fps(Clock.draw_gradient_face, dimensions),
+			}
+		save_benchmark_report("gradient_clock", report)
+	def test_layered_clocks(self):
+		stm = ConfigurationManager().static_manager()
+		dimensions = (800, 480)
+		rounds = 20
+		def _ms(draw) -> float:
+			started = time.perf_counter()
+			for minute in range(rounds):
+				draw(NOW.replace(minute=minute))
+			return round((time.perf_counter() - started) * 1000 / rounds, 3)
+		report = {
+			"dimensions": dimensions,
+			"rounds": rounds,
+			"word": {
+				"full_ms": _ms(lambda when: reference_word_clock(dimensions, when, stm)),
+				"layered_ms": _ms(lambda when: Clock.draw_word_clock(dimensions, when, stm)),
+			},
+			"divided": {
+				"full_ms": _ms(lambda when: reference_divided_clock(dimensions, when)),
+				"layered_ms": _ms(lambda when: Clock.draw_divided_clock(dimensions, when)),
+			},
+		}
+		save_benchmark_report("layered_clocks", report)
+
+if __name__ == "__main__":
+	unittest.main()
@@ -1,5 +1,7 @@
+from datetime import datetime
 import sys
 import threading
+import time
 from typing import Any
 import unittest
 import os
@@ -7,7 +9,10 @@ import tempfile
 from pathlib import Path
 
 from ..model.configuration_manager import ConfigurationManager
-from ..model.configuration_manager import ConfigurationObject
+from ..model.configuration_manager import CoalescingWriter, ConfigurationObject
+from ..model.configuration_manager import _load_font
+from ..datasources.clock.clock import Clock
+from .utils import benchmark_enabled, save_benchmark_report
 
 class TestConfigurationManager(unittest.TestCase):
 	@unittest.skipUnless(sys.platform == "win32", "This test is for Windows only")
@@ -294,5 +299,74 @@ class TestConfigurationObject(unittest.TestCase):
 				self.assertEqual(content2, {'a': 2})
 				self.assertEqual(hash2, new_hash)
 
+class TestCoalescingWriter(unittest.TestCase):
+	def test_updates_are_merged(self):
+		saved = []
+		store = {'content': {'other': 1}}
+		def saver(moniker: str, value: dict):
+			saved.append(value)
+			store['content'] = value
+		obj = ConfigurationObject('test', lambda moniker: store['content'], saver)
+		writer = CoalescingWriter(obj, delay=0.2)
+		for ix in range(5):
+			writer.update('position', ix)
+		writer.update('seed', 7)
+		self.assertEqual(saved, [])
+		deadline = time.monotonic() + 5
+		while len(saved) == 0 and time.monotonic() < deadline:
+			time.sleep(0.05)
+		self.assertEqual(saved, [{'other': 1, 'position': 4, 'seed': 7}])
+		writer.update('position', 5)
+		writer.flush()
+		self.assertEqual(len(saved), 2)
+		self.assertEqual(obj.get()[1], {'other': 1, 'position': 5, 'seed': 7})
+		# nothing pending
+		writer.flush()
+		time.sleep(0.3)
+		self.assertEqual(len(saved), 2)
+
+class TestStaticConfigurationManager(unittest.TestCase):
+	def test_font_is_cached(self):
+		cm = ConfigurationManager()
+		font = cm.static_manager().get_font("Jost", 24)
+		# static_manager() is a new instance per call; the cache is shared
+		self.assertIs(cm.static_manager().get_font("Jost", 24), font)
+		self.assertIsNot(cm.static_manager().get_font("Jost", 25), font)
+		self.assertIsNot(cm.static_manager().get_font("Jost", 24, "bold"), font)
+	def test_font_fallback(self):
+		stm = ConfigurationManager().static_manager()
+		self.assertIs(stm.get_font("Napoli", 30, "bold"), stm.get_font("Napoli", 30))
+		with self.assertRaises(ValueError):
+			stm.get_font("Missing", 30)
+	def test_preload(self):
+		stm = ConfigurationManager().static_manager()
+		_load_font.cache_clear()
+		stm.preload_fonts(Clock.font_sizes("Digital Clock", (800, 480)))
+		stm.get_font("DS-Digital", Clock.digital_font_size((800, 480)))
+		info = _load_font.cache_info()
+		self.assertEqual((info.misses, info.hits), (1, 1))
+
+@unittest.skipUnless(benchmark_enabled(), "benchmarks are disabled")
+class FontCacheBenchmark(unittest.TestCase):
+	def test_clock_renders_per_second(self):
+		cm = ConfigurationManager()
+		now = datetime(2025, 3, 14, 15, 9)
+		dimensions = (800, 480)
+		rounds = 20
+		def _per_second(draw, uncached: bool) -> float:
+			started = time.perf_counter()
+			for _ in range(rounds):
+				if uncached:
+					_load_font.cache_clear()
+				draw(dimensions, now, cm.static_manager())
+			return round(rounds / (time.perf_counter() - started), 2)
+		report = { "dimensions": dimensions, "rounds": rounds }
+		for name, draw in [("digital", Clock.draw_digital_clock), ("word", Clock.draw_word_clock)]:
+			report[name] = {
+				"uncached_per_second": _per_second(draw, True),
+				"cached_per_second": _per_second(draw, False),
+			}
+		save_benchmark_report("font_cache", report)
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
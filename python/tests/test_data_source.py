@@ -1,4 +1,5 @@
 from datetime import datetime
+import tempfile
 from typing import cast
 import unittest
 
@@ -14,7 +15,7 @@ from ..datasources.newspaper.newspaper import NewspaperAsync
 from ..model.configuration_manager import DatasourceConfigurationManager, SettingsConfigurationManager, StaticConfigurationManager
 from ..model.service_container import ServiceContainer
 from ..task.async_http_worker_pool import AsyncHttpWorkerPool
-from .utils import create_configuration_manager, save_image, test_output_path_for
+from .utils import create_configuration_manager, create_datasource_context, save_image, test_output_path_for
 
 def create_data_source_context(dsid:str, schedule_ts: datetime = datetime.now()) -> DataSourceExecutionContext:
 	cm = create_configuration_manager()
@@ -41,11 +42,11 @@ class TestAsyncDataSources(unittest.TestCase):
 		except Exception:
 			pass
 
-	async def run_datasource_async(self, ds, params, image_size, image_count):
+	async def run_datasource_async(self, ds, params, image_size, image_count, dsec: DataSourceExecutionContext|None = None):
 		self.assertIsInstance(ds, MediaListAsync)
 		self.assertIsInstance(ds, MediaRenderAsync)
 		folder = test_output_path_for(f"ds-{ds.id}-async")
-		dsec = create_data_source_context(ds.id)
+		dsec = dsec if dsec is not None else create_data_source_context(ds.id)
 		state:list = await cast(MediaListAsync, ds).open_async(dsec, params)
 		self.assertTrue(len(state) > 0)
 		images = []
@@ -83,7 +84,12 @@ class TestAsyncDataSources(unittest.TestCase):
 		params = {
 			"folder": "python/tests/images"
 		}
-		self.pool.submit(self.run_datasource_async, ds, params, (800, 480), 9).result(timeout=60)
+		# the library index and frame cache go to a temporary storage root
+		with tempfile.TemporaryDirectory() as storage:
+			try:
+				self.pool.submit(self.run_datasource_async, ds, params, (800, 480), 9, create_datasource_context(storage, ds.id)).result(timeout=60)
+			finally:
+				ds.shutdown()
 	def test_comic_feed(self):
 		ds = ComicFeedAsync("comic-feed", "comic-feed")
 		params = {
@@ -0,0 +1,180 @@
+from datetime import datetime, timedelta
+import tempfile
+import time
+import unittest
+from PIL import Image
+
+from ..model.service_container import ServiceContainer
+from ..model.time_of_day import SystemTimeOfDay, TimeOfDay
+from ..task.configure_event import ConfigureEvent, ConfigureNotify, ConfigureOptions
+from ..task.display import Display
+from ..task.display_messages import ComputedImage, DisplayImage, ImageProvenance, PriorityImage
+from ..task.image_preparation import ImagePreparation, PreparationSettings, prepare_image
+from ..task.message_router import MessageRouter
+from ..task.messages import QuitMessage
+from .utils import MessageTriggerSink, PeakMemorySampler, benchmark_enabled, create_temporary_configuration_manager, save_benchmark_report
+
+def configure_display(display: Display, folder: str, timeout: float = 5.0) -> ConfigureNotify|None:
+	"""Configure the (started) display task with a mock driver writing into folder."""
+	cm = create_temporary_configuration_manager(folder)
+	display_cob = cm.settings_manager().open("display")
+	hash, settings = display_cob.get()
+	if settings is None:
+		raise ValueError("display settings not deployed")
+	settings["display_type"] = "mock"
+	settings["mock.outputFolder"] = folder
+	display_cob.save(hash, settings)
+	isp = ServiceContainer()
+	isp.add_service(TimeOfDay, SystemTimeOfDay())
+	sink = MessageTriggerSink(lambda msg: isinstance(msg, ConfigureNotify))
+	display.accept(ConfigureEvent(datetime.now(), ConfigureOptions(cm, isp), "display", sink))
+	sink.stopped.wait(timeout=timeout)
+	return sink.trigger_msg if isinstance(sink.trigger_msg, ConfigureNotify) else None
+
+class TestDisplayImagePreparation(unittest.TestCase):
+	def test_computed_image_does_not_retain_source(self):
+		source = Image.new("RGB", (1600, 1200), (10, 20, 30))
+		msg = DisplayImage(datetime.now(), "Large", source)
+		di = prepare_image(msg, PreparationSettings("landscape", (800, 480)))
+		self.assertIsInstance(di, ComputedImage)
+		self.assertEqual(di.img.size, (800, 480))
+		self.assertFalse(hasattr(di, "source"))
+		provenance = di.provenance if isinstance(di, ComputedImage) else None
+		self.assertIsInstance(provenance, ImageProvenance)
+		if provenance is not None:
+			self.assertEqual(provenance.title, "Large")
+			self.assertEqual(provenance.size, (1600, 1200))
+			self.assertEqual(provenance.mode, "RGB")
+			self.assertEqual(provenance, ImageProvenance.from_image("Large", source))
+	def test_display_sized_image_is_passed_through(self):
+		msg = PriorityImage(datetime.now(), "Exact", Image.new("RGB", (800, 480)), timedelta(minutes=1))
+		di = prepare_image(msg, PreparationSettings("landscape", (800, 480)))
+		self.assertIs(di, msg)
+	def test_portrait_and_enhancement(self):
+		msg = DisplayImage(datetime.now(), "Portrait", Image.new("RGB", (800, 480), (100, 100, 100)))
+		settings = PreparationSettings.from_display_settings({ "orientation": "portrait", "imageSettings-brightness": 2.0 }, (480, 800))
+		di = prepare_image(msg, settings)
+		self.assertEqual(di.img.size, (480, 800))
+		self.assertEqual(di.img.getpixel((10, 10)), (200, 200, 200))
+	def test_preparation_pool(self):
+		prep = ImagePreparation(max_workers=2)
+		try:
+			msg = DisplayImage(datetime.now(), "Pool", Image.new("RGB", (1600, 1200)))
+			di = prep.prepare(msg, PreparationSettings("landscape", (800, 480)))
+			self.assertEqual(di.img.size, (800, 480))
+		finally:
+			prep.shutdown()
+		with self.assertRaises(RuntimeError):
+			prep.prepare_async(msg, PreparationSettings("landscape", (800, 480)))
+	def test_provenance_digest_distinguishes_images(self):
+		red = ImageProvenance.from_image("x", Image.new("RGB", (640, 480), (255, 0, 0)))
+		blue = ImageProvenance.from_image("x", Image.new("RGB", (640, 480), (0, 0, 255)))
+		self.assertNotEqual(red.digest, blue.digest)
+
+def wait_for_background(display: Display, title: str, timeout: float = 10.0) -> bool:
+	"""Poll the compositor until the background layer has the given title."""
+	expires = time.monotonic() + timeout
+	while time.monotonic() < expires:
+		bg = display.compsitor._current_stack.background
+		if bg is not None and bg.title == title:
+			return True
+		time.sleep(0.01)
+	return False
+
+class TestDisplayPipeline(unittest.TestCase):
+	def test_latest_background_wins(self):
+		with tempfile.TemporaryDirectory() as folder:
+			display = Display("Display", MessageRouter())
+			display.start()
+			try:
+				notify = configure_display(display, folder)
+				self.assertIsNotNone(notify)
+				# the large image is still being prepared when the small one completes
+				display.accept(DisplayImage(datetime.now(), "First", Image.new("RGB", (4000, 3000), (255, 0, 0))))
+				display.accept(DisplayImage(datetime.now(), "Second", Image.new("RGB", (800, 480), (0, 0, 255))))
+				display.msg_queue.join()
+				self.assertTrue(wait_for_background(display, "Second"))
+				time.sleep(0.5)
+				bg = display.compsitor._current_stack.background
+				self.assertIsNotNone(bg)
+				if bg is not None:
+					self.assertEqual(bg.title, "Second")
+			finally:
+				display.accept(QuitMessage(datetime.now()))
+				display.join(timeout=10)
+
+@unittest.skipUnless(benchmark_enabled(), "benchmarks are disabled")
+class DisplayBenchmark(unittest.TestCase):
+	def test_memory_large_images(self):
+		count = 100
+		size = (4000, 3000)
+		with tempfile.TemporaryDirectory() as folder:
+			display = Display("Display", MessageRouter())
+			display.start()
+			notify = configure_display(display, folder)
+			self.assertIsNotNone(notify)
+			if notify is not None:
+				self.assertFalse(notify.error, f"configure failed: {notify.content}")
+			started = time.perf_counter()
+			with PeakMemorySampler() as sampler:
+				for ix in range(count):
+					img = Image.new("RGB", size, ((ix * 7) % 256, (ix * 13) % 256, (ix * 29) % 256))
+					display.accept(DisplayImage(datetime.now(), f"Large {ix}", img))
+					del img
+					# pace the producer on the prepared layer, so every image goes through the pipeline
+					self.assertTrue(wait_for_background(display, f"Large {ix}", timeout=30))
+			elapsed = time.perf_counter() - started
+			footprint = display.compsitor.current_footprint
+			display.accept(QuitMessage(datetime.now()))
+			display.join(timeout=10)
+		source_bytes = size[0] * size[1] * 3
+		report = {
+			"images": count,
+			"image_size": size,
+			"source_bytes": source_bytes,
+			"elapsed_s": round(elapsed, 3),
+			"rss_baseline": sampler.baseline,
+			"rss_peak": sampler.peak,
+			"rss_peak_delta": sampler.peak_delta,
+			"layer_footprint": footprint,
+		}
+		save_benchmark_report("display_memory", report)
+		# only the display-resolution buffer is held by the layers
+		self.assertLess(footprint, source_bytes)
+	def test_dispatcher_responsiveness(self):
+		count = 20
+		size = (4000, 3000)
+		images = [Image.new("RGB", size, ((ix * 11) % 256, 0, 0)) for ix in range(count)]
+		with tempfile.TemporaryDirectory() as folder:
+			display = Display("Display", MessageRouter())
+			display.start()
+			notify = configure_display(display, folder)
+			self.assertIsNotNone(notify)
+			started = time.perf_counter()
+			for ix, img in enumerate(images):
+				display.accept(DisplayImage(datetime.now(), f"Burst {ix}", img))
+			# the dispatcher is free again once its queue is drained
+			display.msg_queue.join()
+			drained = time.perf_counter() - started
+			# a message sent behind the burst is handled without waiting on the resizes
+			probe_started = time.perf_counter()
+			display.accept(DisplayImage(datetime.now(), "Probe", Image.new("RGB", (800, 480))))
+			display.msg_queue.join()
+			probe = time.perf_counter() - probe_started
+			ready = wait_for_background(display, "Probe", timeout=120)
+			completed = time.perf_counter() - started
+			display.accept(QuitMessage(datetime.now()))
+			display.join(timeout=10)
+		report = {
+			"images": count,
+			"image_size": size,
+			"dispatcher_drain_s": round(drained, 4),
+			"dispatch_per_image_ms": round(drained * 1000 / count, 3),
+			"probe_latency_ms": round(probe * 1000, 3),
+			"pipeline_complete_s": round(completed, 3),
+		}
+		save_benchmark_report("display_dispatcher_responsiveness", report)
+		self.assertTrue(ready)
+
+if __name__ == "__main__":
+	unittest.main()
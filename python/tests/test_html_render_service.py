@@ -0,0 +1,221 @@
+import io
+import os
+from pathlib import Path
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+import unittest
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from PIL import Image
+
+from ..plugins.plugin_base import RenderEnvironment, RenderSession
+from ..task.html_render_service import DevToolsPipeBackend, HtmlRenderService
+from ..utils.image_utils import OutputTail, chrome_headless_executable, html_document, render_chrome_headless_png, render_html_arglist, shared_render_folder
+from .utils import benchmark_enabled, create_temporary_configuration_manager, save_benchmark_report
+
+class FakeBackend:
+	"""Renders a solid image of the requested size; records what it was given."""
+	instances = 0
+	def __init__(self, fail: bool = False):
+		FakeBackend.instances += 1
+		self.fail = fail
+		self.closed = False
+		self.rendered: list[str] = []
+	def render(self, html_path: str, dimensions: tuple[int, int]) -> bytes:
+		with open(html_path, "r", encoding="utf-8") as html_file:
+			self.rendered.append(html_file.read())
+		if self.fail:
+			raise RuntimeError("renderer crashed")
+		buffer = io.BytesIO()
+		Image.new("RGB", dimensions, (1, 2, 3)).save(buffer, "PNG")
+		return buffer.getvalue()
+	def close(self) -> None:
+		self.closed = True
+
+class TestHtmlRenderService(unittest.TestCase):
+	def test_renderer_is_reused(self):
+		backends: list[FakeBackend] = []
+		service = HtmlRenderService(lambda: backends.append(FakeBackend()) or backends[-1])
+		try:
+			for ix in range(3):
+				img = service.render(f"<p>{ix}</p>", (320, 200))
+				self.assertIsNotNone(img)
+				if img is not None:
+					self.assertEqual(img.size, (320, 200))
+			self.assertEqual(len(backends), 1)
+			self.assertEqual(backends[0].rendered, ["<p>0</p>", "<p>1</p>", "<p>2</p>"])
+		finally:
+			service.shutdown()
+		self.assertTrue(backends[0].closed)
+		with self.assertRaises(RuntimeError):
+			service.render_png("<p></p>", (10, 10))
+	def test_failed_renderer_is_replaced(self):
+		backends: list[FakeBackend] = []
+		service = HtmlRenderService(lambda: backends.append(FakeBackend(fail=len(backends) == 0)) or backends[-1])
+		try:
+			self.assertIsNone(service.render("<p></p>", (10, 10)))
+			self.assertTrue(backends[0].closed)
+			self.assertIsNotNone(service.render("<p></p>", (10, 10)))
+			self.assertEqual(len(backends), 2)
+		finally:
+			service.shutdown()
+	def test_pool_size(self):
+		backends: list[FakeBackend] = []
+		lock = threading.Lock()
+		def _create():
+			with lock:
+				backends.append(FakeBackend())
+				return backends[-1]
+		service = HtmlRenderService(_create, pool_size=2)
+		try:
+			threads = [threading.Thread(target=service.render, args=("<p></p>", (10, 10))) for _ in range(6)]
+			for thread in threads:
+				thread.start()
+			for thread in threads:
+				thread.join()
+			self.assertLessEqual(len(backends), 2)
+		finally:
+			service.shutdown()
+	def test_render_session(self):
+		with tempfile.TemporaryDirectory() as folder:
+			cm = create_temporary_configuration_manager(folder)
+			backend = FakeBackend()
+			service = HtmlRenderService(lambda: backend)
+			try:
+				render_dir = os.path.join(os.path.dirname(__file__), "input")
+				rs = RenderSession(cm.static_manager(), render_dir, "headless.html", renderer=service)
+				img = rs.render((400, 300), { "title": "Session" })
+				self.assertIsNotNone(img)
+				if img is not None:
+					self.assertEqual(img.size, (400, 300))
+				self.assertIn("Session", backend.rendered[0])
+			finally:
+				service.shutdown()
+
+STUB_RENDERER = os.path.join(os.path.dirname(__file__), "input", "stub_chrome_headless.py")
+
+def shared_documents() -> set[str]:
+	return { fx for fx in os.listdir(shared_render_folder()) if fx.endswith(".html") }
+
+@unittest.skipUnless(os.name == "posix", "the stub renderer needs a POSIX shell")
+class TestStubRenderer(unittest.TestCase):
+	def test_one_shot_png_on_stdout(self):
+		before = shared_documents()
+		with html_document("<p>stub</p>") as html_path:
+			self.assertTrue(html_path.startswith(shared_render_folder()))
+			png = render_chrome_headless_png(html_path, ["--window-size=320,200"], executable=STUB_RENDERER)
+		self.assertIsNotNone(png)
+		if png is not None:
+			with Image.open(io.BytesIO(png)) as img:
+				self.assertEqual(img.size, (320, 200))
+		self.assertEqual(shared_documents(), before)
+	def test_one_shot_failure_reports_stderr_tail(self):
+		with self.assertLogs("python.utils.image_utils", level="ERROR") as logs:
+			png = render_chrome_headless_png("/nonexistent/page.html", [], executable=STUB_RENDERER)
+		self.assertIsNone(png)
+		self.assertTrue(any("page not found" in line for line in logs.output))
+		self.assertTrue(all(len(line) < 20 * 1024 for line in logs.output))
+	def test_devtools_pipe(self):
+		before = shared_documents()
+		service = HtmlRenderService(lambda: DevToolsPipeBackend(STUB_RENDERER, timeout=10))
+		try:
+			for dimensions in [(320, 200), (800, 480)]:
+				img = service.render("<p>stub</p>", dimensions)
+				self.assertIsNotNone(img)
+				if img is not None:
+					self.assertEqual(img.size, dimensions)
+		finally:
+			service.shutdown()
+		self.assertEqual(shared_documents(), before)
+	def test_output_tail_is_bounded(self):
+		tail = OutputTail(io.BufferedReader(io.BytesIO(b"x" * 100000 + b"end")), limit=1000)
+		tail.join(timeout=5)
+		text = tail.text()
+		self.assertEqual(len(text), 1000)
+		self.assertTrue(text.endswith("end"))
+
+class TestRenderEnvironment(unittest.TestCase):
+	def test_environment_is_shared(self):
+		with tempfile.TemporaryDirectory() as folder:
+			stm = create_temporary_configuration_manager(folder).static_manager()
+			render_dir = os.path.join(os.path.dirname(__file__), "input")
+			rs1 = RenderSession(stm, render_dir, "headless.html")
+			rs2 = RenderSession(stm, render_dir, "headless.html", "file:///extra.css")
+			self.assertIs(rs1.env, rs2.env)
+			self.assertIs(rs1.font_faces, rs2.font_faces)
+			self.assertEqual(len(rs2.css_files), len(rs1.css_files) + 1)
+	def test_template_reloads_on_change(self):
+		with tempfile.TemporaryDirectory() as folder:
+			stm = create_temporary_configuration_manager(folder).static_manager()
+			render_dir = os.path.join(folder, "render-test")
+			os.makedirs(render_dir)
+			template_path = os.path.join(render_dir, "t.html")
+			with open(template_path, "w") as tf:
+				tf.write("one {{width}}")
+			renv = RenderEnvironment.get(stm, render_dir)
+			self.assertEqual(renv.env.get_template("t.html").render(width=1), "one 1")
+			self.assertIs(renv.env.get_template("t.html"), renv.env.get_template("t.html"))
+			with open(template_path, "w") as tf:
+				tf.write("two {{width}}")
+			os.utime(template_path, (time.time() + 10, time.time() + 10))
+			self.assertEqual(renv.env.get_template("t.html").render(width=2), "two 2")
+			css_path = os.path.join(render_dir, "t.css")
+			with open(css_path, "wb") as cf:
+				cf.write(b"a")
+			css_url = Path(css_path).as_uri()
+			self.assertEqual(renv.css_contents([css_url]), [b"a"])
+			with open(css_path, "wb") as cf:
+				cf.write(b"b")
+			os.utime(css_path, (time.time() + 10, time.time() + 10))
+			self.assertEqual(renv.css_contents([css_url]), [b"b"])
+
+@unittest.skipUnless(benchmark_enabled(), "benchmarks are disabled")
+class RenderEnvironmentBenchmark(unittest.TestCase):
+	def test_template_time(self):
+		rounds = 50
+		with tempfile.TemporaryDirectory() as folder:
+			stm = create_temporary_configuration_manager(folder).static_manager()
+			render_dir = os.path.join(os.path.dirname(__file__), "input")
+			def _per_render():
+				# what RenderSession did before the registry
+				env = Environment(loader=FileSystemLoader([render_dir, os.path.join(stm.ROOT_PATH, "render")]), autoescape=select_autoescape(['html', 'xml']))
+				fonts = stm.enum_fonts()
+				return env.get_template("headless.html").render(width=800, height=480, font_faces=fonts)
+			def _registry():
+				renv = RenderEnvironment.get(stm, render_dir)
+				return renv.env.get_template("headless.html").render(width=800, height=480, font_faces=renv.font_faces)
+			def _time(fn) -> float:
+				started = time.perf_counter()
+				for _ in range(rounds):
+					fn()
+				return (time.perf_counter() - started) * 1000 / rounds
+			report = { "rounds": rounds, "per_render_ms": round(_time(_per_render), 3), "registry_ms": round(_time(_registry), 3) }
+		save_benchmark_report("render_environment", report)
+
+@unittest.skipUnless(benchmark_enabled() and shutil.which(chrome_headless_executable()) is not None, "benchmarks are disabled or there is no headless browser")
+class HtmlRenderServiceBenchmark(unittest.TestCase):
+	def test_latency(self):
+		html = "<html><body style='margin:0;background:#fff'><h1>Benchmark</h1></body></html>"
+		rounds = 10
+		def _latency(render) -> dict:
+			samples = []
+			for _ in range(rounds):
+				started = time.perf_counter()
+				self.assertIsNotNone(render())
+				samples.append((time.perf_counter() - started) * 1000)
+			return { "p50_ms": round(statistics.median(samples), 3), "max_ms": round(max(samples), 3), "first_ms": round(samples[0], 3) }
+		service = HtmlRenderService()
+		try:
+			report = {
+				"rounds": rounds,
+				"process_per_render": _latency(lambda: render_html_arglist(html, ["--window-size=800,480"])),
+				"render_service": _latency(lambda: service.render(html, (800, 480))),
+			}
+		finally:
+			service.shutdown()
+		save_benchmark_report("html_render_latency", report)
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,142 @@
+import asyncio
+import gzip
+import os
+import tempfile
+import time
+import unittest
+import httpx
+
+from ..task.async_http_worker_pool import AsyncHttpWorkerPool, client_var
+from ..task.http_cache import CachingTransport, HttpCache, freshness_lifetime, parse_cache_control
+
+class Origin:
+	"""MockTransport handler; answers conditional requests and records what it was asked."""
+	def __init__(self, body: bytes = b"payload", headers: dict[str, str]|None = None):
+		self.body = body
+		self.headers = headers if headers is not None else { "etag": '"v1"' }
+		self.requests: list[httpx.Request] = []
+		self.fail: Exception|None = None
+		self.status = 200
+	def __call__(self, request: httpx.Request) -> httpx.Response:
+		self.requests.append(request)
+		if self.fail is not None:
+			raise self.fail
+		etag = self.headers.get("etag", None)
+		if etag is not None and request.headers.get("if-none-match") == etag:
+			return httpx.Response(304, headers=self.headers)
+		return httpx.Response(self.status, headers=self.headers, content=self.body)
+
+def fetch(cache: HttpCache, origin: Origin, url: str = "https://example.com/feed", **kwargs) -> httpx.Response:
+	async def _fetch():
+		async with httpx.AsyncClient(transport=CachingTransport(httpx.MockTransport(origin), cache)) as client:
+			response = await client.get(url, **kwargs)
+			await response.aread()
+			return response
+	return asyncio.run(_fetch())
+
+class TestHttpCache(unittest.TestCase):
+	def setUp(self):
+		self.folder = tempfile.TemporaryDirectory()
+		self.cache = HttpCache(os.path.join(self.folder.name, "http"))
+	def tearDown(self):
+		self.folder.cleanup()
+	def test_fresh_response_is_served_from_disk(self):
+		origin = Origin(headers={ "cache-control": "max-age=600" })
+		self.assertEqual(fetch(self.cache, origin).content, b"payload")
+		# a new cache instance reads the same folder
+		response = fetch(HttpCache(self.cache.folder), origin)
+		self.assertEqual(response.content, b"payload")
+		self.assertTrue(response.extensions.get("from_cache", False))
+		self.assertEqual(len(origin.requests), 1)
+	def test_etag_revalidation(self):
+		origin = Origin()
+		fetch(self.cache, origin)
+		response = fetch(self.cache, origin)
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response.content, b"payload")
+		self.assertEqual(origin.requests[1].headers.get("if-none-match"), '"v1"')
+		stats = self.cache.stats()
+		self.assertEqual((stats["misses"], stats["revalidated"], stats["bytes_saved"]), (1, 1, len(b"payload")))
+		self.assertEqual(stats["hit_ratio"], 0.5)
+		# changed at the origin
+		origin.headers = { "etag": '"v2"' }
+		origin.body = b"changed"
+		self.assertEqual(fetch(self.cache, origin).content, b"changed")
+	def test_last_modified_revalidation(self):
+		modified = "Tue, 01 Sep 2026 10:00:00 GMT"
+		origin = Origin(headers={ "last-modified": modified })
+		fetch(self.cache, origin)
+		fetch(self.cache, origin)
+		self.assertEqual(origin.requests[1].headers.get("if-modified-since"), modified)
+	def test_stale_on_failure(self):
+		origin = Origin()
+		fetch(self.cache, origin)
+		origin.fail = httpx.ConnectError("unreachable")
+		self.assertEqual(fetch(self.cache, origin).content, b"payload")
+		origin.fail = None
+		origin.headers = {}
+		origin.status = 503
+		self.assertEqual(fetch(self.cache, origin).status_code, 200)
+		self.assertEqual(self.cache.stats()["stale"], 2)
+		# nothing stored for this one
+		origin.fail = httpx.ConnectError("unreachable")
+		with self.assertRaises(httpx.ConnectError):
+			fetch(self.cache, origin, "https://example.com/other")
+	def test_must_revalidate_is_not_served_stale(self):
+		origin = Origin(headers={ "etag": '"v1"', "cache-control": "no-cache, must-revalidate" })
+		fetch(self.cache, origin)
+		origin.fail = httpx.ConnectError("unreachable")
+		with self.assertRaises(httpx.ConnectError):
+			fetch(self.cache, origin)
+	def test_not_stored(self):
+		for headers in [{ "cache-control": "no-store", "etag": '"v1"' }, {}]:
+			origin = Origin(headers=headers)
+			fetch(self.cache, origin)
+			fetch(self.cache, origin)
+			self.assertEqual(len(origin.requests), 2)
+			self.assertNotIn("if-none-match", origin.requests[1].headers)
+	def test_encoded_body(self):
+		origin = Origin(body=gzip.compress(b"x" * 1000), headers={ "cache-control": "max-age=600", "content-encoding": "gzip" })
+		self.assertEqual(fetch(self.cache, origin).content, b"x" * 1000)
+		self.assertEqual(fetch(self.cache, origin).content, b"x" * 1000)
+		self.assertEqual(len(origin.requests), 1)
+	def test_size_budget(self):
+		cache = HttpCache(self.cache.folder, max_bytes=8000)
+		origin = Origin(body=b"x" * 900, headers={ "cache-control": "max-age=600" })
+		for ix in range(12):
+			fetch(cache, origin, f"https://example.com/{ix}")
+			# distinct LRU order
+			time.sleep(0.01)
+		total = sum(entry.stat().st_size for entry in os.scandir(cache.folder) if entry.name.endswith(".body"))
+		self.assertLessEqual(total, 8000)
+		# the most recent is still there, the first is not
+		fetch(cache, origin, "https://example.com/11")
+		fetch(cache, origin, "https://example.com/0")
+		self.assertEqual(len(origin.requests), 13)
+		# larger than an entry may be
+		origin.body = b"x" * 2000
+		response = fetch(cache, origin, "https://example.com/large")
+		self.assertEqual(response.content, b"x" * 2000)
+		self.assertIsNone(cache.get("https://example.com/large"))
+	def test_freshness(self):
+		self.assertEqual(parse_cache_control('public, max-age=60, no-cache="set-cookie"'), { "public": None, "max-age": "60", "no-cache": "set-cookie" })
+		self.assertEqual(freshness_lifetime(httpx.Headers({ "cache-control": "max-age=60", "age": "20" })), 40)
+		self.assertEqual(freshness_lifetime(httpx.Headers({ "date": "Tue, 01 Sep 2026 10:00:00 GMT", "expires": "Tue, 01 Sep 2026 11:00:00 GMT" })), 3600)
+		self.assertEqual(freshness_lifetime(httpx.Headers({ "expires": "0" })), 0)
+		self.assertEqual(freshness_lifetime(httpx.Headers({ "cache-control": "no-cache, max-age=60" })), 0)
+
+class TestPoolCache(unittest.TestCase):
+	def test_pool_client_uses_cache(self):
+		with tempfile.TemporaryDirectory() as folder:
+			pool = AsyncHttpWorkerPool(HttpCache(folder))
+			pool.start()
+			try:
+				async def _transport():
+					return client_var.get()._transport
+				transport = pool.submit(_transport).result(timeout=5)
+				self.assertIsInstance(transport, CachingTransport)
+			finally:
+				pool.shutdown()
+
+if __name__ == "__main__":
+	unittest.main()
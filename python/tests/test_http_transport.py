@@ -0,0 +1,98 @@
+import asyncio
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+import unittest
+import httpx
+
+from ..task.async_http_worker_pool import AsyncHttpWorkerPool, client_var
+from ..task.http_transport import HostLimitTransport, HttpPoolSettings, create_transport
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+	protocol_version = "HTTP/1.1"
+	def do_GET(self):
+		body = b"ok"
+		self.send_response(200)
+		self.send_header("Content-Length", str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+	def log_message(self, format, *args):
+		pass
+
+class ChunkStream(httpx.AsyncByteStream):
+	"""A body that is not read until the client streams it."""
+	async def __aiter__(self):
+		yield b"x" * 10
+
+class TestHttpPoolSettings(unittest.TestCase):
+	def test_from_settings(self):
+		self.assertEqual(HttpPoolSettings.from_settings(None), HttpPoolSettings())
+		settings = HttpPoolSettings.from_settings({ "http-maxConnections": 5, "http-perHost": 0, "http-http2": True, "timezoneName": "UTC" })
+		self.assertEqual((settings.max_connections, settings.per_host, settings.http2), (5, 1, True))
+		self.assertEqual(settings.timeout_seconds, HttpPoolSettings().timeout_seconds)
+	def test_http2_without_h2(self):
+		# falls back instead of failing when h2 is missing
+		transport = create_transport(HttpPoolSettings(http2=True))
+		self.assertIsInstance(transport, HostLimitTransport)
+
+class TestHostLimitTransport(unittest.TestCase):
+	def test_per_host_limit(self):
+		active: dict[str, int] = {}
+		peak: dict[str, int] = {}
+		finished: list[str] = []
+		async def handler(request: httpx.Request) -> httpx.Response:
+			host = request.url.host
+			active[host] = active.get(host, 0) + 1
+			peak[host] = max(peak.get(host, 0), active[host])
+			await asyncio.sleep(0.2 if host == "slow.example" else 0.01)
+			active[host] -= 1
+			finished.append(host)
+			return httpx.Response(200, content=b"ok")
+		transport = HostLimitTransport(httpx.MockTransport(handler), per_host=2)
+		async def _run():
+			async with httpx.AsyncClient(transport=transport) as client:
+				await asyncio.gather(*[client.get(f"https://slow.example/{ix}") for ix in range(6)], *[client.get(f"https://fast.example/{ix}") for ix in range(2)])
+		asyncio.run(_run())
+		self.assertEqual(peak, { "slow.example": 2, "fast.example": 2 })
+		# the fast host did not wait behind the slow one
+		self.assertEqual(finished[:2], ["fast.example", "fast.example"])
+		stats = transport.stats()
+		self.assertEqual(stats["requests"], 8)
+		self.assertEqual(stats["queued"], 4)
+		self.assertGreater(stats["queue_wait_ms_max"], 100)
+	def test_slot_is_held_while_streaming(self):
+		transport = HostLimitTransport(httpx.MockTransport(lambda request: httpx.Response(200, stream=ChunkStream())), per_host=1)
+		async def _run():
+			async with httpx.AsyncClient(transport=transport) as client:
+				async with client.stream("GET", "https://example.com/a") as response:
+					second = asyncio.ensure_future(client.get("https://example.com/b"))
+					await asyncio.sleep(0.05)
+					self.assertFalse(second.done())
+					await response.aread()
+				await second
+		asyncio.run(_run())
+		self.assertEqual(transport.stats()["queued"], 1)
+	def test_connection_reuse(self):
+		server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+		thread = threading.Thread(target=server.serve_forever, daemon=True)
+		thread.start()
+		try:
+			pool = AsyncHttpWorkerPool(settings=HttpPoolSettings(per_host=1))
+			pool.start()
+			try:
+				async def _fetch():
+					client = client_var.get()
+					for _ in range(5):
+						response = await client.get(f"http://127.0.0.1:{server.server_port}/")
+						self.assertEqual(response.text, "ok")
+				pool.submit(_fetch).result(timeout=10)
+				stats = pool.stats()
+			finally:
+				pool.shutdown()
+		finally:
+			server.shutdown()
+			server.server_close()
+		self.assertEqual((stats["requests"], stats["connections"]), (5, 1))
+		self.assertEqual(stats["reuse_ratio"], 0.8)
+
+if __name__ == "__main__":
+	unittest.main()
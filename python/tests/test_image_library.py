@@ -0,0 +1,203 @@
+import asyncio
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+from PIL import Image
+
+from ..datasources.image_folder import image_folder, image_library
+from ..datasources.image_folder.image_folder import ImageFolderAsync, list_files_in_folder
+from ..datasources.image_folder.image_library import ImageLibrary
+from .utils import benchmark_enabled, create_datasource_context, save_benchmark_report
+
+def write_image(path: str, size: tuple[int, int], orientation: int = 1) -> None:
+	os.makedirs(os.path.dirname(path), exist_ok=True)
+	img = Image.new("RGB", size, (10, 20, 30))
+	exif = Image.Exif()
+	if orientation != 1:
+		exif[image_library.ORIENTATION_TAG] = orientation
+	img.save(path, "JPEG", exif=exif)
+
+def wait_for(condition, timeout: float = 5.0) -> bool:
+	deadline = time.monotonic() + timeout
+	while time.monotonic() < deadline:
+		if condition():
+			return True
+		time.sleep(0.05)
+	return False
+
+class TestImageLibrary(unittest.TestCase):
+	def setUp(self):
+		self.folder = tempfile.mkdtemp()
+		self.root = os.path.join(self.folder, "images")
+		self.index_path = os.path.join(self.folder, "storage", "index.json")
+		write_image(os.path.join(self.root, "a.jpg"), (40, 30))
+		write_image(os.path.join(self.root, "sub", "b.jpg"), (30, 40))
+		# landscape pixels, portrait when displayed
+		write_image(os.path.join(self.root, "sub", "deeper", "c.jpg"), (40, 30), orientation=6)
+		write_image(os.path.join(self.root, ".hidden", "d.jpg"), (40, 30))
+		with open(os.path.join(self.root, "notes.txt"), "w") as tf:
+			tf.write("not an image")
+	def tearDown(self):
+		shutil.rmtree(self.folder, ignore_errors=True)
+	def test_recursive_index(self):
+		library = ImageLibrary(self.root, self.index_path)
+		entries = { ex.path: ex for ex in library.refresh() }
+		self.assertEqual(set(entries.keys()), { "a.jpg", os.path.join("sub", "b.jpg"), os.path.join("sub", "deeper", "c.jpg") })
+		c = entries[os.path.join("sub", "deeper", "c.jpg")]
+		self.assertEqual((c.width, c.height, c.orientation), (40, 30, 6))
+		self.assertEqual(c.oriented_size, (30, 40))
+		self.assertTrue(os.path.exists(self.index_path))
+	def test_index_is_persisted(self):
+		ImageLibrary(self.root, self.index_path).refresh()
+		with patch.object(image_library, "probe_image", wraps=image_library.probe_image) as probe:
+			entries = ImageLibrary(self.root, self.index_path).refresh()
+			self.assertEqual(len(entries), 3)
+			# unchanged files are not opened again
+			probe.assert_not_called()
+			write_image(os.path.join(self.root, "e.jpg"), (20, 20))
+			os.remove(os.path.join(self.root, "a.jpg"))
+			paths = { ex.path for ex in ImageLibrary(self.root, self.index_path).refresh() }
+			self.assertEqual(probe.call_count, 1)
+		self.assertIn("e.jpg", paths)
+		self.assertNotIn("a.jpg", paths)
+	def test_select(self):
+		library = ImageLibrary(self.root)
+		names = lambda paths: [os.path.relpath(px, self.root).replace(os.sep, "/") for px in paths]
+		self.assertEqual(names(library.select()), ["a.jpg", "sub/b.jpg", "sub/deeper/c.jpg"])
+		self.assertEqual(names(library.select(pattern="sub/*")), ["sub/b.jpg", "sub/deeper/c.jpg"])
+		self.assertEqual(names(library.select(orientation="portrait")), ["sub/b.jpg", "sub/deeper/c.jpg"])
+		self.assertEqual(names(library.select(orientation="landscape")), ["a.jpg"])
+		os.utime(os.path.join(self.root, "a.jpg"), (time.time() + 100, time.time() + 100))
+		self.assertEqual(names(library.select(order="date"))[-1], "a.jpg")
+		shuffled = library.select(order="shuffle", seed=3)
+		self.assertEqual(sorted(shuffled), library.select())
+		self.assertEqual(shuffled, library.select(order="shuffle", seed=3))
+	def test_watch_updates_incrementally(self):
+		library = ImageLibrary(self.root, self.index_path)
+		library.start_watching()
+		try:
+			self.assertEqual(len(library.refresh()), 3)
+			with patch.object(library, "_scan", wraps=library._scan) as scan:
+				write_image(os.path.join(self.root, "sub", "f.jpg"), (20, 20))
+				shutil.rmtree(os.path.join(self.root, "sub", "deeper"))
+				self.assertTrue(wait_for(lambda: { ex.path for ex in library.refresh() } == { "a.jpg", os.path.join("sub", "b.jpg"), os.path.join("sub", "f.jpg") }))
+				# no walk of the whole folder
+				self.assertFalse(any(call.args[0] == library.root for call in scan.call_args_list))
+		finally:
+			library.stop_watching()
+
+class TestFrameCache(unittest.TestCase):
+	def setUp(self):
+		self.folder = tempfile.mkdtemp()
+		self.root = os.path.join(self.folder, "images")
+		for name in ["a.jpg", "b.jpg", "c.jpg"]:
+			write_image(os.path.join(self.root, name), (1600, 1200))
+		self.dsec = create_datasource_context(self.folder, "image-folder")
+		self.ds = ImageFolderAsync("image-folder", "image-folder")
+	def tearDown(self):
+		self.ds.shutdown()
+		shutil.rmtree(self.folder, ignore_errors=True)
+	def test_frame_is_reused(self):
+		path = os.path.join(self.root, "a.jpg")
+		with patch.object(image_folder, "grab_image", wraps=image_folder.grab_image) as grab:
+			first = self.ds.render_frame(self.dsec, path, "speed")
+			second = self.ds.render_frame(self.dsec, path, "speed")
+			self.assertEqual(grab.call_count, 1)
+			# a new instance uses the disk tier
+			other = ImageFolderAsync("image-folder", "image-folder")
+			third = other.render_frame(self.dsec, path, "speed")
+			self.assertEqual(grab.call_count, 1)
+			# the source changed
+			write_image(path, (1200, 1600))
+			os.utime(path, (time.time() + 10, time.time() + 10))
+			self.ds.render_frame(self.dsec, path, "speed")
+			self.assertEqual(grab.call_count, 2)
+		self.assertIsNotNone(first)
+		if first is not None and second is not None and third is not None:
+			self.assertEqual(first.size, (800, 480))
+			self.assertEqual(first.tobytes(), second.tobytes())
+			self.assertEqual(first.tobytes(), third.tobytes())
+	def test_open_indexes_off_the_loop(self):
+		threads = []
+		select = ImageLibrary.select
+		def _select(library, *args):
+			threads.append(threading.current_thread())
+			return select(library, *args)
+		with patch.object(ImageLibrary, "select", _select):
+			paths = asyncio.run(self.ds.open_async(self.dsec, { "folder": self.root }))
+		self.assertEqual(len(paths), 3)
+		self.assertIsNot(threads[0], threading.current_thread())
+	def test_prefetch_warms_frames(self):
+		paths = [os.path.join(self.root, name) for name in ["b.jpg", "c.jpg"]]
+		self.ds.prefetch(self.dsec, {}, paths)
+		self.assertTrue(wait_for(lambda: len(self.ds._warming) == 0))
+		with patch.object(image_folder, "grab_image", wraps=image_folder.grab_image) as grab:
+			for path in paths:
+				self.assertIsNotNone(self.ds.render_frame(self.dsec, path, "speed"))
+			grab.assert_not_called()
+
+@unittest.skipUnless(benchmark_enabled(), "benchmarks are disabled")
+class ImageLibraryBenchmark(unittest.TestCase):
+	def test_open_50k(self):
+		count = 50000
+		with tempfile.TemporaryDirectory() as folder:
+			root = os.path.join(folder, "images")
+			buffer = io.BytesIO()
+			Image.new("RGB", (64, 48)).save(buffer, "JPEG")
+			data = buffer.getvalue()
+			os.makedirs(root)
+			# flat, so the previous listing sees every image
+			for ix in range(count):
+				with open(os.path.join(root, f"{ix:06}.jpg"), "wb") as image_file:
+					image_file.write(data)
+			index_path = os.path.join(folder, "index.json")
+			def _ms(fn) -> float:
+				started = time.perf_counter()
+				fn()
+				return round((time.perf_counter() - started) * 1000, 3)
+			report: dict = { "images": count }
+			# the previous open_async
+			report["listdir_ms"] = _ms(lambda: list_files_in_folder(root))
+			report["index_build_ms"] = _ms(lambda: ImageLibrary(root, index_path).select())
+			report["open_from_index_ms"] = _ms(lambda: ImageLibrary(root, index_path).select())
+			library = ImageLibrary(root, index_path)
+			library.start_watching()
+			try:
+				library.select()
+				report["open_watched_ms"] = _ms(lambda: library.select())
+				report["open_watched_shuffle_ms"] = _ms(lambda: library.select(order="shuffle"))
+			finally:
+				library.stop_watching()
+		save_benchmark_report("image_library", report)
+	def test_frame_cache(self):
+		with tempfile.TemporaryDirectory() as folder:
+			path = os.path.join(folder, "images", "photo.jpg")
+			write_image(path, (6000, 4000))
+			dsec = create_datasource_context(folder, "image-folder")
+			rounds = 5
+			def _ms(fn) -> float:
+				started = time.perf_counter()
+				for _ in range(rounds):
+					fn()
+				return round((time.perf_counter() - started) * 1000 / rounds, 3)
+			ds = ImageFolderAsync("image-folder", "image-folder")
+			try:
+				ds.render_frame(dsec, path, "speed")
+				report = {
+					"image_size": (6000, 4000),
+					"rounds": rounds,
+					"grab_image_ms": _ms(lambda: image_folder.grab_image(path, (800, 480), True, None, "speed")),
+					"cached_memory_ms": _ms(lambda: ds.render_frame(dsec, path, "speed")),
+					"cached_disk_ms": _ms(lambda: ImageFolderAsync("image-folder", "image-folder").render_frame(dsec, path, "speed")),
+				}
+			finally:
+				ds.shutdown()
+		save_benchmark_report("image_frame_cache", report)
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,223 @@
+import io
+import logging
+import os
+import time
+import unittest
+import httpx
+import numpy as np
+from PIL import Image, ImageEnhance
+
+from ..datasources.image_folder.image_folder import grab_image
+from ..utils.image_utils import DownloadTooLarge, apply_image_enhancement, decode_image_async, download_stats, draft_image, resize_image, stream_to_buffer
+from ..task.async_http_worker_pool import client_var
+from .utils import PeakMemorySampler, benchmark_enabled, jpeg_bytes, save_benchmark_report, with_mock_client
+
+TEST_IMAGES = "python/tests/images"
+
+def enhancement_settings(brightness=1.0, contrast=1.0, saturation=1.0, sharpness=1.0) -> dict:
+	return {
+		"imageSettings-brightness": brightness,
+		"imageSettings-contrast": contrast,
+		"imageSettings-saturation": saturation,
+		"imageSettings-sharpness": sharpness,
+	}
+
+def enhance_in_passes(img: Image.Image, settings: dict) -> Image.Image:
+	"""Reference: one ImageEnhance pass per setting."""
+	for key, enhancer in [
+		("imageSettings-brightness", ImageEnhance.Brightness),
+		("imageSettings-contrast", ImageEnhance.Contrast),
+		("imageSettings-saturation", ImageEnhance.Color),
+		("imageSettings-sharpness", ImageEnhance.Sharpness),
+	]:
+		if settings[key] != 1.0:
+			img = enhancer(img).enhance(settings[key])
+	return img
+
+def random_image(mode: str, size=(320, 240)) -> Image.Image:
+	rng = np.random.default_rng(7)
+	return Image.fromarray(rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8), "RGB").convert(mode)
+
+class TestImageEnhancement(unittest.TestCase):
+	def assertEquivalent(self, actual: Image.Image, expected: Image.Image, tolerance: int = 1):
+		self.assertEqual(actual.mode, expected.mode)
+		self.assertEqual(actual.size, expected.size)
+		diff = np.abs(np.asarray(actual, dtype=np.int16) - np.asarray(expected, dtype=np.int16))
+		self.assertLessEqual(int(diff.max()), tolerance)
+	def test_no_settings(self):
+		img = random_image("RGB")
+		self.assertIs(apply_image_enhancement(img, None), img)
+		self.assertIs(apply_image_enhancement(img, enhancement_settings()), img)
+	def test_matches_enhance_passes(self):
+		cases = [
+			enhancement_settings(brightness=1.3),
+			enhancement_settings(contrast=1.5),
+			enhancement_settings(brightness=0.8, contrast=1.4),
+			enhancement_settings(saturation=1.6),
+			enhancement_settings(brightness=1.2, contrast=0.7, saturation=1.5),
+			enhancement_settings(brightness=1.1, contrast=1.2, saturation=0.5, sharpness=2.0),
+		]
+		for mode in ["RGB", "RGBA", "L"]:
+			img = random_image(mode)
+			for settings in cases:
+				with self.subTest(mode=mode, settings=settings):
+					self.assertEquivalent(apply_image_enhancement(img, settings), enhance_in_passes(img, settings))
+	def test_alpha_is_preserved(self):
+		img = random_image("RGBA")
+		img.putalpha(77)
+		result = apply_image_enhancement(img, enhancement_settings(brightness=1.4, saturation=1.3))
+		self.assertEqual(result.getchannel("A").getextrema(), (77, 77))
+	def test_other_modes(self):
+		img = random_image("RGB").convert("CMYK")
+		settings = enhancement_settings(brightness=1.2)
+		self.assertEquivalent(apply_image_enhancement(img, settings), enhance_in_passes(img, settings), tolerance=0)
+
+@unittest.skipUnless(benchmark_enabled(), "benchmarks are disabled")
+class ImageEnhancementBenchmark(unittest.TestCase):
+	def test_fused_vs_passes(self):
+		img = random_image("RGB", (1600, 1200))
+		settings = enhancement_settings(brightness=1.1, contrast=1.2, saturation=1.3)
+		rounds = 10
+		def _time(fn) -> float:
+			started = time.perf_counter()
+			for _ in range(rounds):
+				fn(img, settings)
+			return (time.perf_counter() - started) * 1000 / rounds
+		apply_image_enhancement(img, settings)
+		report = {
+			"image_size": img.size,
+			"rounds": rounds,
+			"passes_ms": round(_time(enhance_in_passes), 3),
+			"fused_ms": round(_time(apply_image_enhancement), 3),
+		}
+		save_benchmark_report("image_enhancement", report)
+
+class TestResizeImage(unittest.TestCase):
+	def test_draft_decodes_reduced_jpeg(self):
+		img = Image.open(io.BytesIO(jpeg_bytes((3200, 1920))))
+		img = draft_image(img, 0.1)
+		self.assertEqual(img.size, (800, 480))
+		png = Image.new("RGB", (3200, 1920))
+		self.assertEqual(draft_image(png, 0.1).size, (3200, 1920))
+	def test_speed_matches_quality(self):
+		data = jpeg_bytes((6000, 4000))
+		quality = resize_image(Image.open(io.BytesIO(data)), (800, 480), resample_quality="quality")
+		speed = resize_image(Image.open(io.BytesIO(data)), (800, 480), resample_quality="speed")
+		self.assertEqual(speed.size, (800, 480))
+		diff = np.abs(np.asarray(speed, dtype=np.int16) - np.asarray(quality, dtype=np.int16))
+		self.assertLess(float(diff.mean()), 1.0)
+	def test_keep_width(self):
+		img = Image.new("RGB", (1600, 1600))
+		self.assertEqual(resize_image(img, (800, 480), ["keep-width"], resample_quality="speed").size, (800, 480))
+
+@unittest.skipUnless(benchmark_enabled(), "benchmarks are disabled")
+class ResizeBenchmark(unittest.TestCase):
+	def _measure(self, load) -> dict:
+		with PeakMemorySampler() as sampler:
+			started = time.perf_counter()
+			load()
+			elapsed = time.perf_counter() - started
+		return { "elapsed_ms": round(elapsed * 1000, 3), "rss_peak_delta": sampler.peak_delta }
+	def test_decode_and_resize(self):
+		logger = logging.getLogger(__name__)
+		files = sorted(os.path.join(TEST_IMAGES, fx) for fx in os.listdir(TEST_IMAGES))
+		report: dict = { "test_images": {}, "synthetic": {} }
+		for quality in ["quality", "speed"]:
+			report["test_images"][quality] = self._measure(lambda: [grab_image(fx, (800, 480), True, logger, quality) for fx in files])
+		data = jpeg_bytes((6000, 4000))
+		for quality in ["quality", "speed"]:
+			report["synthetic"][quality] = self._measure(lambda: [resize_image(Image.open(io.BytesIO(data)), (800, 480), resample_quality=quality) for _ in range(5)])
+		save_benchmark_report("resize_image", report)
+
+class ChunkedBody(httpx.AsyncByteStream):
+	"""A body sent in chunks, without Content-Length unless the response declares it."""
+	def __init__(self, data: bytes, chunk: int = 64 * 1024):
+		self.data = data
+		self.chunk = chunk
+		self.sent = 0
+	async def __aiter__(self):
+		for ix in range(0, len(self.data), self.chunk):
+			self.sent += len(self.data[ix:ix + self.chunk])
+			yield self.data[ix:ix + self.chunk]
+
+def download[T](body: ChunkedBody, fetch, headers: dict|None = None) -> T:
+	handler = lambda request: httpx.Response(200, headers={ "content-type": "image/jpeg", **(headers or {}) }, stream=body)
+	return with_mock_client(handler, lambda: fetch(client_var.get(), "https://example.com/image.jpg"))
+
+class TestDownload(unittest.TestCase):
+	def test_spools_large_downloads(self):
+		data = jpeg_bytes((1200, 800))
+		with download(ChunkedBody(data), lambda client, url: stream_to_buffer(client, url, spool_bytes=len(data) + 1)) as small:
+			self.assertEqual(small.read(), data)
+			self.assertFalse(small._rolled)
+		with download(ChunkedBody(data, 1024), lambda client, url: stream_to_buffer(client, url, spool_bytes=4096)) as spooled:
+			self.assertTrue(spooled._rolled)
+			self.assertEqual(Image.open(spooled).size, (1200, 800))
+	def test_declared_length_over_limit(self):
+		body = ChunkedBody(b"x" * 10000)
+		rejected = download_stats.stats()["rejected"]
+		with self.assertRaises(DownloadTooLarge):
+			download(body, lambda client, url: stream_to_buffer(client, url, max_bytes=1000), { "content-length": "10000" })
+		# refused before the body was read
+		self.assertEqual(body.sent, 0)
+		self.assertEqual(download_stats.stats()["rejected"], rejected + 1)
+	def test_received_bytes_over_limit(self):
+		body = ChunkedBody(b"x" * 10000, 100)
+		with self.assertRaises(DownloadTooLarge):
+			download(body, lambda client, url: decode_image_async(client, url, max_bytes=1000))
+		self.assertLess(body.sent, 1200)
+	def test_decode_image(self):
+		data = jpeg_bytes((1200, 800))
+		downloads = download_stats.stats()["downloads"]
+		image = download(ChunkedBody(data, 4096), decode_image_async)
+		self.assertEqual(image.tobytes(), Image.open(io.BytesIO(data)).tobytes())
+		self.assertEqual(download_stats.stats()["downloads"], downloads + 1)
+		# decoded reduced, keeping the reducing gap above the target
+		reduced = download(ChunkedBody(data, 4096), lambda client, url: decode_image_async(client, url, size=(300, 200)))
+		self.assertEqual(reduced.size, (600, 400))
+	def test_pixels_over_limit(self):
+		body = ChunkedBody(jpeg_bytes((1200, 800)), 1024)
+		limit = Image.MAX_IMAGE_PIXELS
+		Image.MAX_IMAGE_PIXELS = 1000 * 800
+		try:
+			with self.assertRaises(DownloadTooLarge):
+				download(body, decode_image_async)
+		finally:
+			Image.MAX_IMAGE_PIXELS = limit
+		# refused from the header
+		self.assertLess(body.sent, len(body.data))
+
+@unittest.skipUnless(benchmark_enabled(), "benchmarks are disabled")
+class DownloadBenchmark(unittest.TestCase):
+	def test_peak_memory(self):
+		# noise does not compress: an original-sized file
+		data = io.BytesIO()
+		random_image("RGB", (4000, 3000)).save(data, "JPEG", quality=95)
+		data = data.getvalue()
+		async def _bytesio(client: httpx.AsyncClient, url: str) -> Image.Image:
+			# the previous stream_to_buffer, then Image.open
+			async with client.stream("GET", url) as resp:
+				buffer = io.BytesIO()
+				async for chunk in resp.aiter_bytes():
+					buffer.write(chunk)
+				buffer.seek(0)
+			image = Image.open(buffer)
+			image.load()
+			return image
+		async def _spooled(client: httpx.AsyncClient, url: str) -> Image.Image:
+			with await stream_to_buffer(client, url) as buffer:
+				image = Image.open(buffer)
+				image.load()
+				return image
+		report: dict = { "encoded_bytes": len(data) }
+		for name, fetch in [("bytesio", _bytesio), ("spooled", _spooled), ("reduced", lambda client, url: decode_image_async(client, url, size=(800, 480)))]:
+			with PeakMemorySampler() as sampler:
+				started = time.perf_counter()
+				download(ChunkedBody(data), fetch)
+				elapsed = time.perf_counter() - started
+			report[name] = { "elapsed_ms": round(elapsed * 1000, 3), "rss_peak_delta": sampler.peak_delta }
+		report["stats"] = download_stats.stats()
+		save_benchmark_report("download_image", report)
+
+if __name__ == "__main__":
+	unittest.main()
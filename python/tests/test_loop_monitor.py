@@ -0,0 +1,93 @@
+import asyncio
+import threading
+import time
+import unittest
+import feedparser
+
+from ..task.async_http_worker_pool import AsyncHttpWorkerPool, cpu_executor_var, run_cpu
+from ..task.loop_monitor import SlowCallbackMonitor
+from .utils import benchmark_enabled, save_benchmark_report
+
+def atom_feed(entries: int) -> str:
+	items = "".join(f"<entry><title>Comic {ix}</title><id>urn:comic:{ix}</id><updated>2026-10-01T00:00:00Z</updated><summary type=\"html\">&lt;img src=\"https://example.com/{ix}.png\" alt=\"caption {ix}\"/&gt;</summary></entry>" for ix in range(entries))
+	return f"<?xml version=\"1.0\" encoding=\"utf-8\"?><feed xmlns=\"http://www.w3.org/2005/Atom\"><title>Comics</title>{items}</feed>"
+
+async def max_tick_lag(work, interval: float = 0.005) -> tuple[float, float]:
+	"""Run work while a ticker measures how late the loop wakes it; (max lag, elapsed) in seconds."""
+	lag = 0.0
+	done = asyncio.Event()
+	async def _ticker():
+		nonlocal lag
+		while not done.is_set():
+			expected = time.perf_counter() + interval
+			await asyncio.sleep(interval)
+			lag = max(lag, time.perf_counter() - expected)
+	ticker = asyncio.ensure_future(_ticker())
+	await asyncio.sleep(0)
+	started = time.perf_counter()
+	await work()
+	elapsed = time.perf_counter() - started
+	done.set()
+	await ticker
+	return lag, elapsed
+
+class TestSlowCallbackMonitor(unittest.TestCase):
+	def test_counts_blocking_callbacks(self):
+		loop = asyncio.new_event_loop()
+		thread = threading.Thread(target=loop.run_forever, daemon=True)
+		thread.start()
+		monitor = SlowCallbackMonitor(loop, threshold=0.05)
+		monitor.start()
+		try:
+			time.sleep(0.1)
+			self.assertEqual(monitor.stats()["slow_callbacks"], 0)
+			with self.assertLogs("python.task.loop_monitor", "WARNING") as logs:
+				loop.call_soon_threadsafe(time.sleep, 0.3)
+				time.sleep(0.5)
+			stats = monitor.stats()
+			self.assertEqual(stats["slow_callbacks"], 1)
+			self.assertGreater(stats["slow_ms_max"], 200)
+			# the watchdog caught the loop in the act
+			self.assertTrue(any("blocked in" in line for line in logs.output))
+		finally:
+			monitor.stop()
+			loop.call_soon_threadsafe(loop.stop)
+			thread.join()
+			loop.close()
+
+class TestRunCpu(unittest.TestCase):
+	def test_loop_stays_responsive(self):
+		async def _work():
+			await run_cpu(time.sleep, 0.3)
+		lag, elapsed = asyncio.run(max_tick_lag(_work))
+		self.assertGreaterEqual(elapsed, 0.3)
+		self.assertLess(lag, 0.1)
+	def test_pool_executor(self):
+		pool = AsyncHttpWorkerPool()
+		pool.start()
+		try:
+			async def _run():
+				self.assertIs(cpu_executor_var.get(), pool.cpu_executor)
+				return await run_cpu(threading.current_thread)
+			worker = pool.submit(_run).result(timeout=5)
+			self.assertTrue(worker.name.startswith("AsyncHttpWorkerPool-cpu"))
+			self.assertEqual(pool.loop_stats()["slow_callbacks"], 0)
+		finally:
+			pool.shutdown()
+
+@unittest.skipUnless(benchmark_enabled(), "benchmarks are disabled")
+class OffloadBenchmark(unittest.TestCase):
+	def test_feed_parse_loop_lag(self):
+		text = atom_feed(2000)
+		report: dict = { "feed_bytes": len(text) }
+		async def _inline():
+			feedparser.parse(text)
+		async def _offloaded():
+			await run_cpu(feedparser.parse, text)
+		for name, work in [("inline", _inline), ("offloaded", _offloaded)]:
+			lag, elapsed = asyncio.run(max_tick_lag(work))
+			report[name] = { "elapsed_ms": round(elapsed * 1000, 3), "max_loop_lag_ms": round(lag * 1000, 3) }
+		save_benchmark_report("offload_feed_parse", report)
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,106 @@
+import asyncio
+from datetime import date, datetime, timedelta
+import os
+import tempfile
+import time
+import unittest
+import httpx
+
+from ..datasources.newspaper.newspaper import NewspaperAsync, cover_url
+from ..utils.image_utils import get_image_async
+from .utils import benchmark_enabled, jpeg_bytes, save_benchmark_report, with_mock_client
+
+TODAY = datetime(2026, 10, 14, 9, 30)
+
+class CoverServer:
+	"""MockTransport handler serving covers for the given days, after a fixed latency."""
+	def __init__(self, slug: str, days: list[date], latency: float = 0.0):
+		self.covers = { cover_url(slug, day): jpeg_bytes((300, 500)) for day in days }
+		self.latency = latency
+		self.requests: list[tuple[str, str]] = []
+	async def __call__(self, request: httpx.Request) -> httpx.Response:
+		self.requests.append((request.method, str(request.url)))
+		await asyncio.sleep(self.latency)
+		data = self.covers.get(str(request.url), None)
+		if data is None:
+			return httpx.Response(404)
+		return httpx.Response(200, headers={ "content-type": "image/jpeg" }, content=b"" if request.method == "HEAD" else data)
+
+class TestNewspaper(unittest.TestCase):
+	def test_probes_then_downloads_freshest(self):
+		yesterday = (TODAY - timedelta(days=1)).date()
+		server = CoverServer("NY_NYT", [TODAY.date(), yesterday])
+		ds = NewspaperAsync("newspaper", "newspaper")
+		with tempfile.TemporaryDirectory() as folder:
+			image = with_mock_client(server, lambda: ds._generate_image("NY_NYT", (800, 480), TODAY, folder))
+			self.assertIsNotNone(image)
+			self.assertEqual([method for method, _ in server.requests].count("HEAD"), 4)
+			self.assertEqual([url for method, url in server.requests if method == "GET"], [cover_url("NY_NYT", TODAY.date())])
+			# later slots of the same day
+			server.requests.clear()
+			self.assertIsNotNone(with_mock_client(server, lambda: ds._generate_image("NY_NYT", (800, 480), TODAY.replace(hour=18), folder)))
+			self.assertEqual(server.requests, [])
+			# the next day only looks for newer editions; until one appears, the cached one shows
+			server.requests.clear()
+			self.assertIsNotNone(with_mock_client(server, lambda: ds._generate_image("NY_NYT", (800, 480), TODAY + timedelta(days=1), folder)))
+			self.assertEqual([method for method, _ in server.requests], ["HEAD"] * 2)
+			self.assertEqual(os.listdir(folder), [f"NY_NYT-{TODAY.date().isoformat()}.jpg"])
+	def test_current_edition_replaces_older(self):
+		yesterday = (TODAY - timedelta(days=1)).date()
+		server = CoverServer("NY_NYT", [yesterday])
+		ds = NewspaperAsync("newspaper", "newspaper")
+		early = TODAY.replace(hour=5)
+		with tempfile.TemporaryDirectory() as folder:
+			# early in the morning only yesterday's edition is out
+			self.assertIsNotNone(with_mock_client(server, lambda: ds._generate_image("NY_NYT", (800, 480), early, folder)))
+			self.assertEqual(os.listdir(folder), [f"NY_NYT-{yesterday.isoformat()}.jpg"])
+			# the next slot probes the newer days again, and finds nothing new
+			server.requests.clear()
+			with_mock_client(server, lambda: ds._generate_image("NY_NYT", (800, 480), early.replace(hour=6), folder))
+			self.assertEqual(sorted(url for _, url in server.requests), sorted(cover_url("NY_NYT", (TODAY + timedelta(days=diff)).date()) for diff in [1, 0]))
+			# today's edition is published
+			server.covers[cover_url("NY_NYT", TODAY.date())] = jpeg_bytes((300, 500))
+			server.requests.clear()
+			with_mock_client(server, lambda: ds._generate_image("NY_NYT", (800, 480), TODAY, folder))
+			self.assertEqual([url for method, url in server.requests if method == "GET"], [cover_url("NY_NYT", TODAY.date())])
+			self.assertEqual(os.listdir(folder), [f"NY_NYT-{TODAY.date().isoformat()}.jpg"])
+			# then it is served from disk
+			server.requests.clear()
+			with_mock_client(server, lambda: ds._generate_image("NY_NYT", (800, 480), TODAY.replace(hour=18), folder))
+			self.assertEqual(server.requests, [])
+	def test_not_found(self):
+		server = CoverServer("NY_NYT", [])
+		ds = NewspaperAsync("newspaper", "newspaper")
+		with self.assertRaises(RuntimeError):
+			with_mock_client(server, lambda: ds._generate_image("NY_NYT", (800, 480), TODAY))
+		self.assertEqual([method for method, _ in server.requests], ["HEAD"] * 4)
+
+@unittest.skipUnless(benchmark_enabled(), "benchmarks are disabled")
+class NewspaperBenchmark(unittest.TestCase):
+	def test_time_to_image(self):
+		latency = 0.1
+		oldest = (TODAY - timedelta(days=2)).date()
+		async def _sequential():
+			# the previous _generate_image: download each day in turn
+			for diff in [1, 0, -1, -2]:
+				try:
+					return await get_image_async(cover_url("NY_NYT", (TODAY + timedelta(days=diff)).date()))
+				except httpx.HTTPStatusError:
+					pass
+		def _ms(server: CoverServer, coro) -> float:
+			started = time.perf_counter()
+			self.assertIsNotNone(with_mock_client(server, coro))
+			return round((time.perf_counter() - started) * 1000, 3)
+		ds = NewspaperAsync("newspaper", "newspaper")
+		report: dict = { "latency_ms": latency * 1000 }
+		for name, days in [("today", [TODAY.date()]), ("day_before", [oldest])]:
+			with tempfile.TemporaryDirectory() as folder:
+				report[name] = {
+					"sequential_ms": _ms(CoverServer("NY_NYT", days, latency), _sequential),
+					"probed_ms": _ms(CoverServer("NY_NYT", days, latency), lambda: ds._generate_image("NY_NYT", (800, 480), TODAY, folder)),
+					"cached_ms": _ms(CoverServer("NY_NYT", days, latency), lambda: ds._generate_image("NY_NYT", (800, 480), TODAY, folder)),
+				}
+		save_benchmark_report("newspaper_time_to_image", report)
+
+if __name__ == "__main__":
+	unittest.main()
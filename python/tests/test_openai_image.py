@@ -0,0 +1,159 @@
+import asyncio
+import base64
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from PIL import Image
+
+from ..datasources.data_source import DataSourceManager
+from ..datasources.openai_image.image_buffer import GenerationRequest
+from ..datasources.openai_image.openai_image import OpenAIAsync
+from ..task.async_http_worker_pool import AsyncHttpWorkerPool
+from .utils import benchmark_enabled, create_datasource_context, save_benchmark_report
+
+def png_base64() -> str:
+	buffer = io.BytesIO()
+	Image.new("RGB", (1536, 1024), (30, 120, 60)).save(buffer, "PNG")
+	return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+class OpenAIStub(BaseHTTPRequestHandler):
+	"""The images and chat completions endpoints; records the requests on the server."""
+	protocol_version = "HTTP/1.1"
+	def do_POST(self):
+		body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+		self.server.requests.append((self.path, body))
+		time.sleep(self.server.delay)
+		if self.path.endswith("/images/generations"):
+			answer = { "created": int(time.time()), "data": [{ "b64_json": self.server.image }] }
+		else:
+			prompt = f"rewritten {len(self.server.requests)}"
+			answer = { "id": "stub", "object": "chat.completion", "created": int(time.time()), "model": body["model"], "choices": [{ "index": 0, "finish_reason": "stop", "message": { "role": "assistant", "content": prompt } }] }
+		data = json.dumps(answer).encode("utf-8")
+		self.send_response(200)
+		self.send_header("Content-Type", "application/json")
+		self.send_header("Content-Length", str(len(data)))
+		self.end_headers()
+		self.wfile.write(data)
+	def log_message(self, format, *args):
+		pass
+
+class StubServer:
+	def __init__(self, delay: float = 0.0):
+		self.server = ThreadingHTTPServer(("127.0.0.1", 0), OpenAIStub)
+		self.server.requests = []
+		self.server.delay = delay
+		self.server.image = png_base64()
+		self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+	@property
+	def base_url(self) -> str:
+		return f"http://127.0.0.1:{self.server.server_port}/v1"
+	@property
+	def requests(self) -> list:
+		return self.server.requests
+	def __enter__(self):
+		self.thread.start()
+		return self
+	def __exit__(self, exc_type, exc_val, exc_tb):
+		self.server.shutdown()
+		self.server.server_close()
+		return False
+
+def image_state(pregenerate: int, randomize: bool = False) -> dict:
+	return { "api_key": "sk-test", "text_prompt": "a lighthouse", "image_model": "gpt-image-1", "image_quality": "low", "randomize_prompt": randomize, "orientation": "horizontal", "pregenerate": pregenerate }
+
+def create_source(stub: StubServer) -> OpenAIAsync:
+	ds = OpenAIAsync("openai-image", "openai-image")
+	ds.base_url = stub.base_url
+	return ds
+
+async def settle(ds: OpenAIAsync) -> None:
+	await asyncio.gather(*ds._refills.values())
+
+class TestOpenAIPregeneration(unittest.TestCase):
+	def test_serves_from_buffer(self):
+		with tempfile.TemporaryDirectory() as folder, StubServer() as stub:
+			dsec = create_datasource_context(folder, "openai-image")
+			ds = create_source(stub)
+			state = image_state(2, randomize=True)
+			key = GenerationRequest("a lighthouse", "gpt-image-1", "low", True, "horizontal").key
+			async def _run():
+				# nothing buffered yet: generated in the slot, then the buffer fills
+				first = await ds.render_async(dsec, {}, state)
+				self.assertIsNotNone(first)
+				inline = len(stub.requests)
+				self.assertEqual(inline, 2)
+				await settle(ds)
+				self.assertEqual(ds.buffer.count(key), 2)
+				# the next slot does not wait for the API
+				second = await ds.render_async(dsec, {}, state)
+				self.assertEqual(len(stub.requests), inline + 4)
+				self.assertEqual(second.image.size, (1536, 1024))
+				await settle(ds)
+				self.assertEqual(len(ds._clients), 1)
+				await ds.close_async()
+			asyncio.run(_run())
+			# each image has its prompt metadata
+			metas = [name for name in os.listdir(os.path.join(ds.buffer.folder, key)) if name.endswith(".json")]
+			self.assertEqual(len(metas), 2)
+			with open(os.path.join(ds.buffer.folder, key, metas[0]), "r", encoding="utf-8") as meta_file:
+				meta = json.load(meta_file)
+			self.assertEqual(meta["prompt"], "a lighthouse")
+			self.assertTrue(meta["used_prompt"].startswith("rewritten"))
+	def test_shutdown_closes_on_pool_loop(self):
+		with tempfile.TemporaryDirectory() as folder, StubServer(0.2) as stub:
+			dsec = create_datasource_context(folder, "openai-image")
+			ds = create_source(stub)
+			pool = AsyncHttpWorkerPool()
+			pool.start()
+			try:
+				pool.submit(ds.render_async, dsec, {}, image_state(2)).result(timeout=10)
+				clients = list(ds._clients.values())
+				refills = list(ds._refills.values())
+				self.assertEqual(len(refills), 1)
+				# as the layers do on quit, before the pool
+				DataSourceManager({ "openai-image": ds }).shutdown()
+				self.assertEqual(ds._clients, {})
+				self.assertTrue(all(refill.done() for refill in refills))
+				self.assertTrue(all(client.is_closed() for client in clients))
+			finally:
+				pool.shutdown()
+	def test_disabled(self):
+		with tempfile.TemporaryDirectory() as folder, StubServer() as stub:
+			dsec = create_datasource_context(folder, "openai-image")
+			ds = create_source(stub)
+			async def _run():
+				await ds.render_async(dsec, {}, image_state(0))
+				await ds.render_async(dsec, {}, image_state(0))
+				self.assertEqual(ds._refills, {})
+				await ds.close_async()
+			asyncio.run(_run())
+			self.assertEqual(len(stub.requests), 2)
+
+@unittest.skipUnless(benchmark_enabled(), "benchmarks are disabled")
+class OpenAIPregenerationBenchmark(unittest.TestCase):
+	def test_time_to_image(self):
+		delay = 0.5
+		report: dict = { "generation_ms": delay * 1000 }
+		with tempfile.TemporaryDirectory() as folder, StubServer(delay) as stub:
+			dsec = create_datasource_context(folder, "openai-image")
+			for name, pregenerate in [("inline", 0), ("buffered", 1)]:
+				ds = create_source(stub)
+				async def _run():
+					await ds.render_async(dsec, {}, image_state(pregenerate))
+					await settle(ds)
+					started = time.perf_counter()
+					await ds.render_async(dsec, {}, image_state(pregenerate))
+					elapsed = time.perf_counter() - started
+					await settle(ds)
+					await ds.close_async()
+					return elapsed
+				report[name] = { "slot_ms": round(asyncio.run(_run()) * 1000, 3) }
+		save_benchmark_report("openai_time_to_image", report)
+
+if __name__ == "__main__":
+	unittest.main()
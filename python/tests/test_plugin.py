@@ -1,12 +1,14 @@
+import asyncio
 from datetime import datetime, timedelta
 import queue
+import tempfile
 import threading
 from time import sleep, time
 import unittest
 
 from ..model.time_of_day import TimeOfDay
 from ..datasources.comic.comic_feed import ComicFeedAsync
-from ..datasources.data_source import DataSource, DataSourceManager
+from ..datasources.data_source import DataSource, DataSourceExecutionContext, DataSourceManager, MediaRenderResult
 from ..datasources.image_folder.image_folder import ImageFolderAsync
 from ..datasources.newspaper.newspaper import NewspaperAsync
 from ..datasources.openai_image.openai_image import OpenAIAsync
@@ -17,11 +19,13 @@ from ..model.configuration_manager import ConfigurationManager, SettingsConfigur
 from ..plugins.slide_show.slide_show import SlideShowAsync
 from ..plugins.plugin_base import PluginExecutionContext
 from ..task.async_http_worker_pool import AsyncHttpWorkerPool
+from ..task.display import DisplayImage
 from ..task.timer import IProvideTimer
 from ..task.message_router import MessageRouter, Route
 from ..task.messages import BasicMessage, QuitMessage
 from ..task.protocols import MessageSink
-from .utils import RecordingTask, ScaledTimeOfDay, ScaledTimerThreadService, create_configuration_manager, save_images
+from PIL import Image
+from .utils import RecordingTask, ScaledTimeOfDay, ScaledTimerThreadService, create_configuration_manager, create_temporary_configuration_manager, save_images
 
 class DebugMessageSink(MessageSink):
 	def __init__(self):
@@ -29,20 +33,50 @@ class DebugMessageSink(MessageSink):
 	def accept(self, msg: BasicMessage):
 		self.msg_queue.put(msg)
 
+class EventSink(MessageSink):
+	"""Records the display messages in the shared event list, in send order, and when each was sent."""
+	def __init__(self, events: list):
+		self.events = events
+		self.shown: dict[str, float] = {}
+	def accept(self, msg: BasicMessage):
+		if isinstance(msg, DisplayImage):
+			self.events.append(("display", msg.title))
+			self.shown[msg.title] = time()
+
+class RecordingListSource(DataSource):
+	"""Numbered items; records when each render starts and whether it was cancelled."""
+	def __init__(self, id: str, name: str, items: int, render_seconds: dict[int, float]|None = None):
+		super().__init__(id, name)
+		self.items = items
+		self.render_seconds = render_seconds or {}
+		self.events: list = []
+		self.started: dict[int, float] = {}
+	async def open_async(self, dsec: DataSourceExecutionContext, params) -> list:
+		return list(range(self.items))
+	async def render_async(self, dsec: DataSourceExecutionContext, params, state) -> MediaRenderResult|None:
+		self.events.append(("render", state))
+		self.started[state] = time()
+		try:
+			await asyncio.sleep(self.render_seconds.get(state, 0))
+		except asyncio.CancelledError:
+			self.events.append(("cancelled", state))
+			raise
+		return MediaRenderResult(Image.new("1", dsec.dimensions, 1), str(state))
+
 TICK_RATE_FAST = 0.05
 TICK_RATE_SLOW = 1
 TICKS = 60*1
 
 class TestAsyncPlugins(unittest.TestCase):
-	def run_slide_show(self, track:PlaylistSchedule, dsm: DataSourceManager, timeout=10, testCancel=False):
+	def run_slide_show(self, track:PlaylistSchedule, dsm: DataSourceManager, timeout=10, testCancel=False, sinks:list[MessageSink]|None=None, cm:ConfigurationManager|None=None):
 		plugin = SlideShowAsync("slide-show", "Slide Show Plugin")
-		cm = create_configuration_manager()
+		cm = cm if cm is not None else create_configuration_manager()
 		scm = cm.settings_manager()
 		stm = cm.static_manager()
 		display = RecordingTask("FakeDisplay")
 		display.start()
 		router = MessageRouter()
-		router.addRoute(Route("display", [display]))
+		router.addRoute(Route("display", [display, *(sinks or [])]))
 		time_of_day = ScaledTimeOfDay(datetime.now().astimezone(), 60)
 		timer = ScaledTimerThreadService(time_of_day, 60)
 		root = ServiceContainer()
@@ -89,10 +123,60 @@ class TestAsyncPlugins(unittest.TestCase):
 			title="10 Item",
 			content=plugin_data
 		)
-		dsmap:dict[str,DataSource] = {"image-folder": ImageFolderAsync("image-folder", "image-folder")}
+		source = ImageFolderAsync("image-folder", "image-folder")
+		dsmap:dict[str,DataSource] = {"image-folder": source}
 		datasources = DataSourceManager(dsmap)
-		display = self.run_slide_show(track, datasources)
+		# the library index and frame cache go to a temporary storage root
+		with tempfile.TemporaryDirectory() as storage:
+			try:
+				display = self.run_slide_show(track, datasources, cm=create_temporary_configuration_manager(storage))
+			finally:
+				source.shutdown()
 		self.assertEqual(len(display.msgs), 9, "display.msgs failed")
+	def slide_show_track(self, depth: int, slideMax: int = 0, resume: bool = False) -> PlaylistSchedule:
+		content = {
+			"dataSource": "recording",
+			"slideMax": slideMax,
+			"slideMinutes": 1,
+			"prefetchDepth": depth,
+			"resume": resume
+		}
+		return PlaylistSchedule(plugin_name="slide-show", id="10", title="Recording", content=PlaylistScheduleData(content))
+	def test_slide_show_renders_ahead(self):
+		# one slide minute is a second of test time
+		slide_seconds = 1.0
+		for depth in [0, 1]:
+			source = RecordingListSource("recording", "recording", 3)
+			sink = EventSink(source.events)
+			self.run_slide_show(self.slide_show_track(depth), DataSourceManager({"recording": source}), sinks=[sink])
+			self.assertEqual([ex for ex in source.events if ex[0] == "display"], [("display", "0"), ("display", "1"), ("display", "2")])
+			if depth == 0:
+				# each slide renders when it is due, after the previous one's time is over
+				self.assertGreaterEqual(source.started[1] - sink.shown["0"], 0.9 * slide_seconds)
+				self.assertGreaterEqual(source.started[2] - sink.shown["1"], 0.9 * slide_seconds)
+			else:
+				# the next slide renders before the current one shows, but not the one after it
+				self.assertLess(source.started[1], sink.shown["0"])
+				self.assertGreaterEqual(source.started[2] - sink.shown["0"], 0.9 * slide_seconds)
+	def test_slide_show_cancel_abandons_renders(self):
+		source = RecordingListSource("recording", "recording", 5, { 1: 60, 2: 60, 3: 60 })
+		self.run_slide_show(self.slide_show_track(2), DataSourceManager({"recording": source}), testCancel=True, sinks=[EventSink(source.events)])
+		self.assertEqual([ex for ex in source.events if ex[0] == "display"], [("display", "0")])
+		self.assertIn(("cancelled", 1), source.events)
+		self.assertIn(("cancelled", 2), source.events)
+		self.assertIn(("cancelled", 3), source.events)
+		# outside the look-ahead window
+		self.assertNotIn(("render", 4), source.events)
+	def test_slide_show_resumes(self):
+		with tempfile.TemporaryDirectory() as folder:
+			cm = create_temporary_configuration_manager(folder)
+			shown = []
+			for _ in range(4):
+				source = RecordingListSource("recording", "recording", 5)
+				self.run_slide_show(self.slide_show_track(1, slideMax=2, resume=True), DataSourceManager({"recording": source}), sinks=[EventSink(source.events)], cm=cm)
+				shown.append([ex[1] for ex in source.events if ex[0] == "display"])
+			# the last pass ends at the end of the list, then it starts over
+			self.assertEqual(shown, [["0", "1"], ["2", "3"], ["4"], ["0", "1"]])
 	def test_slide_show_with_comic(self):
 		content = {
 			"dataSource": "comic-feed",
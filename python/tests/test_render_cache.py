@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta
+import os
+import tempfile
+import unittest
+import zoneinfo
+from PIL import Image
+
+from ..plugins.plugin_base import RenderSession
+from ..task.html_render_service import HtmlRenderService
+from ..task.render_cache import RenderCache, RenderValidity, render_key
+from .test_html_render_service import FakeBackend
+from .utils import create_temporary_configuration_manager
+
+NOW = datetime(2025, 3, 14, 15, 9, 26, tzinfo=zoneinfo.ZoneInfo("US/Eastern"))
+
+class TestRenderCache(unittest.TestCase):
+	def test_until_local_midnight(self):
+		validity = RenderValidity.until_local_midnight(NOW)
+		self.assertEqual(validity.until, datetime(2025, 3, 15, tzinfo=zoneinfo.ZoneInfo("US/Eastern")))
+	def test_key(self):
+		key = render_key("<p>1</p>", [b"p {}"], (800, 480))
+		self.assertEqual(key, render_key("<p>1</p>", [b"p {}"], (800, 480)))
+		self.assertNotEqual(key, render_key("<p>2</p>", [b"p {}"], (800, 480)))
+		self.assertNotEqual(key, render_key("<p>1</p>", [b"p { color: red }"], (800, 480)))
+		self.assertNotEqual(key, render_key("<p>1</p>", [b"p {}"], (480, 800)))
+	def test_memory_and_expiration(self):
+		cache = RenderCache(None, memory_items=2)
+		validity = RenderValidity(NOW, NOW + timedelta(hours=1))
+		cache.put("a", Image.new("RGB", (8, 8), (1, 2, 3)), validity)
+		img = cache.get("a", NOW)
+		self.assertIsNotNone(img)
+		if img is not None:
+			self.assertEqual(img.getpixel((0, 0)), (1, 2, 3))
+		self.assertIsNone(cache.get("a", NOW + timedelta(hours=2)))
+		self.assertIsNone(cache.get("a", NOW))
+	def test_memory_lru(self):
+		cache = RenderCache(None, memory_items=2)
+		validity = RenderValidity(NOW, NOW + timedelta(hours=1))
+		for key in ["a", "b"]:
+			cache.put(key, Image.new("RGB", (8, 8)), validity)
+		cache.get("a", NOW)
+		cache.put("c", Image.new("RGB", (8, 8)), validity)
+		self.assertIsNotNone(cache.get("a", NOW))
+		self.assertIsNone(cache.get("b", NOW))
+	def test_disk_tier(self):
+		with tempfile.TemporaryDirectory() as folder:
+			validity = RenderValidity(NOW, NOW + timedelta(hours=1))
+			RenderCache(folder).put("a", Image.new("RGB", (8, 8), (4, 5, 6)), validity)
+			# a new instance only has the disk tier
+			cache = RenderCache(folder)
+			img = cache.get("a", NOW)
+			self.assertIsNotNone(img)
+			if img is not None:
+				self.assertEqual(img.getpixel((0, 0)), (4, 5, 6))
+			self.assertIsNone(RenderCache(folder).get("a", NOW + timedelta(hours=2)))
+			self.assertFalse(os.path.exists(os.path.join(folder, "a.png")))
+	def test_disk_eviction(self):
+		with tempfile.TemporaryDirectory() as folder:
+			validity = RenderValidity(NOW, NOW + timedelta(hours=1))
+			cache = RenderCache(folder, disk_bytes=1)
+			cache.put("a", Image.new("RGB", (8, 8)), validity)
+			cache.put("b", Image.new("RGB", (8, 8)), validity)
+			self.assertLessEqual(len(os.listdir(folder)), 1)
+
+class TestRenderSessionCache(unittest.TestCase):
+	def test_render_is_reused_until_expired(self):
+		with tempfile.TemporaryDirectory() as folder:
+			cm = create_temporary_configuration_manager(folder)
+			backend = FakeBackend()
+			service = HtmlRenderService(lambda: backend)
+			cache = RenderCache(os.path.join(folder, "cache"))
+			try:
+				render_dir = os.path.join(os.path.dirname(__file__), "input")
+				def _render(params: dict, validity: RenderValidity|None):
+					rs = RenderSession(cm.static_manager(), render_dir, "headless.html", renderer=service, cache=cache)
+					return rs.render((400, 300), params, validity)
+				validity = RenderValidity.until_local_midnight(NOW)
+				self.assertIsNotNone(_render({ "title": "One" }, validity))
+				self.assertIsNotNone(_render({ "title": "One" }, validity))
+				self.assertEqual(len(backend.rendered), 1)
+				_render({ "title": "Two" }, validity)
+				self.assertEqual(len(backend.rendered), 2)
+				# the next day
+				_render({ "title": "One" }, RenderValidity.until_local_midnight(NOW + timedelta(days=1)))
+				self.assertEqual(len(backend.rendered), 3)
+				# no declared validity: not cached
+				_render({ "title": "One" }, None)
+				self.assertEqual(len(backend.rendered), 4)
+			finally:
+				service.shutdown()
+
+if __name__ == "__main__":
+	unittest.main()
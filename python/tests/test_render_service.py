@@ -0,0 +1,133 @@
+import asyncio
+from datetime import datetime
+import statistics
+import threading
+import time
+import unittest
+from PIL import Image, ImageFilter
+
+from ..datasources.clock.clock import Clock
+from ..task.image_preparation import ImagePreparation, PreparationSettings
+from ..task.display_messages import ComputedImage, DisplayImage
+from ..task.render_service import RenderService, SharedImage
+from .utils import benchmark_enabled, save_benchmark_report
+
+def invert(img: Image.Image) -> Image.Image:
+	return Image.eval(img, lambda px: 255 - px)
+
+def solid(size: tuple[int, int], color: tuple[int, int, int]) -> Image.Image:
+	return Image.new("RGB", size, color)
+
+def fail(img: Image.Image) -> Image.Image:
+	raise ValueError("render failed")
+
+def heavy(img: Image.Image) -> Image.Image:
+	return img.filter(ImageFilter.GaussianBlur(8)).resize((800, 480), Image.Resampling.LANCZOS)
+
+class TestSharedImage(unittest.TestCase):
+	def test_round_trip(self):
+		img = Image.new("RGB", (64, 32), (1, 2, 3))
+		shm, shared = SharedImage.create(img)
+		try:
+			copy = shared.load()
+			self.assertEqual(copy.size, (64, 32))
+			self.assertEqual(copy.mode, "RGB")
+			self.assertEqual(copy.getpixel((5, 5)), (1, 2, 3))
+		finally:
+			shm.close()
+			shm.unlink()
+	def test_palette_image_is_converted(self):
+		img = Image.new("P", (16, 16))
+		shm, shared = SharedImage.create(img)
+		try:
+			self.assertEqual(shared.mode, "RGB")
+		finally:
+			shm.close()
+			shm.unlink()
+
+class TestRenderService(unittest.TestCase):
+	@classmethod
+	def setUpClass(cls):
+		cls.service = RenderService(max_workers=1)
+	@classmethod
+	def tearDownClass(cls):
+		cls.service.shutdown()
+	def test_submit_with_image(self):
+		result = self.service.submit(invert, Image.new("RGB", (32, 32), (10, 20, 30))).result(timeout=60)
+		self.assertEqual(result.getpixel((0, 0)), (245, 235, 225))
+	def test_submit_without_image(self):
+		result = self.service.submit(solid, None, (20, 10), (7, 8, 9)).result(timeout=60)
+		self.assertEqual(result.size, (20, 10))
+		self.assertEqual(result.getpixel((0, 0)), (7, 8, 9))
+	def test_job_exception(self):
+		with self.assertRaises(ValueError):
+			self.service.submit(fail, Image.new("L", (4, 4))).result(timeout=60)
+	def test_run_async(self):
+		async def _run():
+			return await self.service.run_async(Clock.draw_conic_clock, None, (800, 480), datetime(2025, 1, 1, 10, 10))
+		result = asyncio.run(_run())
+		self.assertEqual(result.size, (800, 480))
+	def test_image_preparation(self):
+		prep = ImagePreparation(max_workers=1, render_service=self.service)
+		try:
+			async def _run():
+				msg = DisplayImage(datetime.now(), "Offloaded", Image.new("RGB", (1600, 1200)))
+				return await prep.prepare_async(msg, PreparationSettings("landscape", (800, 480)))
+			di = asyncio.run(_run())
+			self.assertIsInstance(di, ComputedImage)
+			if di is not None:
+				self.assertEqual(di.img.size, (800, 480))
+		finally:
+			prep.shutdown()
+	def test_shutdown(self):
+		service = RenderService(max_workers=1)
+		service.shutdown()
+		with self.assertRaises(RuntimeError):
+			service.submit(solid, None, (4, 4), (0, 0, 0))
+
+@unittest.skipUnless(benchmark_enabled(), "benchmarks are disabled")
+class RenderServiceBenchmark(unittest.TestCase):
+	def _measure(self, run_jobs) -> dict:
+		"""Run the jobs while a simulated API thread measures how long it waits for the GIL."""
+		latencies: list[float] = []
+		stop = threading.Event()
+		def _api():
+			while not stop.is_set():
+				started = time.perf_counter()
+				sum(range(2000))
+				latencies.append((time.perf_counter() - started) * 1000)
+				time.sleep(0.005)
+		api = threading.Thread(target=_api, daemon=True)
+		api.start()
+		started = time.perf_counter()
+		run_jobs()
+		elapsed = time.perf_counter() - started
+		stop.set()
+		api.join()
+		qs = statistics.quantiles(latencies, n=20)
+		return { "elapsed_s": round(elapsed, 3), "api_p50_ms": round(qs[9], 3), "api_p95_ms": round(qs[18], 3), "api_samples": len(latencies) }
+	def test_thread_vs_process(self):
+		count = 8
+		images = [Image.new("RGB", (3000, 2000), (ix * 20, 0, 0)) for ix in range(count)]
+		def _in_thread():
+			for img in images:
+				heavy(img)
+		service = RenderService()
+		try:
+			# warm up the workers
+			service.submit(solid, None, (4, 4), (0, 0, 0)).result()
+			def _in_process():
+				for fut in [service.submit(heavy, img) for img in images]:
+					fut.result()
+			report = {
+				"jobs": count,
+				"workers": service.max_workers,
+				"thread": self._measure(_in_thread),
+				"process": self._measure(_in_process),
+			}
+		finally:
+			service.shutdown()
+		save_benchmark_report("render_service", report)
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,131 @@
+import asyncio
+import random
+import time
+import unittest
+import httpx
+
+from ..task.async_http_worker_pool import AsyncHttpWorkerPool
+from ..task.resilience import CircuitOpenError, DeadlineExceeded, Resilience, RetryPolicy, deadline, resilience_var
+
+FAST = RetryPolicy(attempts=3, base_delay=0.001, max_delay=0.01)
+
+class FaultTransport:
+	"""MockTransport handler that answers from a script of faults: a status code, an exception, or a delay before a 200."""
+	def __init__(self, script: list):
+		self.script = script
+		self.requests = 0
+	async def __call__(self, request: httpx.Request) -> httpx.Response:
+		step = self.script[min(self.requests, len(self.script) - 1)]
+		self.requests += 1
+		if isinstance(step, Exception):
+			raise step
+		if isinstance(step, float):
+			await asyncio.sleep(step)
+			return httpx.Response(200, text=f"after {step}")
+		return httpx.Response(step, text=str(step))
+
+class FakeClock:
+	def __init__(self):
+		self.now = 0.0
+	def __call__(self) -> float:
+		return self.now
+
+def run_get(resilience: Resilience, faults: FaultTransport, url: str = "https://example.com/api", **kwargs) -> httpx.Response:
+	async def _get():
+		async with httpx.AsyncClient(transport=httpx.MockTransport(faults)) as client:
+			return await resilience.get(client, url, **kwargs)
+	return asyncio.run(_get())
+
+class TestResilience(unittest.TestCase):
+	def test_retry_transient(self):
+		faults = FaultTransport([503, httpx.ConnectError("refused"), 200])
+		response = run_get(Resilience(FAST), faults)
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(faults.requests, 3)
+	def test_gives_up(self):
+		faults = FaultTransport([503])
+		with self.assertRaises(httpx.HTTPStatusError):
+			run_get(Resilience(FAST), faults)
+		self.assertEqual(faults.requests, 3)
+	def test_answer_is_not_retried(self):
+		faults = FaultTransport([404])
+		resilience = Resilience(FAST, threshold=1)
+		with self.assertRaises(httpx.HTTPStatusError):
+			run_get(resilience, faults)
+		self.assertEqual(faults.requests, 1)
+		# the host answered; the breaker stays closed
+		self.assertEqual(resilience.breaker("example.com").state, "closed")
+	def test_backoff_is_jittered_and_bounded(self):
+		policy = RetryPolicy(base_delay=1.0, multiplier=2.0, max_delay=3.0)
+		rng = random.Random(1)
+		delays = [policy.delay(attempt, rng) for attempt in range(6) for _ in range(50)]
+		self.assertTrue(all(0 <= dx <= 3.0 for dx in delays))
+		self.assertGreater(len(set(delays)), 100)
+	def test_circuit_breaker(self):
+		clock = FakeClock()
+		resilience = Resilience(RetryPolicy(attempts=1), threshold=2, reset_seconds=30, clock=clock)
+		faults = FaultTransport([httpx.ConnectError("refused"), httpx.ConnectError("refused"), 200])
+		for _ in range(2):
+			with self.assertRaises(httpx.ConnectError):
+				run_get(resilience, faults)
+		# open: fails fast, without a request
+		with self.assertRaises(CircuitOpenError):
+			run_get(resilience, faults)
+		self.assertEqual(faults.requests, 2)
+		# other hosts are not affected
+		self.assertEqual(run_get(resilience, faults, "https://other.example.com/").status_code, 200)
+		clock.now = 31
+		self.assertEqual(resilience.breaker("example.com").state, "half-open")
+		self.assertEqual(run_get(resilience, faults).status_code, 200)
+		self.assertEqual(resilience.breaker("example.com").state, "closed")
+	def test_half_open_probe_failure(self):
+		clock = FakeClock()
+		resilience = Resilience(RetryPolicy(attempts=1), threshold=1, reset_seconds=30, clock=clock)
+		faults = FaultTransport([503])
+		with self.assertRaises(httpx.HTTPStatusError):
+			run_get(resilience, faults)
+		clock.now = 31
+		breaker = resilience.breaker("example.com")
+		breaker.acquire()
+		# one probe at a time
+		with self.assertRaises(CircuitOpenError):
+			breaker.acquire()
+		breaker.failure()
+		self.assertEqual(breaker.state, "open")
+	def test_hedged_request(self):
+		faults = FaultTransport([0.5, 0.01])
+		started = time.perf_counter()
+		response = run_get(Resilience(FAST), faults, hedge_after=0.05)
+		self.assertLess(time.perf_counter() - started, 0.4)
+		self.assertEqual(response.text, "after 0.01")
+		self.assertEqual(faults.requests, 2)
+	def test_deadline(self):
+		resilience = Resilience(RetryPolicy(attempts=5, base_delay=1.0, max_delay=1.0))
+		async def _slow():
+			async with httpx.AsyncClient(transport=httpx.MockTransport(FaultTransport([0.5]))) as client:
+				with deadline(0.05):
+					await resilience.get(client, "https://example.com/slow")
+		with self.assertRaises(DeadlineExceeded):
+			asyncio.run(_slow())
+		# no backoff sleep past the deadline
+		faults = FaultTransport([503])
+		async def _failing():
+			async with httpx.AsyncClient(transport=httpx.MockTransport(faults)) as client:
+				with deadline(0.2):
+					await resilience.get(client, "https://example.com/failing")
+		started = time.perf_counter()
+		with self.assertRaises(httpx.HTTPStatusError):
+			asyncio.run(_failing())
+		self.assertLess(time.perf_counter() - started, 0.5)
+	def test_pool_provides_resilience(self):
+		pool = AsyncHttpWorkerPool()
+		pool.start()
+		try:
+			async def _current():
+				return resilience_var.get()
+			self.assertIs(pool.submit(_current).result(timeout=5), pool.resilience)
+		finally:
+			pool.shutdown()
+
+if __name__ == "__main__":
+	unittest.main()
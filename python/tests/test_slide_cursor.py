@@ -0,0 +1,43 @@
+import unittest
+
+from ..plugins.slide_show.slide_cursor import SlideCursor, list_fingerprint
+
+class TestSlideCursor(unittest.TestCase):
+	def test_in_order(self):
+		cursor = SlideCursor(["a", "b", "c"])
+		self.assertEqual(cursor.peek(2), ["a", "b"])
+		self.assertEqual([cursor.next() for _ in range(3)], ["a", "b", "c"])
+		self.assertEqual(cursor.remaining, 0)
+		self.assertEqual(cursor.peek(2), [])
+		with self.assertRaises(StopIteration):
+			cursor.next()
+	def test_shuffle_is_seeded(self):
+		items = list(range(20))
+		first = SlideCursor(items, shuffle=True, seed=5)
+		order = [first.next() for _ in range(20)]
+		self.assertEqual(sorted(order), items)
+		self.assertNotEqual(order, items)
+		second = SlideCursor(items, shuffle=True, seed=5, position=10)
+		self.assertEqual(second.peek(20), order[10:])
+	def test_resume(self):
+		items = [f"image{ix}.jpg" for ix in range(10)]
+		cursor = SlideCursor(items, shuffle=True)
+		played = [cursor.next() for _ in range(4)]
+		resumed = SlideCursor.resume(list(items), cursor.state())
+		# the saved order was shuffled, this one is not
+		self.assertEqual(resumed.position, 0)
+		resumed = SlideCursor.resume(list(items), cursor.state(), shuffle=True)
+		self.assertEqual(resumed.position, 4)
+		self.assertEqual(played + [resumed.next() for _ in range(6)], [cursor.item(px) for px in range(10)])
+		# the list changed
+		self.assertEqual(SlideCursor.resume(items + ["new.jpg"], cursor.state(), shuffle=True).position, 0)
+		# played to the end starts over, in a new order
+		self.assertEqual(SlideCursor.resume(items, cursor.state(10), shuffle=True).position, 0)
+		self.assertEqual(SlideCursor.resume(items, None).position, 0)
+	def test_fingerprint(self):
+		self.assertEqual(list_fingerprint(["a", "b"]), list_fingerprint(["a", "b"]))
+		self.assertNotEqual(list_fingerprint(["a", "b"]), list_fingerprint(["b", "a"]))
+		self.assertNotEqual(list_fingerprint(["ab"]), list_fingerprint(["a", "b"]))
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,124 @@
+import asyncio
+from datetime import datetime, timezone
+import io
+import tempfile
+import time
+import unittest
+import httpx
+from PIL import Image
+
+from ..datasources.data_source import DataSourceExecutionContext
+from ..datasources.wpotd.wpotd import API_URL, WpotdAsync, thumb_width
+from ..task.async_http_worker_pool import client_var
+from .utils import benchmark_enabled, create_datasource_context, jpeg_bytes, save_benchmark_report, with_mock_client
+
+TODAY = datetime(2026, 10, 14, 9, 30, tzinfo=timezone.utc)
+
+class WikipediaServer:
+	"""MockTransport handler for the POTD API (generator=images and prop=images/imageinfo) and the upload host."""
+	def __init__(self, original: tuple[int, int] = (1600, 1200), latency: float = 0.0, noise: bool = False):
+		self.original = jpeg_bytes(original, noise)
+		self.thumb = jpeg_bytes((960, 720))
+		self.latency = latency
+		self.requests: list[str] = []
+	def _pages(self, day: str, width: str|None) -> list:
+		pages = []
+		for name in ["Potd-b.jpg", "Potd-a.jpg"]:
+			info = { "url": f"https://upload.wikimedia.org/{day}/{name}" }
+			if width is not None:
+				info["thumburl"] = f"https://upload.wikimedia.org/thumb/{day}/{width}px-{name}"
+			pages.append({ "title": f"File:{name}", "imageinfo": [info] })
+		return pages
+	async def __call__(self, request: httpx.Request) -> httpx.Response:
+		self.requests.append(str(request.url))
+		await asyncio.sleep(self.latency)
+		if request.url.host == "en.wikipedia.org":
+			params = request.url.params
+			if params.get("generator") == "images":
+				day = params["titles"].split("/")[-1]
+				return httpx.Response(200, json={ "query": { "pages": self._pages(day, params.get("iiurlwidth")) } })
+			if params.get("prop") == "images":
+				return httpx.Response(200, json={ "query": { "pages": [{ "images": [{ "title": "File:Potd-a.jpg" }] }] } })
+			return httpx.Response(200, json={ "query": { "pages": { "1": { "imageinfo": [{ "url": "https://upload.wikimedia.org/original/Potd-a.jpg" }] } } } })
+		data = self.thumb if "/thumb/" in request.url.path else self.original
+		return httpx.Response(200, headers={ "content-type": "image/jpeg" }, content=data)
+
+async def show(ds: WpotdAsync, dsec: DataSourceExecutionContext, params: dict) -> Image.Image:
+	state = await ds.open_async(dsec, params)
+	result = await ds.render_async(dsec, params, state[0])
+	assert result is not None and result.image is not None
+	return result.image
+
+class TestWpotd(unittest.TestCase):
+	def test_thumb_width(self):
+		self.assertEqual(thumb_width((800, 480)), 960)
+		self.assertEqual(thumb_width((480, 800)), 960)
+		self.assertEqual(thumb_width((1872, 1404)), 1920)
+		self.assertEqual(thumb_width((8000, 6000)), 3840)
+	def test_cached_by_date(self):
+		server = WikipediaServer()
+		params = { "shrinkToFit": True }
+		with tempfile.TemporaryDirectory() as folder:
+			dsec = create_datasource_context(folder, "wpotd", TODAY)
+			image = with_mock_client(server, lambda: show(WpotdAsync("wpotd", "wpotd"), dsec, params))
+			self.assertEqual(image.size, (800, 480))
+			# one API request, then the rendition at the display width
+			self.assertEqual(len(server.requests), 2)
+			self.assertIn("iiurlwidth=960", server.requests[0])
+			self.assertEqual(server.requests[1], "https://upload.wikimedia.org/thumb/2026-10-14/960px-Potd-a.jpg")
+			server.requests.clear()
+			with_mock_client(server, lambda: show(WpotdAsync("wpotd", "wpotd"), dsec, params))
+			self.assertEqual(server.requests, [])
+	def test_random_dates_are_fetched_ahead(self):
+		server = WikipediaServer()
+		params = { "shrinkToFit": True, "randomizeDate": True }
+		ds = WpotdAsync("wpotd", "wpotd")
+		with tempfile.TemporaryDirectory() as folder:
+			dsec = create_datasource_context(folder, "wpotd", TODAY)
+			async def _first():
+				await show(ds, dsec, params)
+				await asyncio.gather(*ds._fetching)
+			with_mock_client(server, _first)
+			self.assertEqual(len(ds._ahead), 3)
+			ahead = ds._ahead[0]
+			server.requests.clear()
+			async def _second():
+				state = await ds.open_async(dsec, params)
+				await ds.render_async(dsec, params, state[0])
+				for task in ds._fetching:
+					task.cancel()
+				await asyncio.gather(*ds._fetching, return_exceptions=True)
+				return state[0]["date"]
+			self.assertEqual(with_mock_client(server, _second), ahead)
+			# the shown date came from the cache; only the refill went out
+			self.assertFalse(any(ahead.isoformat() in url for url in server.requests))
+
+@unittest.skipUnless(benchmark_enabled(), "benchmarks are disabled")
+class WpotdBenchmark(unittest.TestCase):
+	def test_time_to_image(self):
+		latency = 0.05
+		async def _previous():
+			# two sequential API requests, then the original
+			client = client_var.get()
+			await client.get(API_URL, params={ "action": "query", "prop": "images", "titles": "Template:POTD/2026-10-14" })
+			await client.get(API_URL, params={ "action": "query", "prop": "imageinfo", "iiprop": "url", "titles": "File:Potd-a.jpg" })
+			response = await client.get("https://upload.wikimedia.org/original/Potd-a.jpg")
+			image = Image.open(io.BytesIO(response.content))
+			image.load()
+			return image
+		def _ms(coro) -> tuple[float, int]:
+			server = WikipediaServer((4000, 3000), latency, noise=True)
+			started = time.perf_counter()
+			with_mock_client(server, coro)
+			return round((time.perf_counter() - started) * 1000, 3), len(server.requests)
+		report: dict = { "latency_ms": latency * 1000 }
+		with tempfile.TemporaryDirectory() as folder:
+			dsec = create_datasource_context(folder, "wpotd", TODAY)
+			params = { "shrinkToFit": True }
+			for name, coro in [("previous", _previous), ("cold", lambda: show(WpotdAsync("wpotd", "wpotd"), dsec, params)), ("cached", lambda: show(WpotdAsync("wpotd", "wpotd"), dsec, params))]:
+				elapsed, requests = _ms(coro)
+				report[name] = { "elapsed_ms": elapsed, "requests": requests }
+		save_benchmark_report("wpotd_time_to_image", report)
+
+if __name__ == "__main__":
+	unittest.main()
@@ -1,19 +1,28 @@
+import asyncio
 from concurrent.futures import Executor, Future, ThreadPoolExecutor
+import io
+import json
 import os
 from pathlib import Path
 import threading
 import logging
 from datetime import datetime, timedelta, timezone
-from typing import Callable
+from typing import Any, Callable, Mapping
+import httpx
+import numpy as np
+import psutil
 from pathvalidate import sanitize_filename
 
+from ..datasources.data_source import DataSourceExecutionContext
+from ..model.service_container import ServiceContainer
 from ..model.time_of_day import TimeOfDay
+from ..task.async_http_worker_pool import client_var
 from ..task.basic_task import DispatcherTask
 from ..task.messages import BasicMessage
 from ..task.protocols import MessageSink
 from ..task.display import DisplayImage
 from ..task.timer import TimerThreadService
-from ..model.configuration_manager import ConfigurationManager
+from ..model.configuration_manager import ConfigurationManager, DatasourceConfigurationManager
 from PIL import Image
 
 class RecordingTask(DispatcherTask):
@@ -152,3 +161,114 @@ def create_configuration_manager() -> ConfigurationManager:
 	storage = storage_path()
 	cm = ConfigurationManager(storage_path=storage)
 	return cm
+
+def create_temporary_configuration_manager(folder: str) -> ConfigurationManager:
+	"""
+	Deploy a fresh storage root (from the NVE) inside the given folder, e.g. a TemporaryDirectory.
+	Use this when a test must not depend on the contents of the test storage.
+
+	:param folder: Parent folder of the storage root
+	:type folder: str
+	:return: Configuration manager for the deployed storage.
+	:rtype: ConfigurationManager
+	"""
+	cm = ConfigurationManager(storage_path=os.path.join(folder, ".storage"))
+	cm.hard_reset()
+	return cm
+
+def create_datasource_context(folder: str, datasource_id: str, timestamp: datetime|None = None, dimensions: tuple[int, int] = (800, 480)) -> DataSourceExecutionContext:
+	"""
+	Execution context for a data source, with its configuration (and storage) in a fresh storage root inside the given folder.
+
+	:param folder: Parent folder of the storage root, e.g. a TemporaryDirectory
+	:type folder: str
+	:param datasource_id: Data source whose configuration manager is provided
+	:type datasource_id: str
+	:param timestamp: Schedule time; defaults to now
+	:type timestamp: datetime|None
+	:return: Context providing the DatasourceConfigurationManager.
+	:rtype: DataSourceExecutionContext
+	"""
+	cm = create_temporary_configuration_manager(folder)
+	root = ServiceContainer()
+	root.add_service(DatasourceConfigurationManager, cm.datasource_manager(datasource_id))
+	return DataSourceExecutionContext(root, dimensions, timestamp if timestamp is not None else datetime.now())
+
+def with_mock_client[T](handler: Callable[[httpx.Request], Any], coro: Callable[[], Any]) -> T:
+	"""Run coro in a new event loop, with client_var set to a client whose requests go to the MockTransport handler."""
+	async def _run():
+		async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+			token = client_var.set(client)
+			try:
+				return await coro()
+			finally:
+				client_var.reset(token)
+	return asyncio.run(_run())
+
+def jpeg_bytes(size: tuple[int, int], noise: bool = False) -> bytes:
+	"""Synthetic photo-sized JPEG; noise makes it as large as a detailed photo."""
+	if noise:
+		img = Image.fromarray(np.random.default_rng(3).integers(0, 256, (size[1], size[0], 3), dtype=np.uint8), "RGB")
+	else:
+		img = Image.linear_gradient("L").resize(size).convert("RGB")
+	buffer = io.BytesIO()
+	img.save(buffer, "JPEG", quality=90)
+	return buffer.getvalue()
+
+BENCHMARK_ENV = "EINK_BENCHMARK"
+
+def benchmark_enabled() -> bool:
+	"""Benchmarks are slow and machine-dependent; they only run when EINK_BENCHMARK is set."""
+	return os.environ.get(BENCHMARK_ENV, "") not in ("", "0")
+
+def save_benchmark_report(name: str, report: Mapping[str, Any]) -> str:
+	"""
+	Log the report and save it as JSON in the "benchmarks" output folder.
+
+	:param name: Benchmark name. Used in file name.
+	:type name: str
+	:param report: JSON-serializable results
+	:type report: Mapping[str, Any]
+	:return: Full path to the report file.
+	:rtype: str
+	"""
+	folder = test_output_path_for("benchmarks")
+	report_path = os.path.join(folder, sanitize_filename(f"{name}.json"))
+	with open(report_path, "w") as fx:
+		json.dump(report, fx, indent=2, default=str)
+	logging.getLogger(__name__).warning(f"benchmark '{name}': {json.dumps(report, default=str)}")
+	return report_path
+
+class PeakMemorySampler:
+	"""
+	Sample the RSS of this process on a background thread and track the peak.
+	Use as a context manager around the code being measured.
+	"""
+	def __init__(self, interval: float = 0.005):
+		self.interval = interval
+		self.process = psutil.Process()
+		self.baseline = 0
+		self.peak = 0
+		self._stop = threading.Event()
+		self._thread: threading.Thread|None = None
+	def _sample(self):
+		while not self._stop.is_set():
+			self.peak = max(self.peak, self.process.memory_info().rss)
+			self._stop.wait(self.interval)
+	def __enter__(self):
+		self.baseline = self.process.memory_info().rss
+		self.peak = self.baseline
+		self._stop.clear()
+		self._thread = threading.Thread(target=self._sample, daemon=True)
+		self._thread.start()
+		return self
+	def __exit__(self, exc_type, exc_val, exc_tb):
+		self._stop.set()
+		if self._thread is not None:
+			self._thread.join()
+		self.peak = max(self.peak, self.process.memory_info().rss)
+		return False
+	@property
+	def peak_delta(self) -> int:
+		"""Growth of the peak RSS over the baseline, in bytes."""
+		return self.peak - self.baseline
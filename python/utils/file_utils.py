@@ -1,5 +1,7 @@
 import httpx
 from pathlib import Path
+from urllib.parse import urlparse
+from urllib.request import url2pathname
 
 def path_to_file_url(path):
 	"""
@@ -15,3 +17,7 @@ def path_to_file_url(path):
 	file_url = httpx.URL(absolute_uri)
 	
 	return str(file_url)
+
+def file_url_to_path(url: str) -> str:
+	"""Inverse of path_to_file_url."""
+	return url2pathname(urlparse(url).path)
@@ -10,14 +10,32 @@ class ImageOverlay:
 		self.position = position
 	pass
 
+def image_nbytes(img: Image.Image|None) -> int:
+	"""Approximate size of the pixel buffer of the image."""
+	if img is None:
+		return 0
+	return img.width * img.height * len(img.getbands())
+
 type LayerStackOp = tuple["LayerStack", "LayerStack"]
 @dataclass(frozen=True)
 class LayerStack:
+	"""
+	Immutable snapshot of the layers.
+	Each layer holds exactly one pixel buffer (the display-ready image); source images are not retained.
+	"""
 	version: int
 	background: DisplayImage|None
 	overlays: list[ImageOverlay]
 	forground: DisplayImage|None
 	priority: DisplayImage|None
+	def footprint(self) -> int:
+		"""Approximate number of bytes of pixel data held by this stack."""
+		total = image_nbytes(self.background.img if self.background is not None else None)
+		total += image_nbytes(self.forground.img if self.forground is not None else None)
+		total += image_nbytes(self.priority.img if self.priority is not None else None)
+		for ovl in self.overlays:
+			total += image_nbytes(ovl.image)
+		return total
 	def set_foreground(self, di: DisplayImage|None) -> LayerStackOp:
 		return (self, LayerStack(self.version + 1, self.background, self.overlays, di, self.priority))
 	def set_background(self, di: DisplayImage|None) -> LayerStackOp:
@@ -71,6 +89,9 @@ class ImageCompositor:
 	@property
 	def current_version(self) -> int:
 		return self._current_stack.version
+	@property
+	def current_footprint(self) -> int:
+		return self._current_stack.footprint()
 	def set_layer_background(self, bk: DisplayImage|None) -> LayerStackOp:
 		previous, self._current_stack = self._current_stack.set_background(bk)
 		return (previous, self._current_stack)
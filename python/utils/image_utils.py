@@ -1,35 +1,170 @@
 import io
+import math
 import platform
-from typing import Any, Callable, Mapping
+import threading
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import IO, Any, Callable, Iterator, Literal, Mapping
 
-from PIL import Image, ImageEnhance
+import numpy as np
+from PIL import ExifTags, Image, ImageEnhance, ImageFile, ImageOps
 from io import BytesIO
 import os
 import logging
 import hashlib
 import tempfile
 import subprocess
+import time
 from httpx import AsyncClient
-from ..task.async_http_worker_pool import client_var
+from ..task.async_http_worker_pool import client_var, run_cpu
+from ..task.resilience import resilience_var
 
 logger = logging.getLogger(__name__)
 
-async def stream_to_buffer(client: AsyncClient, url: str, headers: Mapping[str, str]|None = None, ctok: Callable[[str], bool]|None = None) -> BytesIO:
+# larger downloads are refused, so one oversized original cannot push the device into swap
+DOWNLOAD_MAX_BYTES = 40 * 1024 * 1024
+# downloads past this are spooled to a temporary file
+SPOOL_MAX_BYTES = 4 * 1024 * 1024
+
+class DownloadTooLarge(RuntimeError):
+	"""The response is bigger than the download allows (by Content-Length, or by the bytes received)."""
+	def __init__(self, url: str, size: int, max_bytes: int):
+		super().__init__(f"Download of {url} exceeds {max_bytes} bytes ({size})")
+		self.url = url
+		self.size = size
+		self.max_bytes = max_bytes
+
+@dataclass(slots=True)
+class DownloadReport:
+	url: str
+	size: int = 0
+	# the body went to a temporary file
+	spooled: bool = False
+	# most bytes held in memory at once: the in-memory buffer, or the pending data and decoded image
+	peak_memory: int = 0
+	elapsed_ms: float = 0.0
+
+class DownloadStats:
+	"""Counters of the downloads since start, for telemetry."""
+	def __init__(self):
+		self._lock = threading.Lock()
+		self._stats = { "downloads": 0, "bytes": 0, "spooled": 0, "rejected": 0, "peak_memory_max": 0 }
+	def record(self, report: DownloadReport) -> None:
+		with self._lock:
+			self._stats["downloads"] += 1
+			self._stats["bytes"] += report.size
+			self._stats["spooled"] += 1 if report.spooled else 0
+			self._stats["peak_memory_max"] = max(self._stats["peak_memory_max"], report.peak_memory)
+	def rejected(self) -> None:
+		with self._lock:
+			self._stats["rejected"] += 1
+	def stats(self) -> dict[str, Any]:
+		with self._lock:
+			return dict(self._stats)
+
+download_stats = DownloadStats()
+
+async def _download(client: AsyncClient, url: str, headers: Mapping[str, str]|None, ctok: Callable[[str], bool]|None, max_bytes: int, sink: Callable[[bytes], None]) -> int:
+	"""Stream the body into sink, chunk by chunk; raises DownloadTooLarge past max_bytes."""
 	async with client.stream("GET", url, headers=headers, follow_redirects=True) as resp:
 		resp.raise_for_status()
 		ct = resp.headers.get("Content-Type", "")
 		if ctok and not ctok(ct):
 			raise RuntimeError(f"Unexpected content type: '{ct}'.")
-		buffer = io.BytesIO()
+		try:
+			declared = int(resp.headers.get("Content-Length", ""))
+		except ValueError:
+			declared = None
+		if declared is not None and declared > max_bytes:
+			download_stats.rejected()
+			raise DownloadTooLarge(url, declared, max_bytes)
+		size = 0
 		async for chunk in resp.aiter_bytes():
-			buffer.write(chunk)
+			size += len(chunk)
+			# Content-Length may be missing or wrong
+			if size > max_bytes:
+				download_stats.rejected()
+				raise DownloadTooLarge(url, size, max_bytes)
+			sink(chunk)
+		return size
+
+def _report(report: DownloadReport, started: float) -> None:
+	report.elapsed_ms = round((time.perf_counter() - started) * 1000, 3)
+	download_stats.record(report)
+	logger.debug(f"Downloaded {report.url}: {report.size} bytes, peak memory {report.peak_memory}, spooled {report.spooled}, {report.elapsed_ms}ms")
+
+def _spooled_writer(buffer: IO[bytes], report: DownloadReport, spool_bytes: int) -> Callable[[bytes], None]:
+	def _write(chunk: bytes) -> None:
+		buffer.write(chunk)
+		report.spooled = report.spooled or buffer.tell() > spool_bytes
+		report.peak_memory = max(report.peak_memory, len(chunk) if report.spooled else buffer.tell())
+	return _write
+
+async def stream_to_buffer(client: AsyncClient, url: str, headers: Mapping[str, str]|None = None, ctok: Callable[[str], bool]|None = None, max_bytes: int = DOWNLOAD_MAX_BYTES, spool_bytes: int = SPOOL_MAX_BYTES) -> IO[bytes]:
+	"""Download into a buffer that moves to a temporary file past spool_bytes; positioned at the start."""
+	buffer = tempfile.SpooledTemporaryFile(max_size=spool_bytes)
+	report = DownloadReport(url)
+	started = time.perf_counter()
+	try:
+		report.size = await _download(client, url, headers, ctok, max_bytes, _spooled_writer(buffer, report, spool_bytes))
+	except BaseException:
+		buffer.close()
+		raise
+	_report(report, started)
+	buffer.seek(0)
+	return buffer
+
+# header bytes given to the parser before giving up on an early size
+HEADER_MAX_BYTES = 1024 * 1024
+
+def _image_bytes(image: Image.Image) -> int:
+	return image.width * image.height * len(image.getbands())
+
+async def decode_image_async(client: AsyncClient, url: str, headers: Mapping[str, str]|None = None, ctok: Callable[[str], bool]|None = None, max_bytes: int = DOWNLOAD_MAX_BYTES, size: tuple[int, int]|None = None, spool_bytes: int = SPOOL_MAX_BYTES) -> Image.Image:
+	"""
+	Download into a spooled buffer and decode it; returns a loaded image.
+	The header is parsed as it arrives (ImageFile.Parser), so images over Image.MAX_IMAGE_PIXELS are refused before the rest is downloaded.
+	With size, a JPEG is decoded reduced, close to it (draft_image).
+	"""
+	buffer = tempfile.SpooledTemporaryFile(max_size=spool_bytes)
+	report = DownloadReport(url)
+	started = time.perf_counter()
+	parser: ImageFile.Parser|None = ImageFile.Parser()
+	write = _spooled_writer(buffer, report, spool_bytes)
+	def _feed(chunk: bytes) -> None:
+		nonlocal parser
+		write(chunk)
+		if parser is None:
+			return
+		parser.feed(chunk)
+		if parser.image is not None:
+			pixels = parser.image.width * parser.image.height
+			if Image.MAX_IMAGE_PIXELS is not None and pixels > Image.MAX_IMAGE_PIXELS:
+				download_stats.rejected()
+				raise DownloadTooLarge(url, _image_bytes(parser.image), Image.MAX_IMAGE_PIXELS * len(parser.image.getbands()))
+			# the header is all it is for; JPEG and PNG are not decoded incrementally by the parser
+			parser = None
+		elif buffer.tell() > HEADER_MAX_BYTES:
+			parser = None
+	def _decode() -> Image.Image:
 		buffer.seek(0)
-		return buffer
+		image = Image.open(buffer)
+		if size is not None:
+			image = draft_image(image, min(1.0, max(size[0] / image.width, size[1] / image.height)))
+		image.load()
+		return image
+	with buffer:
+		report.size = await _download(client, url, headers, ctok, max_bytes, _feed)
+		image = await run_cpu(_decode)
+	report.peak_memory += _image_bytes(image)
+	_report(report, started)
+	return image
 
 async def get_image_async(image_url:str) -> Image.Image | None:
 	client = client_var.get()
-	buffer = await stream_to_buffer(client, image_url, ctok=lambda ct: ct.startswith("image/"))
-	img = Image.open(buffer)
+	img = await resilience_var.get().run(image_url, lambda: decode_image_async(client, image_url, ctok=lambda ct: ct.startswith("image/")))
 	return img
 
 def change_orientation(image: Image.Image, orientation: str, rotate180=False) -> Image.Image:
@@ -46,7 +181,39 @@ def change_orientation(image: Image.Image, orientation: str, rotate180=False) ->
 		return image
 	return image.rotate(angle, expand=1)
 
-def resize_image(image: Image.Image, desired_size: tuple[int, int], image_settings: list[str] = []) -> Image.Image:
+type ResampleQuality = Literal["quality", "speed"]
+"""quality: LANCZOS from the full resolution; speed: decode/prescale close to the target first, then LANCZOS."""
+RESAMPLE_QUALITY_SETTING = "imageSettings-resample"
+DEFAULT_RESAMPLE_QUALITY: ResampleQuality = "speed"
+# resolution kept above the target for the final LANCZOS pass
+REDUCING_GAP = 2.0
+
+def exif_oriented_size(image: Image.Image) -> tuple[int, int]:
+	"""Size of the image after ImageOps.exif_transpose, without loading it."""
+	orientation = image.getexif().get(ExifTags.Base.Orientation, 1)
+	return (image.height, image.width) if orientation in (5, 6, 7, 8) else image.size
+
+def draft_image(image: Image.Image, scale: float) -> Image.Image:
+	"""
+	Let the JPEG decoder downscale (by 1/2, 1/4 or 1/8) while decoding, keeping REDUCING_GAP times the scaled size.
+	No-op for other formats and for images that are already loaded.
+	"""
+	if image.format != "JPEG" or scale * REDUCING_GAP >= 1.0:
+		return image
+	width, height = image.size
+	image.draft(image.mode, (math.ceil(width * scale * REDUCING_GAP), math.ceil(height * scale * REDUCING_GAP)))
+	return image
+
+def contain_image(image: Image.Image, desired_size: tuple[int, int], resample_quality: ResampleQuality = DEFAULT_RESAMPLE_QUALITY) -> Image.Image:
+	"""Resize to fit within desired_size, preserving aspect ratio (same as ImageOps.contain)."""
+	if resample_quality == "quality":
+		return ImageOps.contain(image, desired_size, Image.Resampling.LANCZOS)
+	ratio = min(desired_size[0] / image.width, desired_size[1] / image.height)
+	size = (max(1, round(image.width * ratio)), max(1, round(image.height * ratio)))
+	# reducing_gap: integer reduce() first, then LANCZOS
+	return image.resize(size, Image.Resampling.LANCZOS, reducing_gap=REDUCING_GAP)
+
+def resize_image(image: Image.Image, desired_size: tuple[int, int], image_settings: list[str] = [], resample_quality: ResampleQuality = DEFAULT_RESAMPLE_QUALITY) -> Image.Image:
 	img_width, img_height = image.size
 	desired_width, desired_height = desired_size
 	desired_width, desired_height = int(desired_width), int(desired_height)
@@ -74,36 +241,104 @@ def resize_image(image: Image.Image, desired_size: tuple[int, int], image_settin
 		if not keep_width:
 			y_offset = (img_height - new_height) // 2
 
+	if resample_quality == "speed":
+		# Step 2: decode close to the target (JPEG draft), then reduce() and LANCZOS the cropped box in one call
+		image = draft_image(image, max(desired_width / new_width, desired_height / new_height))
+		sx, sy = image.width / img_width, image.height / img_height
+		box = (x_offset * sx, y_offset * sy, (x_offset + new_width) * sx, (y_offset + new_height) * sy)
+		return image.resize((desired_width, desired_height), Image.Resampling.LANCZOS, box=box, reducing_gap=REDUCING_GAP)
+
 	# Step 2: Crop the image
 	image = image.crop((x_offset, y_offset, x_offset + new_width, y_offset + new_height))
 
 	# Step 3: Resize to the exact desired dimensions (if necessary)
 	return image.resize((desired_width, desired_height), Image.Resampling.LANCZOS)
 
+# modes handled by the fused enhancement; other modes use ImageEnhance directly
+FUSED_ENHANCEMENT_MODES = ("L", "RGB", "RGBA")
+
+def _enhancement_factor(image_settings: Mapping[str,Any], key: str) -> float|None:
+	factor = image_settings.get(key, None)
+	return None if factor is None or factor == 1.0 else float(factor)
+
+def _blend_lut(lut: np.ndarray, degenerate: float, factor: float) -> np.ndarray:
+	# same arithmetic as Image.blend: float32, truncated, clipped
+	out = np.float32(degenerate) + np.float32(factor) * (lut.astype(np.float32) - np.float32(degenerate))
+	return np.clip(out, 0, 255).astype(np.uint8)
+
+@lru_cache(maxsize=64)
+def _brightness_lut(brightness: float|None) -> np.ndarray:
+	lut = np.arange(256, dtype=np.uint8)
+	return lut if brightness is None else _blend_lut(lut, 0, brightness)
+
+@lru_cache(maxsize=256)
+def _point_lut(brightness: float|None, contrast: float|None, mean: int) -> np.ndarray:
+	"""Brightness followed by contrast, as one 256-entry table."""
+	lut = _brightness_lut(brightness)
+	return lut if contrast is None else _blend_lut(lut, mean, contrast)
+
+def _luminance_mean(img: Image.Image, lut: np.ndarray) -> int:
+	"""
+	Mean of the grayscale image after the LUT, from the channel histograms.
+	Same as ImageEnhance.Contrast, except for per-pixel rounding of the luminance.
+	"""
+	hist = np.asarray(img.histogram(), dtype=np.float64).reshape(-1, 256)
+	pixels = hist[0].sum()
+	means = (hist @ lut.astype(np.float64)) / pixels
+	if img.mode == "L":
+		return int(means[0] + 0.5)
+	return int((means[0] * 19595 + means[1] * 38470 + means[2] * 7471) / 65536 + 0.5)
+
+def _apply_saturation(img: Image.Image, lut: np.ndarray, saturation: float) -> Image.Image:
+	"""The point LUT and saturation in one NumPy pass."""
+	pixels = np.asarray(img)
+	rgb = lut[pixels[..., :3]]
+	# grayscale as Image.convert("L")
+	luma = ((rgb[..., 0].astype(np.uint32) * 19595 + rgb[..., 1].astype(np.uint32) * 38470 + rgb[..., 2].astype(np.uint32) * 7471 + 0x8000) >> 16).astype(np.float32)
+	out = luma[..., None] + np.float32(saturation) * (rgb.astype(np.float32) - luma[..., None])
+	np.clip(out, 0, 255, out=out)
+	if img.mode == "RGBA":
+		return Image.fromarray(np.dstack((out.astype(np.uint8), pixels[..., 3])), "RGBA")
+	return Image.fromarray(out.astype(np.uint8), "RGB")
+
 def apply_image_enhancement(img: Image.Image, image_settings: Mapping[str,Any]|None) -> Image.Image:
+	"""
+	Apply brightness, contrast, saturation and sharpness, in that order.
+	Brightness and contrast are fused into one table; saturation shares the pass over the pixels.
+	"""
 	if image_settings is None:
 		return img
+	brightness = _enhancement_factor(image_settings, "imageSettings-brightness")
+	contrast = _enhancement_factor(image_settings, "imageSettings-contrast")
+	saturation = _enhancement_factor(image_settings, "imageSettings-saturation")
+	sharpness = _enhancement_factor(image_settings, "imageSettings-sharpness")
+	if img.mode not in FUSED_ENHANCEMENT_MODES:
+		return _apply_image_enhancement_passes(img, brightness, contrast, saturation, sharpness)
 
-	brightness = image_settings.get("imageSettings-brightness", None)
-	if brightness is not None and brightness != 1.0:
-		# Apply Brightness
-		img = ImageEnhance.Brightness(img).enhance(brightness)
+	if brightness is not None or contrast is not None or saturation is not None:
+		mean = _luminance_mean(img, _brightness_lut(brightness)) if contrast is not None else 0
+		lut = _point_lut(brightness, contrast, mean)
+		if saturation is not None and img.mode != "L":
+			img = _apply_saturation(img, lut, saturation)
+		elif brightness is not None or contrast is not None:
+			table = lut.tolist()
+			img = img.point(table * 3 + list(range(256)) if img.mode == "RGBA" else table * len(img.getbands()))
 
-	contrast = image_settings.get("imageSettings-contrast", None)
-	if contrast is not None and contrast != 1.0:
-		# Apply Contrast
-		img = ImageEnhance.Contrast(img).enhance(contrast)
+	if sharpness is not None:
+		# a convolution; cannot be fused
+		img = ImageEnhance.Sharpness(img).enhance(sharpness)
 
-	saturation = image_settings.get("imageSettings-saturation", None)
-	if saturation is not None and saturation != 1.0:
-		# Apply Saturation (Color)
-		img = ImageEnhance.Color(img).enhance(saturation)
+	return img
 
-	sharpness = image_settings.get("imageSettings-sharpness", None)
-	if sharpness is not None and sharpness != 1.0:
-		# Apply Sharpness
+def _apply_image_enhancement_passes(img: Image.Image, brightness: float|None, contrast: float|None, saturation: float|None, sharpness: float|None) -> Image.Image:
+	if brightness is not None:
+		img = ImageEnhance.Brightness(img).enhance(brightness)
+	if contrast is not None:
+		img = ImageEnhance.Contrast(img).enhance(contrast)
+	if saturation is not None:
+		img = ImageEnhance.Color(img).enhance(saturation)
+	if sharpness is not None:
 		img = ImageEnhance.Sharpness(img).enhance(sharpness)
-
 	return img
 
 def compute_image_hash(image: Image.Image) -> str:
@@ -116,61 +351,128 @@ def render_html_arglist(html_str: str, arglist: list[str]) -> Image.Image | None
 	image = None
 	try:
 		logger.debug(f"{html_str}")
-		with tempfile.NamedTemporaryFile(suffix=".html", delete=False) as html_file:
-			html_file.write(html_str.encode("utf-8"))
-			html_file_path = html_file.name
-
-		image = render_chrome_headless_arglist(html_file_path, arglist)
-		os.remove(html_file_path)
+		with html_document(html_str) as html_file_path:
+			image = render_chrome_headless_arglist(html_file_path, arglist)
 	except Exception as e:
 		logger.error(f"Failed to render: {str(e)}")
 	return image
 
+def shared_render_folder() -> str:
+	"""RAM-backed (tmpfs) folder for documents handed to the browser, so renders do not write to the SD card."""
+	shm = "/dev/shm"
+	return shm if os.path.isdir(shm) and os.access(shm, os.W_OK) else tempfile.gettempdir()
+
+@contextmanager
+def html_document(html_str: str) -> Iterator[str]:
+	"""Path of a short-lived HTML file in the shared render folder."""
+	fd, html_file_path = tempfile.mkstemp(suffix=".html", dir=shared_render_folder())
+	try:
+		with os.fdopen(fd, "wb") as html_file:
+			html_file.write(html_str.encode("utf-8"))
+		yield html_file_path
+	finally:
+		try:
+			os.remove(html_file_path)
+		except FileNotFoundError:
+			pass
+
+class OutputTail:
+	"""Drains a process output stream on a daemon thread, keeping only its last limit bytes."""
+	def __init__(self, stream: io.BufferedReader, limit: int = 16 * 1024):
+		self._chunks: deque[bytes] = deque()
+		self._size = 0
+		self._limit = limit
+		self._lock = threading.Lock()
+		self._thread = threading.Thread(target=self._drain, args=(stream,), daemon=True, name="OutputTail")
+		self._thread.start()
+	def _drain(self, stream: io.BufferedReader) -> None:
+		with stream:
+			for chunk in iter(lambda: stream.read1(4096), b""):
+				with self._lock:
+					self._chunks.append(chunk)
+					self._size += len(chunk)
+					while self._size - len(self._chunks[0]) >= self._limit:
+						self._size -= len(self._chunks.popleft())
+	def join(self, timeout: float|None = None) -> None:
+		self._thread.join(timeout)
+	def text(self) -> str:
+		with self._lock:
+			data = b"".join(self._chunks)
+		return data[-self._limit:].decode("utf-8", errors="replace")
+
 # DO NOT USE regular Chrome it does not render correctly
 os_type = platform.system()
 WIN_CHROME_HEADLESS = "C:\\Users\\Public\\chrome-headless-shell-win64\\chrome-headless-shell.exe"
 LINUX_CHROME_HEADLESS = "chromium-headless-shell"
+# common to the process-per-render and the persistent renderer
+CHROME_HEADLESS_ARGS = [
+	"--headless=new",
+	"--disable-dev-shm-usage",
+	"--disable-gpu",
+	"--use-gl=swiftshader",
+	"--hide-scrollbars",
+	"--in-process-gpu",
+	"--js-flags=--jitless",
+	"--disable-zero-copy",
+	"--disable-gpu-memory-buffer-compositor-resources",
+	"--disable-extensions",
+	"--disable-plugins",
+	"--mute-audio",
+	"--no-sandbox"
+]
 
-def render_chrome_headless_arglist(source_html_path: str, arglist: list[str]):
-	image = None
-	try:
-		# Output file for the screenshot
+def chrome_headless_executable() -> str:
+	# TODO by OS platform from .env.xxx file
+	return WIN_CHROME_HEADLESS if os_type == "Windows" else LINUX_CHROME_HEADLESS
+
+# PNG file signature; anything the browser prints before it is skipped
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+def render_chrome_headless_png(source_html_path: str, arglist: list[str], executable: str|None = None) -> bytes|None:
+	"""Screenshot the HTML file with a one-shot browser process; the PNG comes back on stdout (a file on Windows)."""
+	img_file_path = None
+	if os_type == "Windows":
 		with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as img_file:
 			img_file_path = img_file.name
-		command = [
-			# TODO by OS platform from .env.xxx file
-			WIN_CHROME_HEADLESS if os_type == "Windows" else LINUX_CHROME_HEADLESS,
-			source_html_path,
-			"--headless=new",
-			f"--screenshot={img_file_path}",
-			"--disable-dev-shm-usage",
-			"--disable-gpu",
-			"--use-gl=swiftshader",
-			"--hide-scrollbars",
-			"--in-process-gpu",
-			"--js-flags=--jitless",
-			"--disable-zero-copy",
-			"--disable-gpu-memory-buffer-compositor-resources",
-			"--disable-extensions",
-			"--disable-plugins",
-			"--mute-audio",
-			"--no-sandbox"
-		]
-		command.extend(arglist)
-		result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
-		# Check if the process failed or the output file is missing
-		if result.returncode != 0 or not os.path.exists(img_file_path):
-			logger.error("Failed to render:")
-			logger.error(result.stderr.decode('utf-8'))
+	command = [
+		executable or chrome_headless_executable(),
+		source_html_path,
+		f"--screenshot={img_file_path or '/dev/stdout'}",
+		*CHROME_HEADLESS_ARGS
+	]
+	command.extend(arglist)
+	try:
+		process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+		if process.stdout is None or process.stderr is None:
+			raise RuntimeError("process streams are not available")
+		stderr = OutputTail(process.stderr)
+		with process.stdout:
+			output = process.stdout.read()
+		returncode = process.wait()
+		stderr.join(timeout=5)
+		if img_file_path is not None and os.path.exists(img_file_path):
+			with open(img_file_path, "rb") as img_file:
+				output = img_file.read()
+		start = output.find(PNG_SIGNATURE)
+		# Check if the process failed or there is no image
+		if returncode != 0 or start < 0:
+			logger.error(f"Failed to render ({returncode}):")
+			logger.error(stderr.text())
 			return None
+		return output[start:]
+	finally:
+		if img_file_path is not None and os.path.exists(img_file_path):
+			os.remove(img_file_path)
 
+def render_chrome_headless_arglist(source_html_path: str, arglist: list[str]):
+	image = None
+	try:
+		png = render_chrome_headless_png(source_html_path, arglist)
+		if png is None:
+			return None
 		# Load the image using PIL
-		with Image.open(img_file_path) as img:
+		with Image.open(io.BytesIO(png)) as img:
 			image = img.copy()
-
-		# Remove image files
-		os.remove(img_file_path)
 	except Exception as e:
 		logger.error(f"Failed to render: {str(e)}")
 